@@ -0,0 +1,360 @@
+"""GeoMatch AI: ค้นหาตำแหน่งวางที่ดีที่สุดล่วงหน้าหลายชิ้น ภายในเวลาที่กำหนดต่อการตัดสินใจ
+
+- ไล่ทุกตำแหน่งวางที่ไปถึงได้ (การหมุน x คอลัมน์) ของชิ้นปัจจุบัน
+- จำลอง lock_shape รวม Cascade บนกระดานแบบ Bitboard (ใช้ได้กับกระดานทุกแบบ)
+- ชิ้นถัดไปยังไม่รู้ จึงเฉลี่ยตามน้ำหนักการสุ่มของรูปทรง (Expectimax) เฉพาะตำแหน่งที่ดีที่สุด BEAM_WIDTH อันดับ
+- Transposition Table คีย์ด้วย Zobrist Hash ของกระดาน (ค่าเดียวกับ Grid.zobrist) จำกัดขนาดแบบ LRU
+- Iterative Deepening: คืนผลของความลึกล่าสุดที่ค้นเสร็จก่อนหมดเวลา
+  (ความลึก 1 ก็อยู่ใต้ time_budget ถ้ายังไม่เสร็จ = ปล่อยลงตรงๆ จากท่าปัจจุบัน)
+- ตำแหน่งวางคิดจากแถวปัจจุบันของชิ้น: ต้องกด actions ทั้งหมดใน Tick เดียวก่อนชิ้นตก (ลงท้ายด้วย HARD_DROP)
+
+ตัวอย่าง:
+    ai = SearchAI(time_budget=0.008)
+    move = ai.best_move(game_manager.grid)
+    move.actions   # ['ROTATE', 'LEFT', 'LEFT', 'HARD_DROP'] (กดทั้งหมดใน Tick เดียว)
+    move.cells     # ช่องที่ชิ้นจะลงจอด (ใช้แสดง Hint)
+"""
+
+import random
+import time
+from collections import OrderedDict
+
+from geomatch_engine import SHAPES, COLORS, MATCH_KEY_PAIRS, BitboardGrid, intern_match_key, popcount
+
+# เวลาต่อการตัดสินใจ 1 ครั้ง (ครึ่งเฟรมที่ 60 FPS)
+DEFAULT_TIME_BUDGET = 0.008
+DEFAULT_MAX_DEPTH = 2
+# จำนวนตำแหน่งใน Transposition Table ก่อนเริ่มทิ้งตัวที่ใช้นานที่สุด
+DEFAULT_TABLE_SIZE = 100_000
+# จำนวนตำแหน่งวางที่ดีที่สุดที่จะค้นต่อในความลึกถัดไป
+BEAM_WIDTH = 4
+# ขนาดของชิ้นถัดไปที่ใช้ประเมิน (ค่ากลางของ 1-3) ลดจำนวนกรณีจาก 18 เหลือ 6 รูปทรง
+NEXT_PIECE_SIZES = (2,)
+
+LOSS_VALUE = -1_000_000.0
+
+
+class _Timeout(Exception):
+    pass
+
+
+class Placement:
+    """ตำแหน่งวาง 1 แบบ: ปุ่มที่ต้องกด, ช่องที่ลงจอด และค่าประเมิน"""
+
+    def __init__(self, actions, cells, value, depth):
+        self.actions = actions
+        self.cells = cells
+        self.value = value
+        self.depth = depth
+
+    def __repr__(self):
+        return f"Placement({self.actions}, value={self.value:.1f}, depth={self.depth})"
+
+
+class _Board:
+    """สถานะกระดานแบบเปลี่ยนค่าไม่ได้ระหว่างค้นหา: layers (tuple ของ int), occupied, special, Zobrist Hash"""
+
+    __slots__ = ('layers', 'occupied', 'special', 'hash')
+
+    def __init__(self, layers, occupied, special, zobrist_hash):
+        self.layers = layers
+        self.occupied = occupied
+        self.special = special
+        self.hash = zobrist_hash
+
+
+class SearchAI:
+    """ค้นหาตำแหน่งวางแบบ Expectimax + Iterative Deepening สำหรับกระดานขนาดหนึ่ง"""
+
+    def __init__(self, time_budget=DEFAULT_TIME_BUDGET, max_depth=DEFAULT_MAX_DEPTH,
+                 table_size=DEFAULT_TABLE_SIZE, spawn_weights=None, seed=None):
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.table_size = table_size
+        self.spawn_weights = spawn_weights
+        self.rng = random.Random(seed)
+        # (zobrist, match_key, บิตเริ่มต้นของชิ้น, ความลึก) -> (ค่า, Placement)
+        self.table = OrderedDict()
+        self.scratch = None
+        # timeouts: จำนวนครั้งที่หมดเวลาก่อนความลึก 1 เสร็จ (นับสะสม)
+        self.stats = {'nodes': 0, 'table_hits': 0, 'depth': 0, 'timeouts': 0}
+        self._deadline = None
+
+    # ----------------------------------------------------------------
+    # การตั้งค่าตามขนาดกระดาน
+    # ----------------------------------------------------------------
+
+    def _prepare(self, grid):
+        scratch = self.scratch
+        if scratch is None or scratch.rules is not grid.rules:
+            self.scratch = scratch = BitboardGrid(rules=grid.rules)
+            self.table.clear()
+        weights = self.spawn_weights or grid.spawn_weights
+        total = sum(weights)
+        self.outcomes = [
+            (intern_match_key(shape, COLORS[shape]), size, weight / total / len(NEXT_PIECE_SIZES))
+            for shape, weight in zip(SHAPES, weights) if weight > 0
+            for size in NEXT_PIECE_SIZES
+        ]
+
+    def _hash_bits(self, match_key, bits):
+        # ตาราง Zobrist ตามตำแหน่งบิตชุดเดียวกับที่กระดานใช้ อัปเดต grid.zobrist
+        table = self.scratch._zobrist_bits(match_key)
+        value = 0
+        while bits:
+            low_bit = bits & -bits
+            bits ^= low_bit
+            value ^= table[low_bit.bit_length() - 1]
+        return value
+
+    def _board_of(self, grid):
+        scratch = self.scratch
+        if isinstance(grid, BitboardGrid):
+            layers, occupied, special = list(grid.layers), grid.occupied, grid.special
+        else:
+            layers = [0] * len(MATCH_KEY_PAIRS)
+            occupied = special = 0
+            stride = scratch.stride
+            for x, column in enumerate(grid.grid_matrix):
+                for y, block in enumerate(column):
+                    if block is not None:
+                        bit = 1 << (x * stride + y)
+                        layers[block.match_key] |= bit
+                        occupied |= bit
+                        if block.is_special:
+                            special |= bit
+        # กระดานดูแล Zobrist Hash ของตัวเองอยู่แล้ว ไม่ต้องคำนวณใหม่
+        return _Board(tuple(layers), occupied, special, grid.zobrist)
+
+    # ----------------------------------------------------------------
+    # ตำแหน่งวางและการจำลอง Lock
+    # ----------------------------------------------------------------
+
+    def _fits(self, cells, occupied):
+        scratch = self.scratch
+        bits = 0
+        for x, y in cells:
+            if not (0 <= x < scratch.width and 0 <= y < scratch.height):
+                return None
+            bits |= 1 << (x * scratch.stride + y)
+        return None if bits & occupied else bits
+
+    def _placements(self, board, cells):
+        """คืน [(จำนวนหมุน, เลื่อน, บิตที่ลงจอด)] ของทุกตำแหน่งที่ต่างกัน ตามกติกาของ Grid
+
+        หมุนรอบบล็อกแรก (หมุนไม่ได้ = อยู่ท่าเดิม) แล้วเลื่อนซ้าย/ขวาทีละช่อง แล้วปล่อยลง
+        """
+        scratch = self.scratch
+        width, height, stride = scratch.width, scratch.height, scratch.stride
+        occupied = board.occupied
+        columns = [(occupied >> (x * stride)) & scratch.column_mask for x in range(width)]
+        placements = []
+        seen = set()
+
+        for rotations in range(4):
+            if rotations and len(cells) > 1:
+                pivot_x, pivot_y = cells[0]
+                # Rotate 90 degrees counter-clockwise เหมือน Grid.rotate_active_shape
+                rotated = [(pivot_x - (y - pivot_y), pivot_y + (x - pivot_x)) for x, y in cells]
+                if self._fits(rotated, occupied) is not None:
+                    cells = rotated
+            bits = self._fits(cells, occupied)
+            if bits is None:
+                continue
+            min_x = min(x for x, _ in cells)
+            max_x = max(x for x, _ in cells)
+
+            for direction, limit in ((-1, min_x), (1, width - 1 - max_x)):
+                shifted = bits
+                for step in range(limit + 1):
+                    shift = direction * step
+                    if step:
+                        shifted = shifted >> stride if direction < 0 else shifted << stride
+                        if shifted & occupied:
+                            break
+                    # ระยะตก = ระยะที่สั้นที่สุดจากแต่ละช่องถึงบล็อกแรกที่อยู่ใต้ช่องนั้น
+                    drop = height
+                    for x, y in cells:
+                        below = columns[x + shift] >> (y + 1)
+                        distance = (below & -below).bit_length() - 1 if below else height - 1 - y
+                        if distance < drop:
+                            drop = distance
+                    landed = shifted << drop
+                    if landed not in seen:
+                        seen.add(landed)
+                        placements.append((rotations, shift, landed))
+        return placements
+
+    def _lock(self, board, match_key, landed, with_child=True):
+        """วางชิ้นที่ลงจอดแล้ว คืน (ค่าทันที, กระดานใหม่) หรือ (LOSS_VALUE, None) ถ้าแพ้
+
+        with_child=False ใช้กับใบของการค้นหา: ถ้าไม่มีการเคลียร์จะไม่สร้างกระดานใหม่
+        """
+        scratch = self.scratch
+        stride = scratch.stride
+        top_y = scratch.height
+        bits = landed
+        while bits:
+            low_bit = bits & -bits
+            bits ^= low_bit
+            y = (low_bit.bit_length() - 1) % stride
+            if y < top_y:
+                top_y = y
+        if top_y < scratch.rules.spawn_rows:
+            return LOSS_VALUE, None
+
+        layer = board.layers[match_key] | landed
+        dilate = scratch._dilate
+        adjacency = popcount(dilate(landed) & layer & ~landed)
+        # เคลียร์ได้ก็ต่อเมื่อกลุ่มที่แตะชิ้นนี้มีอย่างน้อย min_match ช่อง
+        group = landed
+        if adjacency:
+            while True:
+                grown = dilate(group) & layer
+                if grown == group:
+                    break
+                group = grown
+
+        cleared = popcount(group) >= scratch.rules.min_match
+        if not cleared and not with_child:
+            return adjacency * 10 + top_y, None
+
+        special = board.special
+        if MATCH_KEY_PAIRS[match_key][0] == 'Diamond':
+            special |= landed
+        layers = list(board.layers)
+        layers[match_key] = layer
+        if not cleared:
+            zobrist_hash = board.hash ^ self._hash_bits(match_key, landed)
+            return adjacency * 10 + top_y, _Board(tuple(layers), board.occupied | landed, special, zobrist_hash)
+
+        scratch.layers, scratch.occupied, scratch.special = layers, board.occupied | landed, special
+        # check_and_clear_matches อัปเดต Hash ทีละช่องเอง
+        scratch.zobrist = board.hash ^ self._hash_bits(match_key, landed)
+        score = scratch.check_and_clear_matches(landed)
+        child = _Board(tuple(scratch.layers), scratch.occupied, scratch.special, scratch.zobrist)
+        return score * 100 + adjacency * 10 + top_y, child
+
+    # ----------------------------------------------------------------
+    # การค้นหา
+    # ----------------------------------------------------------------
+
+    def _check_time(self):
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            raise _Timeout()
+
+    def _search(self, board, match_key, cells, depth):
+        """คืน (ค่าที่ดีที่สุด, (จำนวนหมุน, เลื่อน, บิตที่ลงจอด)) ของชิ้นนี้บนกระดานนี้"""
+        start_bits = self._fits(cells, board.occupied)
+        if start_bits is None:
+            return LOSS_VALUE, None
+
+        table_key = (board.hash, match_key, start_bits, depth)
+        cached = self.table.get(table_key)
+        if cached is not None:
+            self.table.move_to_end(table_key)
+            self.stats['table_hits'] += 1
+            return cached
+
+        leaf = depth == 1
+        scored = []
+        for placement in self._placements(board, cells):
+            self._check_time()
+            self.stats['nodes'] += 1
+            value, child = self._lock(board, match_key, placement[2], with_child=not leaf)
+            # ค่าเท่ากันให้สุ่มเลือก เพื่อไม่ให้กองอยู่ฝั่งเดียว
+            scored.append((value, self.rng.random(), placement, child))
+        if not scored:
+            return LOSS_VALUE, None
+        scored.sort(key=lambda item: item[:2], reverse=True)
+
+        if not leaf:
+            expanded = []
+            for value, tie_break, placement, child in scored[:BEAM_WIDTH]:
+                if child is not None:
+                    value += self._expected(child, depth - 1)
+                expanded.append((value, tie_break, placement, child))
+            scored = sorted(expanded, key=lambda item: item[:2], reverse=True)
+
+        result = (scored[0][0], scored[0][2])
+        self.table[table_key] = result
+        if len(self.table) > self.table_size:
+            self.table.popitem(last=False)
+        return result
+
+    def _expected(self, board, depth):
+        """ค่าคาดหวังของชิ้นถัดไป (ทุกรูปทรงตามน้ำหนักการสุ่ม x NEXT_PIECE_SIZES)"""
+        spawn_x = self.scratch.width // 2
+        expected = 0.0
+        for match_key, size, probability in self.outcomes:
+            cells = [(spawn_x, y) for y in range(size)]
+            value, _ = self._search(board, match_key, cells, depth)
+            expected += probability * value
+        return expected
+
+    def best_move(self, grid):
+        """คืน Placement ที่ดีที่สุดของ Active Shape (None ถ้าไม่มีชิ้นหรือไม่มีที่วาง)"""
+        blocks = grid.active_shape_blocks
+        if not blocks:
+            return None
+        self._prepare(grid)
+        board = self._board_of(grid)
+        match_key = blocks[0].match_key
+        cells = [(block.x, block.y) for block in blocks]
+
+        best = None
+        start = time.perf_counter()
+        self.stats['nodes'] = self.stats['table_hits'] = 0
+        for depth in range(1, self.max_depth + 1):
+            self._deadline = None if self.time_budget is None else start + self.time_budget
+            try:
+                value, placement = self._search(board, match_key, cells, depth)
+            except _Timeout:
+                break
+            finally:
+                self._deadline = None
+            if placement is None:
+                return None
+            best = (value, placement, depth)
+
+        if best is None:
+            # หมดเวลาก่อนความลึก 1 เสร็จ: ปล่อยลงตรงๆ (ตำแหน่งแรกของ _placements = ไม่หมุน ไม่เลื่อน)
+            self.stats['timeouts'] += 1
+            placements = self._placements(board, cells)
+            if not placements:
+                return None
+            value, _ = self._lock(board, match_key, placements[0][2], with_child=False)
+            best = (value, placements[0], 0)
+
+        value, (rotations, shift, landed), depth = best
+        self.stats['depth'] = depth
+        direction = 'RIGHT' if shift > 0 else 'LEFT'
+        actions = ['ROTATE'] * rotations + [direction] * abs(shift) + ['HARD_DROP']
+        stride = self.scratch.stride
+        landed_cells = sorted(divmod(bit.bit_length() - 1, stride) for bit in self.scratch._iter_bits(landed))
+        return Placement(actions, landed_cells, value, depth)
+
+
+class SearchPolicy:
+    """Policy สำหรับ geomatch_sim: วางแผนด้วย SearchAI ทุกครั้งที่มีชิ้นใหม่
+
+    หมุน/เลื่อนตามแผนผ่าน handle_input ทันทีแล้วคืน 'HARD_DROP' ให้ Tick เดียวกัน
+    ถ้ากดทีละ Tick ชิ้นจะตกไประหว่างทางและอาจถูกกองบังจนลงจอดในตำแหน่งที่ไม่ได้ประเมินไว้
+    """
+
+    def __init__(self, seed=None, time_budget=DEFAULT_TIME_BUDGET, max_depth=DEFAULT_MAX_DEPTH):
+        self.ai = SearchAI(time_budget=time_budget, max_depth=max_depth, seed=seed)
+        self.planned_for = None
+
+    def __call__(self, game_manager):
+        grid = game_manager.grid
+        # ชิ้นใหม่ถูกสร้างเป็น list ใหม่เสมอ จึงใช้ identity ตรวจว่าต้องวางแผนใหม่หรือไม่
+        if grid.active_shape_blocks is not self.planned_for:
+            self.planned_for = grid.active_shape_blocks
+            move = self.ai.best_move(grid)
+            if move is not None:
+                *moves, drop = move.actions
+                for action in moves:
+                    game_manager.handle_input(action)
+                return drop
+        return 'DOWN'
@@ -0,0 +1,95 @@
+"""GeoMatch Assets: โหลดภาพบน Worker Thread และเก็บภาพขนาดจอไว้บนดิสก์ เพื่อให้เฟรมแรกขึ้นทันที
+
+- ถอดรหัส JPEG และย่อ/ขยายเป็นขนาดจอบน Thread แยก (pygame ปล่อย GIL ระหว่างทำงานนี้)
+- ผลลัพธ์เก็บเป็นพิกเซล RGB ดิบใน ASSET_CACHE_DIR คีย์ด้วย SHA-1 ของไฟล์ต้นฉบับ + ขนาด
+  ครั้งถัดไปจึงอ่านไฟล์เดียวแทนการถอดรหัสและย่อ/ขยายใหม่
+- Main Thread รับภาพที่เสร็จแล้วผ่าน poll() ทุกเฟรม แล้วค่อย convert() (ต้องทำหลัง set_mode)
+
+ตัวอย่าง:
+    assets = AssetLoader()
+    assets.request_image('menu', 'menu_bg.jpg', (SCREEN_WIDTH, SCREEN_HEIGHT))
+    ...
+    for name, image, error in assets.poll():   # ทุกเฟรม
+        ...
+"""
+
+import hashlib
+import io
+import os
+import threading
+
+import pygame
+
+ASSET_CACHE_DIR = '.asset_cache'
+
+
+class AssetLoader:
+    """โหลดภาพบน Thread แยก และเก็บผลลัพธ์ไว้ให้ Main Thread มารับ"""
+
+    def __init__(self, cache_dir=ASSET_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._done = []
+        self._pending = set()
+
+    @property
+    def busy(self):
+        return bool(self._pending)
+
+    def request_image(self, name, path, size):
+        """เริ่มโหลด path เป็นภาพขนาด size (ผลลัพธ์ออกทาง poll() ด้วยชื่อ name)"""
+        self._pending.add(name)
+        worker = threading.Thread(target=self._run, args=(name, path, tuple(size)),
+                                  name=f"asset-{name}", daemon=True)
+        worker.start()
+
+    def poll(self):
+        """คืนรายการ (name, surface หรือ None, error) ที่เสร็จตั้งแต่ครั้งก่อน"""
+        with self._lock:
+            done, self._done = self._done, []
+        for name, _, _ in done:
+            self._pending.discard(name)
+        return done
+
+    def _run(self, name, path, size):
+        try:
+            result = (name, self._load_scaled(path, size), None)
+        except (pygame.error, OSError) as e:
+            result = (name, None, e)
+        with self._lock:
+            self._done.append(result)
+
+    def _load_scaled(self, path, size):
+        with open(path, 'rb') as source:
+            data = source.read()
+        width, height = size
+        prefix = os.path.basename(path) + '.'
+        cache_name = f"{prefix}{hashlib.sha1(data).hexdigest()[:16]}.{width}x{height}.rgb"
+        cache_path = os.path.join(self.cache_dir, cache_name)
+
+        try:
+            with open(cache_path, 'rb') as cached:
+                pixels = cached.read()
+            if len(pixels) == width * height * 3:
+                return pygame.image.frombytes(pixels, size, 'RGB')
+        except OSError:
+            pass
+
+        image = pygame.transform.scale(pygame.image.load(io.BytesIO(data), path), size)
+        self._store(cache_path, prefix, pygame.image.tobytes(image, 'RGB'))
+        return image
+
+    def _store(self, cache_path, prefix, pixels):
+        # Cache เป็นแค่ตัวช่วย: เขียนไม่ได้ก็ยังใช้ภาพที่โหลดแล้วต่อได้
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # ลบไฟล์ของภาพต้นฉบับ/ขนาดเดิมที่ล้าสมัย
+            for old_name in os.listdir(self.cache_dir):
+                if old_name.startswith(prefix) and old_name != os.path.basename(cache_path):
+                    os.remove(os.path.join(self.cache_dir, old_name))
+            temp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as cached:
+                cached.write(pixels)
+            os.replace(temp_path, cache_path)
+        except OSError as e:
+            print(f"WARNING: Could not write asset cache '{cache_path}'. Error: {e}")
@@ -0,0 +1,313 @@
+"""GeoMatch Benchmarks: วัดเวลาของ Hot Path ของกระดานและการวาด แล้วเทียบกับ Baseline
+
+ชุดทดสอบ (ทุกแบบของกระดาน: list / array / bitboard):
+    find_all_matches/<board>     หากลุ่มทั้งกระดาน (ไม่เคลียร์)
+    dfs_match_check/<board>      DFS ของกลุ่มเดียว
+    apply_gravity/holes          บีบคอลัมน์ของกระดานที่ถูกเจาะรู 1 ใน 3
+    check_and_clear/cascade      Cascade หลายชั้นจนกระดานนิ่ง
+    move_left_right / rotate     เลื่อนซ้าย+ขวา และหมุน Active Shape บนกระดานทั่วไป
+ชุดการวาด (SDL dummy driver, Surface นอกจอ): draw_grid/<board>, draw_block
+
+กระดาน: typical (เล่นสุ่มด้วย Seed คงที่), full_same (ทุกช่องสีเดียว = กลุ่มใหญ่สุด),
+        checker (4 สีสลับแบบไม่มีเพื่อนบ้านสีเดียวกันเลย = จุดเริ่ม DFS มากสุด)
+
+ตัวอย่าง:
+    python geomatch_bench.py run --out bench_baseline.json
+    python geomatch_bench.py compare bench_baseline.json --threshold 0.2   # Exit Code 1 ถ้าช้าลงเกินเกณฑ์
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+from geomatch_engine import (
+    SHAPES, COLORS, GRID_WIDTH, GRID_HEIGHT,
+    ShapeBlock, Grid, ArrayGrid, BitboardGrid, np,
+)
+
+BENCH_VERSION = 1
+DEFAULT_OUT = 'bench_results.json'
+# แต่ละรอบวัดจนครบเวลานี้ และเก็บค่าที่ดีที่สุดจากหลายรอบ (ตัดสัญญาณรบกวนจากเครื่อง)
+DEFAULT_MIN_TIME = 0.05
+DEFAULT_REPEAT = 5
+# ช้าลงเกินสัดส่วนนี้เทียบกับ Baseline = Regression
+DEFAULT_THRESHOLD = 0.2
+
+GRID_KINDS = {'list': Grid, 'bitboard': BitboardGrid}
+if np is not None:
+    GRID_KINDS['array'] = ArrayGrid
+
+# รูปทรงปกติ (ไม่รวม Diamond ที่เคลียร์ทั้งแถว) สำหรับสร้างกระดาน
+PLAIN_SHAPES = [shape for shape in SHAPES if shape != 'Diamond']
+
+# ====================================================================
+# 1. TIMING
+# ====================================================================
+
+def measure(step, reset=None, min_time=DEFAULT_MIN_TIME, repeat=DEFAULT_REPEAT):
+    """คืน (เวลาต่อครั้งที่ดีที่สุด, ค่ากลาง, จำนวนครั้งต่อรอบ) เป็นวินาที
+
+    reset: เรียกก่อนทุกครั้งโดยไม่นับเวลา (สำหรับเมธอดที่เปลี่ยนกระดาน)
+    """
+    perf_counter = time.perf_counter
+    samples = []
+    calls = 0
+    for _ in range(repeat):
+        elapsed = 0.0
+        calls = 0
+        if reset is None:
+            batch = 1
+            while elapsed < min_time:
+                start = perf_counter()
+                for _ in range(batch):
+                    step()
+                elapsed += perf_counter() - start
+                calls += batch
+                batch *= 2
+        else:
+            while elapsed < min_time:
+                reset()
+                start = perf_counter()
+                step()
+                elapsed += perf_counter() - start
+                calls += 1
+        samples.append(elapsed / calls)
+    return min(samples), statistics.median(samples), calls
+
+# ====================================================================
+# 2. BOARDS
+# ====================================================================
+
+def _block(shape, x, y):
+    return ShapeBlock(x, y, shape, COLORS[shape])
+
+
+def fill_board(grid, shape_at, top=2):
+    """ใส่บล็อกทุกช่องตั้งแต่แถว top ลงไป ตาม shape_at(x, y) (None = ว่าง)"""
+    for x in range(grid.width):
+        for y in range(top, grid.height):
+            shape = shape_at(x, y)
+            if shape is not None:
+                grid._set_block(x, y, _block(shape, x, y))
+    return grid
+
+
+def typical_board(grid_class, seed=7, locks=60):
+    """กระดานจากการเล่นสุ่มด้วย Seed คงที่ (กลางเกมทั่วไป)"""
+    grid = grid_class(seed=seed)
+    rng = random.Random(seed)
+    grid.spawn_new_shape()
+    for _ in range(locks):
+        for _ in range(rng.randrange(4)):
+            grid.rotate_active_shape()
+        grid.move_active_shape(rng.choice((-1, 1)) * rng.randrange(6), 0)
+        while grid.drop_active_shape():
+            pass
+        if grid.lock_shape() == "GAME_OVER" or grid.spawn_new_shape() == "GAME_OVER":
+            break
+    return grid
+
+
+def full_same_board(grid_class):
+    return fill_board(grid_class(), lambda x, y: 'Square')
+
+
+def checker_board(grid_class):
+    # 4 สีแบบ King's Graph: ไม่มีช่องติดกัน 8 ทิศที่สีเดียวกัน
+    return fill_board(grid_class(), lambda x, y: PLAIN_SHAPES[(x % 2) * 2 + (y % 2)])
+
+
+def holes_board(grid_class, seed=3):
+    """กระดานเต็มครึ่งล่างที่ถูกเจาะรูแบบสุ่ม 1 ใน 3 ช่อง (ไม่มีกลุ่มที่ตรงกัน)"""
+    rng = random.Random(seed)
+    top = grid_class().height // 2
+    return fill_board(
+        grid_class(),
+        lambda x, y: None if rng.random() < 1 / 3 else PLAIN_SHAPES[(x % 2) * 2 + (y % 2)],
+        top,
+    )
+
+
+def cascade_board(grid_class, seeds=200):
+    """กระดานสุ่มครึ่งล่างที่ให้ Cascade ลึกที่สุดจาก Seed 0..seeds-1 (ผลเหมือนเดิมทุกครั้ง)"""
+    best = None
+    for seed in range(seeds):
+        rng = random.Random(seed)
+        grid = fill_board(Grid(), lambda x, y: rng.choice(PLAIN_SHAPES), GRID_HEIGHT // 2)
+        snapshot = grid.snapshot()
+        grid.check_and_clear_matches()
+        if best is None or grid.last_combo_count > best[0]:
+            best = (grid.last_combo_count, snapshot)
+    board = grid_class()
+    board.restore(best[1])
+    return board, best[0]
+
+
+def piece_board(grid_class):
+    """กระดานทั่วไป + Active Shape 3 ช่องกลางกระดาน (เลื่อน/หมุนได้ทุกทิศ)"""
+    grid = typical_board(grid_class)
+    x, y = grid.width // 2, 6
+    grid.active_shape_blocks = [_block('Star', x, y + i) for i in range(3)]
+    return grid
+
+# ====================================================================
+# 3. BENCHMARKS
+# ====================================================================
+
+def engine_benchmarks():
+    """คืน {ชื่อ: (step, reset หรือ None)} ของทุกแบบของกระดาน"""
+    benchmarks = {}
+    for kind, grid_class in GRID_KINDS.items():
+        boards = {
+            'typical': typical_board(grid_class),
+            'full_same': full_same_board(grid_class),
+            'checker': checker_board(grid_class),
+        }
+        for name, grid in boards.items():
+            benchmarks[f'{kind}/find_all_matches/{name}'] = (grid._find_all_matches, None)
+        big_group = boards['full_same']
+        start_block = big_group.grid_matrix[0][big_group.height - 1]
+        benchmarks[f'{kind}/dfs_match_check/full_same'] = (lambda g=big_group, b=start_block: g._dfs_match_check(b), None)
+
+        holes = holes_board(grid_class)
+        benchmarks[f'{kind}/apply_gravity/holes'] = (holes.apply_gravity, lambda g=holes, s=holes.snapshot(): g.restore(s))
+
+        cascade, _ = cascade_board(grid_class)
+        benchmarks[f'{kind}/check_and_clear/cascade'] = (
+            cascade.check_and_clear_matches, lambda g=cascade, s=cascade.snapshot(): g.restore(s))
+
+        piece = piece_board(grid_class)
+        benchmarks[f'{kind}/move_left_right'] = (
+            lambda g=piece: (g.move_active_shape(-1, 0), g.move_active_shape(1, 0)), None)
+        benchmarks[f'{kind}/rotate'] = (piece.rotate_active_shape, None)
+    return benchmarks
+
+
+def render_benchmarks():
+    """ชุดการวาดบน Surface นอกจอ (None ถ้าไม่มี pygame)"""
+    try:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        import pygame
+        import geomatch_full as ui
+    except ImportError:
+        return None
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    ui.build_block_atlas()
+    ui.build_overlays((ui.SCREEN_WIDTH, ui.SCREEN_HEIGHT))
+    surface = pygame.Surface((ui.SCREEN_WIDTH, ui.SCREEN_HEIGHT)).convert()
+    benchmarks = {}
+    for name, grid in (('typical', typical_board(Grid)), ('full_same', full_same_board(Grid))):
+        benchmarks[f'render/draw_grid/{name}'] = (lambda g=grid: ui.draw_grid(surface, g, 50, 50), None)
+    block = _block('Star', GRID_WIDTH // 2, GRID_HEIGHT // 2)
+    benchmarks['render/draw_block'] = (lambda: ui.draw_block(surface, block, 50, 50), None)
+    return benchmarks
+
+
+def run_benchmarks(name_filter=None, min_time=DEFAULT_MIN_TIME, repeat=DEFAULT_REPEAT, log=print):
+    benchmarks = engine_benchmarks()
+    rendering = render_benchmarks()
+    if rendering is None:
+        log("WARNING: pygame not available, skipping render benchmarks")
+    else:
+        benchmarks.update(rendering)
+
+    results = {}
+    for name, (step, reset) in benchmarks.items():
+        if name_filter and name_filter not in name:
+            continue
+        best, median, calls = measure(step, reset, min_time, repeat)
+        results[name] = {'us': best * 1e6, 'median_us': median * 1e6, 'calls': calls}
+        log(f"{name:45s} {best * 1e6:10.2f} us  (median {median * 1e6:.2f}, {calls} calls)")
+    return {
+        'version': BENCH_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+
+# ====================================================================
+# 4. BASELINE COMPARISON
+# ====================================================================
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """คืน (แถวเปรียบเทียบ, รายชื่อที่ช้าลงเกิน threshold)"""
+    rows = []
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            rows.append((name, None, result['us'], None))
+            continue
+        ratio = result['us'] / base['us'] - 1
+        rows.append((name, base['us'], result['us'], ratio))
+        if ratio > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def _load(path):
+    with open(path) as result_file:
+        data = json.load(result_file)
+    if data.get('version') != BENCH_VERSION:
+        raise ValueError(f"'{path}' is not a version {BENCH_VERSION} benchmark file")
+    return data
+
+
+def _save(data, path):
+    with open(path, 'w') as result_file:
+        json.dump(data, result_file, indent=1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark GeoMatch hot paths and compare against a baseline.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help="run the benchmarks and save the results")
+    run_parser.add_argument('--out', default=DEFAULT_OUT)
+    compare_parser = commands.add_parser('compare', help="fail if results regress against a baseline")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current', nargs='?', help="saved results (default: run the benchmarks now)")
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                                help="allowed slowdown as a fraction (0.2 = 20%%)")
+    compare_parser.add_argument('--out', help="also save the fresh results here")
+    for sub in (run_parser, compare_parser):
+        sub.add_argument('--filter', help="only benchmarks whose name contains this text")
+        sub.add_argument('--min-time', type=float, default=DEFAULT_MIN_TIME, help="seconds per repeat")
+        sub.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        results = run_benchmarks(args.filter, args.min_time, args.repeat)
+        _save(results, args.out)
+        print(f"Saved {len(results['results'])} results to '{args.out}'")
+        return 0
+
+    baseline = _load(args.baseline)
+    if args.current:
+        current = _load(args.current)
+    else:
+        current = run_benchmarks(args.filter, args.min_time, args.repeat)
+        if args.out:
+            _save(current, args.out)
+    rows, regressions = compare(baseline, current, args.threshold)
+    print(f"{'benchmark':45s} {'baseline':>10s} {'current':>10s} {'change':>8s}")
+    for name, base_us, current_us, ratio in rows:
+        base_text = '-' if base_us is None else f"{base_us:.2f}"
+        change = 'new' if ratio is None else f"{ratio * 100:+.1f}%"
+        flag = '  REGRESSION' if name in regressions else ''
+        print(f"{name:45s} {base_text:>10s} {current_us:10.2f} {change:>8s}{flag}")
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:.0%}")
+        return 1
+    print("No regressions.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""GeoMatch Effects: เอฟเฟกต์ตอนเคลียร์ (Particle กระจาย, แถวของ Diamond สว่างวาบ, ป้ายคะแนน/Combo)
+
+- Particle ทุกตัวอยู่ใน Array ของ NumPy ขนาดคงที่ที่จองไว้ตอนสร้าง (ตำแหน่ง, ความเร็ว, อายุ, สี)
+  อัปเดตทั้ง Pool ด้วยการคำนวณแบบ Vectorized ครั้งเดียวต่อเฟรม ไม่มี Object ต่อ Particle
+  Pool เต็ม = Particle ใหม่ส่วนที่เกินถูกทิ้ง (หน่วยความจำไม่โตตามจำนวนการเคลียร์)
+- วาดด้วย Surface.blits() ครั้งเดียวจาก Sprite ที่สร้างไว้แล้ว (สี x ระดับความจาง) และตัดที่ขอบ area
+- เฟรมก่อนหน้าใช้เวลาเกิน frame_budget = ข้ามการวาดเอฟเฟกต์ทั้งหมด (อายุยังนับต่อ จึงไม่ค้างบนจอ)
+- draw() คืนช่อง (คอลัมน์, แถว) ของ area ที่ถูกวาดทับ ให้ตัววาดแบบ Dirty Rect วาดช่องนั้นใหม่ในเฟรมถัดไป
+
+ตัวอย่าง:
+    effects = ClearEffects(grid_rect, BLOCK_SIZE, COLOR_MAP)   # หลัง set_mode
+    effects.burst([(x, y), ...], ['RED', ...])                 # จุดกึ่งกลางของบล็อกที่หายไป
+    effects.flash_row(row_top_y)
+    effects.popup(text_surface, (x, y))
+    effects.update(frame_seconds)
+    tiles = effects.draw(screen, last_frame_work_seconds)
+"""
+
+from collections import deque
+
+import pygame
+
+from geomatch_engine import np
+
+# จำนวน Particle สูงสุดที่มีพร้อมกัน
+DEFAULT_CAPACITY = 1024
+PARTICLES_PER_BLOCK = 6
+PARTICLE_SIZE = 4
+PARTICLE_LIFE = 0.5        # วินาที
+PARTICLE_SPEED = 180.0     # พิกเซล/วินาที
+PARTICLE_GRAVITY = 700.0   # พิกเซล/วินาที^2
+# จำนวนระดับความจางของ Sprite (ค่าความโปร่งแสงคิดไว้ล่วงหน้า ไม่ต้อง set_alpha ตอนวาด)
+FADE_LEVELS = 4
+
+ROW_FLASH_SECONDS = 0.25
+ROW_FLASH_ALPHA = 160
+POPUP_SECONDS = 0.8
+POPUP_RISE = 50.0          # พิกเซล/วินาที
+# จำนวนแถวสว่างวาบและป้ายที่แสดงพร้อมกันได้ (ตัวเก่าสุดหายก่อน)
+MAX_ROW_FLASHES = 8
+MAX_POPUPS = 6
+
+# เวลาทำงานของเฟรมก่อนหน้า (ไม่รวมเวลารอ clock.tick) ที่ยังวาดเอฟเฟกต์ได้ (วินาที)
+DEFAULT_FRAME_BUDGET = 0.012
+
+
+class ClearEffects:
+    """Pool ของ Particle + แถวสว่างวาบ + ป้ายลอย สำหรับพื้นที่ area ที่แบ่งเป็นช่องขนาด tile พิกเซล"""
+
+    def __init__(self, area, tile, palette, capacity=DEFAULT_CAPACITY,
+                 frame_budget=DEFAULT_FRAME_BUDGET, seed=None):
+        if np is None:
+            raise ImportError("ClearEffects requires numpy (pip install numpy)")
+        self.area = pygame.Rect(area)
+        self.tile = tile
+        self.columns = -(-self.area.width // tile)
+        self.rows = -(-self.area.height // tile)
+        self.capacity = capacity
+        self.frame_budget = frame_budget
+        # RNG ของภาพเท่านั้น: ไม่แตะ RNG ของกระดาน (Replay ยังตรงทุกบิต)
+        self.rng = np.random.default_rng(seed)
+
+        self.count = 0
+        self.x = np.zeros(capacity, dtype=np.float32)
+        self.y = np.zeros(capacity, dtype=np.float32)
+        self.vx = np.zeros(capacity, dtype=np.float32)
+        self.vy = np.zeros(capacity, dtype=np.float32)
+        self.life = np.zeros(capacity, dtype=np.float32)
+        self.max_life = np.ones(capacity, dtype=np.float32)
+        self.color = np.zeros(capacity, dtype=np.int16)
+        self._arrays = (self.x, self.y, self.vx, self.vy, self.life, self.max_life, self.color)
+
+        # Sprite ของ Particle: index = สี * FADE_LEVELS + ระดับ (0 = จางที่สุด)
+        self.color_index = {name: i for i, name in enumerate(palette)}
+        self.sprites = []
+        for rgb in palette.values():
+            for level in range(FADE_LEVELS):
+                self.sprites.append(self._tinted((PARTICLE_SIZE, PARTICLE_SIZE), rgb,
+                                                 255 * (level + 1) // FADE_LEVELS))
+        self.flash_sprites = [
+            self._tinted((self.area.width, tile), (255, 255, 255), ROW_FLASH_ALPHA * (level + 1) // FADE_LEVELS)
+            for level in range(FADE_LEVELS)
+        ]
+        # [top_y, อายุ] และ [surface, จุดกึ่งกลาง x, y, อายุ]
+        self.flashes = deque(maxlen=MAX_ROW_FLASHES)
+        self.popups = deque(maxlen=MAX_POPUPS)
+        self.skipped_frames = 0
+
+    @staticmethod
+    def _tinted(size, rgb, alpha):
+        surf = pygame.Surface(size)
+        surf.fill(rgb)
+        surf.set_alpha(alpha)
+        if pygame.display.get_surface() is not None:
+            surf = surf.convert()
+        return surf
+
+    @property
+    def active(self):
+        return bool(self.count or self.flashes or self.popups)
+
+    def clear(self):
+        self.count = 0
+        self.flashes.clear()
+        self.popups.clear()
+
+    def burst(self, centers, colors):
+        """เพิ่ม PARTICLES_PER_BLOCK ตัวต่อจุด centers [(x, y)] สีตามชื่อใน colors"""
+        free = self.capacity - self.count
+        total = min(len(centers) * PARTICLES_PER_BLOCK, free)
+        if total <= 0:
+            return
+        start, end = self.count, self.count + total
+        origin = np.repeat(np.asarray(centers, dtype=np.float32), PARTICLES_PER_BLOCK, axis=0)[:total]
+        color = np.repeat([self.color_index.get(name, 0) for name in colors], PARTICLES_PER_BLOCK)[:total]
+        angle = self.rng.uniform(0.0, 2 * np.pi, total)
+        speed = self.rng.uniform(0.4, 1.0, total) * PARTICLE_SPEED
+        life = self.rng.uniform(0.6, 1.0, total) * PARTICLE_LIFE
+
+        self.x[start:end] = origin[:, 0] - PARTICLE_SIZE / 2
+        self.y[start:end] = origin[:, 1] - PARTICLE_SIZE / 2
+        self.vx[start:end] = np.cos(angle) * speed
+        # เอียงขึ้นเล็กน้อยก่อนตกตามแรงโน้มถ่วง
+        self.vy[start:end] = np.sin(angle) * speed - PARTICLE_SPEED / 2
+        self.life[start:end] = life
+        self.max_life[start:end] = life
+        self.color[start:end] = color
+        self.count = end
+
+    def flash_row(self, top_y):
+        self.flashes.append([top_y, 0.0])
+
+    def popup(self, surface, center):
+        # เลื่อนเข้ามาให้ทั้งป้ายอยู่ใน area ตามแนวนอน (ถ้ากว้างพอ)
+        half = surface.get_width() // 2
+        center_x = max(self.area.left + half, min(center[0], self.area.right - half))
+        self.popups.append([surface, center_x, center[1], 0.0])
+
+    def update(self, dt):
+        """เดินเวลาของเอฟเฟกต์ทั้งหมด dt วินาที และย้าย Particle ที่ยังอยู่ไปต้น Array"""
+        n = self.count
+        if n:
+            life = self.life[:n]
+            life -= dt
+            vy = self.vy[:n]
+            vy += PARTICLE_GRAVITY * dt
+            self.x[:n] += self.vx[:n] * dt
+            self.y[:n] += vy * dt
+            alive = life > 0
+            if not alive.all():
+                keep = np.flatnonzero(alive)
+                for array in self._arrays:
+                    array[:len(keep)] = array[:n][keep]
+                self.count = len(keep)
+
+        for effects, lifetime in ((self.flashes, ROW_FLASH_SECONDS), (self.popups, POPUP_SECONDS)):
+            for effect in effects:
+                effect[-1] += dt
+            # ตัวเก่าอยู่ซ้ายสุดเสมอ
+            while effects and effects[0][-1] >= lifetime:
+                effects.popleft()
+
+    def draw(self, screen, frame_seconds=0.0):
+        """วาดเอฟเฟกต์ทับ screen (ตัดที่ขอบ area) และคืน [(คอลัมน์, แถว)] ของช่องใน area ที่ถูกวาดทับ
+
+        frame_seconds: เวลาทำงานของเฟรมก่อนหน้า เกิน frame_budget = ไม่วาดอะไรเลย
+        """
+        if not self.active:
+            return []
+        if frame_seconds > self.frame_budget:
+            self.skipped_frames += 1
+            return []
+
+        area, tile = self.area, self.tile
+        old_clip = screen.get_clip()
+        screen.set_clip(area)
+        tiles = set()
+
+        for top_y, age in self.flashes:
+            level = min(FADE_LEVELS - 1, int((1.0 - age / ROW_FLASH_SECONDS) * FADE_LEVELS))
+            screen.blit(self.flash_sprites[level], (area.x, top_y))
+            tiles.update(self._tiles_of(pygame.Rect(area.x, top_y, area.width, tile)))
+
+        n = self.count
+        if n:
+            level = (self.life[:n] / self.max_life[:n] * FADE_LEVELS).astype(np.int32)
+            np.clip(level, 0, FADE_LEVELS - 1, out=level)
+            index = self.color[:n] * FADE_LEVELS + level
+            xs = self.x[:n].astype(np.int32)
+            ys = self.y[:n].astype(np.int32)
+            # (sprite, (x, y)) สร้างด้วย zip/map ทั้งหมด ไม่มีลูปของ Python ต่อ Particle
+            screen.blits(zip(map(self.sprites.__getitem__, index.tolist()), zip(xs.tolist(), ys.tolist())),
+                         doreturn=False)
+            tiles.update(self._particle_tiles(xs, ys))
+
+        for surface, center_x, center_y, age in self.popups:
+            rect = surface.get_rect(center=(center_x, int(center_y - POPUP_RISE * age)))
+            screen.blit(surface, rect)
+            tiles.update(self._tiles_of(rect))
+
+        screen.set_clip(old_clip)
+        return list(tiles)
+
+    def _tiles_of(self, rect):
+        area, tile = self.area, self.tile
+        left = max(0, (rect.left - area.x) // tile)
+        right = min(self.columns - 1, (rect.right - 1 - area.x) // tile)
+        top = max(0, (rect.top - area.y) // tile)
+        bottom = min(self.rows - 1, (rect.bottom - 1 - area.y) // tile)
+        return [(column, row) for column in range(left, right + 1) for row in range(top, bottom + 1)]
+
+    def _particle_tiles(self, xs, ys):
+        # ช่องของมุมซ้ายบนและขวาล่างของทุก Particle (Particle เล็กกว่า 1 ช่อง จึงทับได้ไม่เกิน 4 ช่อง)
+        area, tile = self.area, self.tile
+        left = (xs - area.x) // tile
+        right = (xs + PARTICLE_SIZE - 1 - area.x) // tile
+        top = (ys - area.y) // tile
+        bottom = (ys + PARTICLE_SIZE - 1 - area.y) // tile
+        columns = np.concatenate((left, right, left, right))
+        rows = np.concatenate((top, top, bottom, bottom))
+        inside = (columns >= 0) & (columns < self.columns) & (rows >= 0) & (rows < self.rows)
+        columns, rows = divmod(np.unique(columns[inside] * self.rows + rows[inside]), self.rows)
+        return zip(columns.tolist(), rows.tolist())
@@ -0,0 +1,1445 @@
+"""GeoMatch Engine: กลไกเกมที่ไม่ขึ้นกับ Pygame (ใช้ได้ทั้งเกมจริงและโหมด Headless)"""
+
+import random
+import struct
+import time
+from itertools import compress
+
+try:
+    import numpy as np
+except ImportError:  # numpy เป็นตัวเลือกเสริม ใช้เฉพาะกระดานแบบ ArrayGrid
+    np = None
+
+# ====================================================================
+# 1. CONSTANTS (ค่าคงที่)
+# ====================================================================
+
+# การตั้งค่ากระดานและวัตถุ
+SHAPES = ['Triangle', 'Square', 'Circle', 'Pentagon', 'Star', 'Diamond']
+COLORS = {'Triangle': 'RED', 'Square': 'BLUE', 'Circle': 'PINK', 'Pentagon': 'YELLOW', 'Star': 'PURPLE', 'Diamond': 'WHITE'}
+
+# รหัสรูปทรงสำหรับกระดานแบบ Array (0 = ช่องว่าง)
+SHAPE_CODES = {shape: i + 1 for i, shape in enumerate(SHAPES)}
+
+# น้ำหนักการสุ่มรูปทรง (Diamond ออกน้อยกว่า)
+DEFAULT_SPAWN_WEIGHTS = [10] * (len(SHAPES) - 1) + [3]
+
+GRID_WIDTH = 12
+GRID_HEIGHT = 22 # 2 แถวบนสุดใช้สำหรับ Spawn
+SPAWN_ROWS = 2   # Lock ในแถวเหล่านี้ = Game Over
+MIN_MATCH = 4    # ขนาดกลุ่มที่เล็กที่สุดที่เคลียร์ได้
+
+# เพื่อนบ้าน 8 ทิศของการหากลุ่ม
+NEIGHBOUR_OFFSETS = ((-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (1, 1), (-1, 1), (1, -1))
+
+# ค่าเริ่มต้นของเกม
+DEFAULT_FALL_SPEED = 0.5
+DEFAULT_TARGET_SCORE = 2000
+DEFAULT_TIME_LIMIT = 180.0
+
+# ====================================================================
+# 2. CLASS GameRules
+# ====================================================================
+
+class GameRules:
+    """ขนาดกระดานและกติกาการเคลียร์ + ตาราง Lookup ของขนาดนั้นที่คำนวณครั้งเดียวตอนสร้าง
+    
+    ช่อง (x, y) มี Flat Index = x * height + y (ลำดับเดียวกับ ArrayGrid.codes และ snapshot)
+    ตารางเพื่อนบ้านมีเฉพาะช่องที่อยู่ในกระดาน จึงไม่ต้องตรวจขอบเขตระหว่าง Flood Fill
+    กระดานหลายขนาด/หลายกติกาใช้พร้อมกันในโปรเซสเดียวได้ (แต่ละ Grid อ้างถึง rules ของตัวเอง)
+    """
+
+    # กติกาที่สร้างผ่าน for_size() แชร์กันตามค่า (Simulator สร้างกระดานจำนวนมาก)
+    _SHARED = {}
+
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT, spawn_rows=SPAWN_ROWS, min_match=MIN_MATCH):
+        self.width = width
+        self.height = height
+        self.spawn_rows = spawn_rows
+        self.min_match = min_match
+
+        # neighbours[i] = Flat Index ของเพื่อนบ้าน, neighbour_cells[i] = (x, y) ของเพื่อนบ้านชุดเดียวกัน
+        neighbour_cells = []
+        for x in range(width):
+            for y in range(height):
+                neighbour_cells.append(tuple(
+                    (x + dx, y + dy) for dx, dy in NEIGHBOUR_OFFSETS
+                    if 0 <= x + dx < width and 0 <= y + dy < height
+                ))
+        self.neighbour_cells = tuple(neighbour_cells)
+        self.neighbours = tuple(tuple(nx * height + ny for nx, ny in cells) for cells in neighbour_cells)
+        # ช่วงของแต่ละคอลัมน์ในข้อมูลแบบ Flat (เช่น Grid._cell_bytes())
+        self.column_spans = tuple(slice(x * height, (x + 1) * height) for x in range(width))
+
+        # Mask ของ BitboardGrid: บิตของช่อง (x, y) = x * stride + y (มีบิตกั้นท้ายทุกคอลัมน์)
+        # row_masks ใช้เคลียร์แถวของ Diamond
+        self.stride = stride = height + 1
+        self.column_mask = (1 << height) - 1
+        self.board_mask = sum(self.column_mask << (x * stride) for x in range(width))
+        self.row_masks = tuple(sum(1 << (x * stride + y) for x in range(width)) for y in range(height))
+
+    @classmethod
+    def for_size(cls, width=GRID_WIDTH, height=GRID_HEIGHT, spawn_rows=SPAWN_ROWS, min_match=MIN_MATCH):
+        """คืน GameRules ที่แชร์กันสำหรับค่าชุดนี้ (สร้างตารางครั้งเดียวต่อชุด)"""
+        key = (width, height, spawn_rows, min_match)
+        rules = cls._SHARED.get(key)
+        if rules is None:
+            rules = cls._SHARED[key] = cls(*key)
+        return rules
+
+    def __repr__(self):
+        return (f"GameRules({self.width}x{self.height}, spawn_rows={self.spawn_rows}, "
+                f"min_match={self.min_match})")
+
+# ====================================================================
+# 3. CLASS ShapeBlock
+# ====================================================================
+
+# Match Key แบบจำนวนเต็มที่ intern ไว้: (รูปทรง, สี) <-> รหัส
+# คู่มาตรฐานใช้รหัสเดียวกับ SHAPE_CODES จึงเก็บลงกระดานแบบ Array ได้ตรงๆ
+MATCH_KEYS = {(shape, COLORS[shape]): code for shape, code in SHAPE_CODES.items()}
+MATCH_KEY_PAIRS = [None] + [(shape, COLORS[shape]) for shape in SHAPES]
+
+def intern_match_key(shape_type, color):
+    """คืนรหัสของคู่ (รูปทรง, สี) และสร้างรหัสใหม่ถ้ายังไม่เคยเห็นคู่นี้"""
+    key = MATCH_KEYS.get((shape_type, color))
+    if key is None:
+        key = len(MATCH_KEY_PAIRS)
+        MATCH_KEYS[(shape_type, color)] = key
+        MATCH_KEY_PAIRS.append((shape_type, color))
+    return key
+
+# Zobrist Hash: ค่า 64 บิตคงที่ต่อ (match_key, x, y) ได้จาก SplitMix64 ของพิกัด
+# จึงเหมือนกันทุกครั้งที่รันและไม่ขึ้นกับลำดับที่ถูกเรียก
+_MASK64 = (1 << 64) - 1
+_ZOBRIST_KEYS = {}
+
+def zobrist_key(match_key, x, y):
+    """คืนค่า Zobrist ของบล็อกที่มี match_key ที่ช่อง (x, y)"""
+    cell = (match_key, x, y)
+    value = _ZOBRIST_KEYS.get(cell)
+    if value is None:
+        value = (((match_key << 40) | (x << 20) | y) + 0x9E3779B97F4A7C15) & _MASK64
+        value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+        value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+        value ^= value >> 31
+        _ZOBRIST_KEYS[cell] = value
+    return value
+
+def _hash_cells(cells, height):
+    # Zobrist Hash ของ Match Key แบบ 1 ไบต์ต่อช่อง (รูปแบบเดียวกับ Grid.snapshot)
+    zobrist = 0
+    for index in compress(range(len(cells)), cells):
+        zobrist ^= zobrist_key(cells[index], *divmod(index, height))
+    return zobrist
+
+def popcount(bits):
+    return bin(bits).count('1')
+
+if hasattr(int, 'bit_count'):  # Python 3.10+
+    popcount = int.bit_count
+
+def _is_settled(bits, height):
+    # บิตของคอลัมน์ (บิต y = ช่อง y มีบล็อก) เรียงติดกันลงถึงพื้นโดยไม่มีช่องว่างคั่น
+    return bits == 0 or bits + (bits & -bits) == 1 << height
+
+# Snapshot: Header (width, height, จำนวนบล็อกของ Active Shape, Zobrist Hash)
+# + Match Key 1 ไบต์ต่อช่อง เรียงทีละคอลัมน์ (x แล้ว y แบบเดียวกับ ArrayGrid.codes)
+# + (x, y, match_key) ของแต่ละบล็อกของ Active Shape
+_SNAPSHOT_HEADER = struct.Struct('<HHBQ')
+_SNAPSHOT_BLOCK = struct.Struct('<HHB')
+
+class ShapeBlock:
+    """แทนวัตถุ 1 ชิ้น (1x1) บนกระดาน"""
+
+    # ไม่มี __dict__ ต่อชิ้น: เล็กลงและอ่าน Attribute ได้เร็วขึ้น
+    __slots__ = ('x', 'y', 'shape_type', 'color', 'is_special', 'match_key')
+    
+    def __init__(self, x, y, shape_type, color):
+        self.x = x
+        self.y = y
+        self.shape_type = shape_type
+        self.color = color
+        self.is_special = (shape_type == 'Diamond')
+        # บล็อกที่ตรงกัน = match_key เท่ากัน (เทียบจำนวนเต็มครั้งเดียว)
+        self.match_key = intern_match_key(shape_type, color)
+        
+    def get_match_key(self):
+        return self.match_key
+    
+    def __repr__(self):
+        return f"({self.shape_type[:3]}/{self.color[:3]} @ {self.x},{self.y})"
+
+# ====================================================================
+# 4. CLASS Grid
+# ====================================================================
+
+class Grid:
+    """จัดการกระดานเกมและกลไกหลัก"""
+    
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT, spawn_weights=None, seed=None, rules=None):
+        # rules: GameRules ของกระดานนี้ (None = กติกามาตรฐานขนาด width x height)
+        self.rules = rules = rules or GameRules.for_size(width, height)
+        width = self.width = rules.width
+        height = self.height = rules.height
+        self.spawn_weights = list(spawn_weights or DEFAULT_SPAWN_WEIGHTS)
+        # RNG ของกระดานนี้เอง: Seed เดียวกันได้ลำดับชิ้นเดียวกันเสมอ
+        self.rng = random.Random(seed)
+        self.grid_matrix = [[None for _ in range(height)] for _ in range(width)] 
+        self.active_shape_blocks = []
+        self.last_combo_count = 0  # จำนวนรอบ Cascade ของการ Lock ครั้งล่าสุด
+        # Index ของแต่ละคอลัมน์: columns[x] บิต y = ช่อง (x, y) มีบล็อก
+        # และ Bitmask ของคอลัมน์ที่อาจมีช่องว่างคั่น (Gravity ทำเฉพาะคอลัมน์เหล่านี้)
+        self.columns = [0] * width
+        self._loose_columns = 0
+        # Zobrist Hash ของบล็อกที่วางแล้ว อัปเดตทีละช่องใน Lock, การเคลียร์ และ Gravity
+        self.zobrist = 0
+        # ตัวนับสำหรับ Profiler (ผู้อ่านเป็นคนรีเซ็ต)
+        self.dfs_nodes = 0
+        self.match_seconds = 0.0
+        
+    def is_valid_position(self, x, y):
+        # ใช้สำหรับการตรวจสอบการ Spawn และการ Lock
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return False
+        return self.grid_matrix[x][y] is None
+
+    def _set_block(self, x, y, block):
+        # กระดานแบบอื่น (ArrayGrid, BitboardGrid) เขียนลงที่เก็บของตัวเองโดยตรง
+        old = self.grid_matrix[x][y]
+        if old is not None:
+            self.zobrist ^= zobrist_key(old.match_key, x, y)
+        if block is not None:
+            self.zobrist ^= zobrist_key(block.match_key, x, y)
+        self.grid_matrix[x][y] = block
+        self._index_cell(x, y, block is not None)
+
+    def _index_cell(self, x, y, occupied):
+        bits = self.columns[x] | (1 << y) if occupied else self.columns[x] & ~(1 << y)
+        self.columns[x] = bits
+        if not _is_settled(bits, self.height):
+            self._loose_columns |= 1 << x
+
+    def _column_bits(self, x):
+        """บิตของช่องที่มีบล็อกในคอลัมน์ x (บิต y = แถว y)"""
+        return self.columns[x]
+
+    def _shape_fits(self, cells):
+        """ตรวจทั้งรูปทรง (หลังเลื่อน/หมุน) ในรอบเดียว: ทุกช่องต้องอยู่ในกระดานและว่าง
+        
+        Active Shape ยังไม่อยู่ใน grid_matrix จนกว่าจะ Lock จึงไม่ต้องยกเว้นบล็อกของตัวเอง
+        """
+        width, height = self.width, self.height
+        grid_matrix = self.grid_matrix
+        for x, y in cells:
+            if not (0 <= x < width and 0 <= y < height) or grid_matrix[x][y] is not None:
+                return False
+        return True
+
+    def _active_shape_fits(self, dx, dy):
+        """เหมือน _shape_fits สำหรับ Active Shape ที่เลื่อนไป (dx, dy) โดยไม่สร้างรายการพิกัด"""
+        width, height = self.width, self.height
+        grid_matrix = self.grid_matrix
+        for block in self.active_shape_blocks:
+            x = block.x + dx
+            y = block.y + dy
+            if not (0 <= x < width and 0 <= y < height) or grid_matrix[x][y] is not None:
+                return False
+        return True
+
+    def spawn_new_shape(self):
+        num_blocks = self.rng.randint(1, 3)
+        start_x = self.width // 2
+        
+        selected_type = self.rng.choices(SHAPES, weights=self.spawn_weights, k=1)[0]
+        selected_color = COLORS[selected_type]
+
+        new_blocks = []
+        for i in range(num_blocks):
+            block = ShapeBlock(start_x, 0 + i, selected_type, selected_color) 
+            new_blocks.append(block)
+        
+        self.active_shape_blocks = new_blocks
+        
+        # ชิ้นใหม่เป็นแนวตั้งที่แถว 0.. เสมอ: ตรวจการชนด้วย Index ของคอลัมน์ครั้งเดียว
+        if self._column_bits(start_x) & ((1 << num_blocks) - 1):
+            return "GAME_OVER"
+
+    def move_active_shape(self, dx, dy):
+        # ตรวจขอบเขตและการชนกับบล็อกที่วางอยู่แล้วของทั้งรูปทรงพร้อมกัน
+        if not self._active_shape_fits(dx, dy):
+            return False
+
+        for block in self.active_shape_blocks:
+            block.x += dx
+            block.y += dy
+        return True
+
+    def rotate_active_shape(self):
+        # ⚠️ แก้ไขเมธอดนี้เพื่อให้การหมุนทำงานได้ถูกต้อง
+        if not self.active_shape_blocks or len(self.active_shape_blocks) == 1:
+            return
+        
+        pivot_block = self.active_shape_blocks[0]
+        new_positions = []
+        
+        for block in self.active_shape_blocks:
+            rel_x = block.x - pivot_block.x
+            rel_y = block.y - pivot_block.y
+            
+            # Rotate 90 degrees counter-clockwise: (rel_x, rel_y) -> (-rel_y, rel_x)
+            new_rel_x = -rel_y
+            new_rel_y = rel_x
+            
+            new_positions.append((pivot_block.x + new_rel_x, pivot_block.y + new_rel_y))
+
+        # ตรวจขอบเขต (รวมถึงแถวบนที่มองไม่เห็น) และการชนของทั้งรูปทรงในรอบเดียว
+        if not self._shape_fits(new_positions):
+            return
+
+        # อัปเดตตำแหน่งจริง
+        for i, block in enumerate(self.active_shape_blocks):
+            block.x, block.y = new_positions[i]
+
+    def drop_active_shape(self):
+        return self.move_active_shape(0, 1)
+
+    def landing_distance(self):
+        """จำนวนแถวที่ Active Shape ตกได้จนลงจอด (อ่านจาก Index ของคอลัมน์ ไม่ต้องลองเลื่อนทีละแถว)"""
+        height = self.height
+        distance = height
+        for block in self.active_shape_blocks:
+            below = self._column_bits(block.x) >> (block.y + 1)
+            # ช่องว่างใต้บล็อกนี้จนถึงบล็อกแรกด้านล่าง (หรือพื้น)
+            free = (below & -below).bit_length() - 1 if below else height - 1 - block.y
+            if free < distance:
+                distance = free
+        return distance if self.active_shape_blocks else 0
+
+    def hard_drop(self):
+        """เลื่อน Active Shape ลงถึงจุดลงจอดทันที (ยังไม่ Lock) และคืนจำนวนแถวที่ตก"""
+        distance = self.landing_distance()
+        for block in self.active_shape_blocks:
+            block.y += distance
+        return distance
+
+    def ghost_cells(self):
+        """ช่องที่ Active Shape จะลงจอดถ้าตกตรงลงไป (สำหรับวาด Ghost Piece)"""
+        distance = self.landing_distance()
+        return [(block.x, block.y + distance) for block in self.active_shape_blocks]
+
+    def column_heights(self):
+        """ความสูงของกองในแต่ละคอลัมน์ (นับจากพื้นถึงบล็อกบนสุด)"""
+        heights = []
+        for x in range(self.width):
+            bits = self._column_bits(x)
+            heights.append(self.height - (bits & -bits).bit_length() + 1 if bits else 0)
+        return heights
+
+    def lock_shape(self):
+        """วาง Active Shape และตรวจสอบ Game Over"""
+        locked_blocks = self.place_active_shape()
+        if locked_blocks == "GAME_OVER":
+            return locked_blocks
+        
+        # ก่อน Lock กระดานไม่มีกลุ่มที่ตรงกันค้างอยู่ จึงตรวจเฉพาะกลุ่มที่แตะบล็อกที่เพิ่งวาง
+        total_cleared_score = self.check_and_clear_matches(locked_blocks)
+        return total_cleared_score
+
+    def place_active_shape(self):
+        """วาง Active Shape ลงกระดานโดยยังไม่เคลียร์ คืนบล็อกที่วาง หรือ "GAME_OVER" (ใช้กับ Cascade)"""
+        for block in self.active_shape_blocks:
+            self._set_block(block.x, block.y, block)
+            
+            if block.y < self.rules.spawn_rows:
+                self.active_shape_blocks = []
+                return "GAME_OVER" 
+                
+        locked_blocks = self.active_shape_blocks
+        self.active_shape_blocks = []
+        return locked_blocks
+
+    def check_and_clear_matches(self, seed_blocks=None):
+        """เคลียร์กลุ่มที่ตรงกันแบบ Cascade จนจบในครั้งเดียว (แบบแบ่งทีละขั้นดู Cascade)
+        
+        seed_blocks: บล็อกที่เพิ่งเปลี่ยนตำแหน่ง (None = ตรวจทั้งกระดาน)
+        """
+        start = time.perf_counter()
+        score = 0
+        combo_count = 0
+        
+        while True:
+            # _clear_blocks คืนจำนวนที่เคลียร์ (0 = ไม่มีกลุ่มที่ตรงกันแล้ว) ใช้ได้กับทุกแบบของกระดาน
+            points = self._clear_blocks(self._find_all_matches(seed_blocks))
+            if points == 0:
+                break
+
+            score += self._calculate_combo_score(points, combo_count)
+            
+            # กลุ่มใหม่หลัง Gravity ต้องมีบล็อกที่ถูกเลื่อนอย่างน้อย 1 ชิ้นเสมอ
+            seed_blocks = self.apply_gravity()
+            combo_count += 1
+            
+        self.last_combo_count = combo_count
+        self.match_seconds += time.perf_counter() - start
+        return score
+
+    def _find_all_matches(self, seed_blocks=None):
+        cleared_blocks = set()
+        visited = set()
+        min_match = self.rules.min_match
+        
+        if seed_blocks is None:
+            seed_blocks = [block for column in self.grid_matrix for block in column if block]
+        
+        for block in seed_blocks:
+            # บล็อกในกลุ่มที่ตรวจไปแล้ว (ทั้งกลุ่มเล็กและใหญ่) ไม่ต้อง Flood ซ้ำ
+            if block in visited:
+                continue
+            match_group = self._dfs_match_check(block)
+            visited.update(match_group)
+            if len(match_group) >= min_match:
+                for matched_block in match_group:
+                    if matched_block.is_special:
+                        self._add_horizontal_row_to_clear(matched_block.y, cleared_blocks)
+                
+                cleared_blocks.update(match_group)
+                        
+        return cleared_blocks
+
+    def _dfs_match_check(self, start_block):
+        stack = [start_block]
+        visited = {start_block}
+        group = []
+        match_key = start_block.match_key
+        # ตารางของ rules มีเฉพาะเพื่อนบ้านที่อยู่ในกระดาน
+        neighbour_cells = self.rules.neighbour_cells
+        height = self.height
+        grid_matrix = self.grid_matrix
+
+        while stack:
+            current = stack.pop()
+            group.append(current)
+
+            for nx, ny in neighbour_cells[current.x * height + current.y]:
+                neighbor = grid_matrix[nx][ny]
+                if neighbor is not None and neighbor.match_key == match_key and neighbor not in visited:
+                    visited.add(neighbor)
+                    stack.append(neighbor)
+        
+        self.dfs_nodes += len(group)
+        return group
+    
+    def _add_horizontal_row_to_clear(self, y_row, cleared_set):
+        for column in self.grid_matrix:
+            block = column[y_row]
+            if block is not None:
+                cleared_set.add(block)
+
+    def _clear_blocks(self, blocks_to_clear):
+        cleared_count = len(blocks_to_clear)
+        columns = self.columns
+        touched = 0
+        for block in blocks_to_clear:
+            x, y = block.x, block.y
+            self.zobrist ^= zobrist_key(block.match_key, x, y)
+            self.grid_matrix[x][y] = None
+            columns[x] &= ~(1 << y)
+            touched |= 1 << x
+        self._loose_columns |= touched
+        return cleared_count
+
+    def _match_count(self, matches):
+        # จำนวนบล็อกในผลของ _find_all_matches (รูปแบบต่างกันในแต่ละแบบของกระดาน)
+        return len(matches)
+
+    def _match_cells(self, matches):
+        return [(block.x, block.y) for block in matches]
+
+    def _calculate_combo_score(self, cleared_count, combo_count):
+        if cleared_count >= 8: base_score = 500
+        elif cleared_count >= 6: base_score = 250
+        else: base_score = 100
+        
+        if combo_count == 1: multiplier = 1.5 
+        elif combo_count >= 2: multiplier = 2.0
+        else: multiplier = 1.0
+
+        return int(base_score * multiplier)
+
+    def apply_gravity(self):
+        """ให้บล็อกตกลงด้านล่าง และคืนรายการบล็อกที่ถูกเลื่อนตำแหน่ง
+        
+        ทำเฉพาะคอลัมน์ที่ถูกเคลียร์หรือมีช่องว่างคั่น (คอลัมน์อื่นชิดพื้นอยู่แล้ว)
+        """
+        moved_blocks = []
+        height = self.height
+        loose = self._loose_columns
+        self._loose_columns = 0
+        while loose:
+            low_bit = loose & -loose
+            loose ^= low_bit
+            x = low_bit.bit_length() - 1
+            count = popcount(self.columns[x])
+            settled = ((1 << count) - 1) << (height - count)
+            if self.columns[x] == settled:
+                continue
+            blocks_in_col = [block for block in self.grid_matrix[x] if block is not None]
+            self.grid_matrix[x] = [None] * (height - count) + blocks_in_col
+            self.columns[x] = settled
+                
+            for new_y, block in enumerate(blocks_in_col, height - count):
+                if block.y != new_y:
+                    moved_blocks.append(block)
+                    self.zobrist ^= zobrist_key(block.match_key, x, block.y) ^ zobrist_key(block.match_key, x, new_y)
+                block.y = new_y
+        return moved_blocks
+
+    def snapshot(self):
+        """คืนสถานะกระดาน + Active Shape เป็น bytes ขนาดเล็กในเวลา O(จำนวนช่อง)
+        
+        รูปแบบเดียวกันทุกแบบของกระดาน และกระดานเดียวกันได้ bytes เดียวกันเสมอ (ใช้เป็น Key ได้)
+        ไม่รวม RNG: ใช้ rng.getstate() แยกถ้าต้องการลำดับชิ้นถัดไปเดิมด้วย
+        """
+        active = self.active_shape_blocks
+        parts = [_SNAPSHOT_HEADER.pack(self.width, self.height, len(active), self.zobrist), self._cell_bytes()]
+        parts.extend(_SNAPSHOT_BLOCK.pack(block.x, block.y, block.match_key) for block in active)
+        return b''.join(parts)
+
+    def restore(self, data):
+        """โหลดกระดาน, Active Shape และ Zobrist Hash จาก snapshot()"""
+        width, height, n_active, zobrist = _SNAPSHOT_HEADER.unpack_from(data)
+        if (width, height) != (self.width, self.height):
+            raise ValueError(f"snapshot is {width}x{height}, grid is {self.width}x{self.height}")
+        pos = _SNAPSHOT_HEADER.size
+        cells = bytes(data[pos:pos + width * height])
+        self._load_cells(cells)
+        pos += width * height
+        active = []
+        for _ in range(n_active):
+            x, y, match_key = _SNAPSHOT_BLOCK.unpack_from(data, pos)
+            pos += _SNAPSHOT_BLOCK.size
+            shape_type, color = MATCH_KEY_PAIRS[match_key]
+            active.append(ShapeBlock(x, y, shape_type, color))
+        self.active_shape_blocks = active
+        self.zobrist = zobrist
+
+    def copy(self):
+        """คืนสำเนากระดาน + Active Shape ในหน่วยความจำ (RNG ของสำเนาเริ่มใหม่ ไม่ได้คัดลอก)"""
+        clone = self.__class__(spawn_weights=self.spawn_weights, seed=0, rules=self.rules)
+        clone.grid_matrix = [
+            [ShapeBlock(b.x, b.y, b.shape_type, b.color) if b else None for b in column]
+            for column in self.grid_matrix
+        ]
+        clone.active_shape_blocks = [ShapeBlock(b.x, b.y, b.shape_type, b.color) for b in self.active_shape_blocks]
+        clone.zobrist = self.zobrist
+        clone.columns = list(self.columns)
+        clone._loose_columns = self._loose_columns
+        return clone
+
+    def rehash(self):
+        """คำนวณ Zobrist Hash และ Index ของคอลัมน์ใหม่ทั้งกระดาน (หลังเขียน grid_matrix ตรงๆ โดยไม่ผ่าน _set_block)"""
+        cells = self._cell_bytes()
+        self.zobrist = _hash_cells(cells, self.height)
+        self._index_columns(cells)
+        return self.zobrist
+
+    def _index_columns(self, cells):
+        # สร้าง columns และ _loose_columns ใหม่จาก Match Key 1 ไบต์ต่อช่อง
+        height = self.height
+        rows = range(height)
+        self.columns = [sum(1 << y for y in compress(rows, cells[span])) for span in self.rules.column_spans]
+        self._loose_columns = sum(
+            1 << x for x, bits in enumerate(self.columns) if not _is_settled(bits, height)
+        )
+
+    def _cell_bytes(self):
+        return bytes([0 if block is None else block.match_key for column in self.grid_matrix for block in column])
+
+    def _load_cells(self, cells):
+        height = self.height
+        grid_matrix = [[None] * height for _ in range(self.width)]
+        for index in compress(range(len(cells)), cells):
+            x, y = divmod(index, height)
+            shape_type, color = MATCH_KEY_PAIRS[cells[index]]
+            grid_matrix[x][y] = ShapeBlock(x, y, shape_type, color)
+        self.grid_matrix = grid_matrix
+        self._index_columns(cells)
+
+class _GridColumnView:
+    """คอลัมน์ของ grid_matrix สำหรับกระดานแบบ Array (สร้าง ShapeBlock เมื่อถูกอ่าน)"""
+
+    def __init__(self, grid, x):
+        self._grid = grid
+        self._x = x
+
+    def __len__(self):
+        return self._grid.height
+
+    def __getitem__(self, y):
+        return self._grid._block_at(self._x, y)
+
+    def __setitem__(self, y, block):
+        self._grid._set_block(self._x, y, block)
+
+    def __iter__(self):
+        for y in range(self._grid.height):
+            yield self._grid._block_at(self._x, y)
+
+
+class _GridMatrixView:
+    """ทำให้ grid_matrix[x][y] ใช้งานได้เหมือน list of lists เดิม"""
+
+    def __init__(self, grid):
+        self._grid = grid
+
+    def __len__(self):
+        return self._grid.width
+
+    def __getitem__(self, x):
+        return _GridColumnView(self._grid, x)
+
+    def __iter__(self):
+        for x in range(self._grid.width):
+            yield _GridColumnView(self._grid, x)
+
+
+class ArrayGrid(Grid):
+    """กระดานแบบ NumPy: Match Key แบบ int8 + Mask ของบล็อกพิเศษ
+    
+    Gravity, การเคลียร์ และการเคลียร์แถวของ Diamond ทำแบบ Vectorized
+    เหมาะกับกระดานขนาดใหญ่กว่า GRID_WIDTH x GRID_HEIGHT
+    """
+
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT, spawn_weights=None, seed=None, rules=None):
+        if np is None:
+            raise ImportError("ArrayGrid requires numpy (pip install numpy)")
+        self.rules = rules = rules or GameRules.for_size(width, height)
+        width = self.width = rules.width
+        height = self.height = rules.height
+        self.spawn_weights = list(spawn_weights or DEFAULT_SPAWN_WEIGHTS)
+        self.rng = random.Random(seed)
+        self.codes = np.zeros((width, height), dtype=np.int8)
+        self.special = np.zeros((width, height), dtype=bool)
+        self.active_shape_blocks = []
+        self.last_combo_count = 0
+        self.columns = [0] * width
+        self._loose_columns = 0
+        self.zobrist = 0
+        self.dfs_nodes = 0
+        self.match_seconds = 0.0
+
+    @property
+    def grid_matrix(self):
+        return _GridMatrixView(self)
+
+    def _block_at(self, x, y):
+        code = int(self.codes[x, y])
+        if code == 0:
+            return None
+        shape_type, color = MATCH_KEY_PAIRS[code]
+        return ShapeBlock(x, y, shape_type, color)
+
+    def _set_block(self, x, y, block):
+        old = int(self.codes[x, y])
+        if old:
+            self.zobrist ^= zobrist_key(old, x, y)
+        if block is None:
+            self.codes[x, y] = 0
+            self.special[x, y] = False
+        else:
+            self.codes[x, y] = block.match_key
+            self.special[x, y] = block.is_special
+            self.zobrist ^= zobrist_key(block.match_key, x, y)
+        self._index_cell(x, y, block is not None)
+
+    def is_valid_position(self, x, y):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return False
+        return self.codes[x, y] == 0
+
+    def _shape_fits(self, cells):
+        # อ่าน codes ตรงๆ แทนการสร้าง ShapeBlock ผ่าน grid_matrix
+        width, height = self.width, self.height
+        codes = self.codes
+        for x, y in cells:
+            if not (0 <= x < width and 0 <= y < height) or codes[x, y]:
+                return False
+        return True
+
+    def _active_shape_fits(self, dx, dy):
+        width, height = self.width, self.height
+        codes = self.codes
+        for block in self.active_shape_blocks:
+            x = block.x + dx
+            y = block.y + dy
+            if not (0 <= x < width and 0 <= y < height) or codes[x, y]:
+                return False
+        return True
+
+    def _find_all_matches(self, seed_blocks=None):
+        """คืนพิกัด (N, 2) ของช่องที่ต้องเคลียร์
+        
+        seed_blocks: บล็อกที่มี .x/.y หรือ Mask จาก apply_gravity (None = ทั้งกระดาน)
+        """
+        occupied = self.codes != 0
+        height = self.height
+        # Flat Index (x * height + y) ตรงกับลำดับของ codes.ravel() และตารางของ rules
+        if seed_blocks is None:
+            seeds = np.flatnonzero(occupied).tolist()
+        elif isinstance(seed_blocks, np.ndarray):
+            seeds = np.flatnonzero(seed_blocks & occupied).tolist()
+        else:
+            seeds = [block.x * height + block.y for block in seed_blocks]
+
+        codes = self.codes.ravel().tolist()
+        special = self.special.ravel()
+        min_match = self.rules.min_match
+        visited = set()
+        cleared = np.zeros_like(occupied)
+        flat_cleared = cleared.ravel()
+        diamond_rows = set()
+
+        for index in seeds:
+            if index in visited or codes[index] == 0:
+                continue
+            group = self._flood_group(codes, index)
+            visited.update(group)
+            if len(group) >= min_match:
+                cells = np.fromiter(group, dtype=np.intp, count=len(group))
+                flat_cleared[cells] = True
+                diamond_rows.update((cells[special[cells]] % height).tolist())
+
+        for y_row in diamond_rows:
+            self._add_horizontal_row_to_clear(y_row, cleared)
+
+        return np.argwhere(cleared)
+
+    def _flood_group(self, codes, start):
+        # DFS 8 ทิศบน list แบบ Flat ของรหัส (เร็วกว่าการอ่าน ndarray ทีละช่อง) คืน Flat Index ของกลุ่ม
+        match_key = codes[start]
+        neighbours = self.rules.neighbours
+        stack = [start]
+        group = {start}
+
+        while stack:
+            for neighbour in neighbours[stack.pop()]:
+                if codes[neighbour] == match_key and neighbour not in group:
+                    group.add(neighbour)
+                    stack.append(neighbour)
+
+        self.dfs_nodes += len(group)
+        return group
+
+    def _dfs_match_check(self, start_block):
+        height = self.height
+        group = self._flood_group(self.codes.ravel().tolist(), start_block.x * height + start_block.y)
+        return [self._block_at(*divmod(index, height)) for index in group]
+
+    def _add_horizontal_row_to_clear(self, y_row, cleared_set):
+        cleared_set[:, y_row] |= self.codes[:, y_row] != 0
+
+    def _match_cells(self, matches):
+        return [tuple(cell) for cell in matches.tolist()]
+
+    def _clear_blocks(self, blocks_to_clear):
+        xs, ys = blocks_to_clear[:, 0], blocks_to_clear[:, 1]
+        columns = self.columns
+        touched = 0
+        for x, y, match_key in zip(xs.tolist(), ys.tolist(), self.codes[xs, ys].tolist()):
+            self.zobrist ^= zobrist_key(match_key, x, y)
+            columns[x] &= ~(1 << y)
+            touched |= 1 << x
+        self._loose_columns |= touched
+        self.codes[xs, ys] = 0
+        self.special[xs, ys] = False
+        return len(blocks_to_clear)
+
+    def apply_gravity(self):
+        """บีบแต่ละคอลัมน์ลงด้านล่างแบบ Vectorized และคืน Mask ของช่องที่ถูกเลื่อน
+        
+        ทั้งกระดานในครั้งเดียว (เร็วกว่าเลือกเฉพาะคอลัมน์ด้วย Fancy Indexing) แต่ข้ามเมื่อทุกคอลัมน์ชิดพื้นแล้ว
+        """
+        height = self.height
+        loose = self._loose_columns
+        if not loose:
+            return np.zeros((self.width, height), dtype=bool)
+        self._loose_columns = 0
+        # argsort แบบ stable: ช่องว่าง (False) ขึ้นบน บล็อกเรียงลำดับเดิมลงล่าง
+        order = np.argsort(self.codes != 0, axis=1, kind='stable')
+        self.codes = np.take_along_axis(self.codes, order, axis=1)
+        self.special = np.take_along_axis(self.special, order, axis=1)
+        moved = (order != np.arange(height)) & (self.codes != 0)
+        xs, ys = np.nonzero(moved)
+        for x, y, old_y, match_key in zip(xs.tolist(), ys.tolist(), order[xs, ys].tolist(), self.codes[xs, ys].tolist()):
+            self.zobrist ^= zobrist_key(match_key, x, old_y) ^ zobrist_key(match_key, x, y)
+        counts = np.count_nonzero(self.codes, axis=1).tolist()
+        while loose:
+            low_bit = loose & -loose
+            loose ^= low_bit
+            x = low_bit.bit_length() - 1
+            self.columns[x] = ((1 << counts[x]) - 1) << (height - counts[x])
+        return moved
+
+    def copy(self):
+        clone = self.__class__(spawn_weights=self.spawn_weights, seed=0, rules=self.rules)
+        clone.codes = self.codes.copy()
+        clone.special = self.special.copy()
+        clone.active_shape_blocks = [ShapeBlock(b.x, b.y, b.shape_type, b.color) for b in self.active_shape_blocks]
+        clone.zobrist = self.zobrist
+        clone.columns = list(self.columns)
+        clone._loose_columns = self._loose_columns
+        return clone
+
+    def _cell_bytes(self):
+        return self.codes.tobytes()
+
+    def _load_cells(self, cells):
+        self.codes = np.frombuffer(cells, dtype=np.int8).reshape(self.width, self.height).copy()
+        is_special = np.array([pair is not None and pair[0] == 'Diamond' for pair in MATCH_KEY_PAIRS])
+        self.special = is_special[self.codes]
+        self._index_columns(cells)
+
+
+class BitboardGrid(Grid):
+    """กระดานแบบ Bitboard: จำนวนเต็ม Python 1 ตัวต่อ Match Key + Mask ของช่องที่มีบล็อกและบล็อกพิเศษ
+    
+    บิตของช่อง (x, y) อยู่ที่ x * stride + y โดย stride = height + 1 (มีบิตกั้นท้ายทุกคอลัมน์)
+    การชนใช้ AND, การหากลุ่ม 8 ทิศใช้ Flood Fill ด้วย Shift + Mask,
+    Gravity บีบแต่ละคอลัมน์ทีละช่องว่าง และแถวของ Diamond เป็น Row Mask
+    """
+
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT, spawn_weights=None, seed=None, rules=None):
+        self.rules = rules = rules or GameRules.for_size(width, height)
+        self.width = rules.width
+        self.height = rules.height
+        self.spawn_weights = list(spawn_weights or DEFAULT_SPAWN_WEIGHTS)
+        self.rng = random.Random(seed)
+        # Mask ของขนาดกระดานนี้คำนวณไว้ใน rules แล้ว (Simulator สร้างกระดานสำเนาจำนวนมาก)
+        self.stride = rules.stride
+        self.column_mask, self.board_mask, self.row_masks = rules.column_mask, rules.board_mask, rules.row_masks
+        # layers[match_key] = บิตของบล็อกที่มี Match Key นั้น (ช่อง 0 ไม่ใช้)
+        self.layers = [0] * len(MATCH_KEY_PAIRS)
+        self.occupied = 0
+        self.special = 0
+        self.active_shape_blocks = []
+        self.last_combo_count = 0
+        self.zobrist = 0
+        self.dfs_nodes = 0
+        self.match_seconds = 0.0
+
+    @property
+    def grid_matrix(self):
+        return _GridMatrixView(self)
+
+    def _bit(self, x, y):
+        return 1 << (x * self.stride + y)
+
+    def _column_bits(self, x):
+        # occupied เป็น Index ของคอลัมน์อยู่แล้ว
+        return (self.occupied >> (x * self.stride)) & self.column_mask
+
+    def _index_columns(self, cells):
+        pass
+
+    def _block_at(self, x, y):
+        bit = self._bit(x, y)
+        if not self.occupied & bit:
+            return None
+        for match_key, layer in enumerate(self.layers):
+            if layer & bit:
+                shape_type, color = MATCH_KEY_PAIRS[match_key]
+                return ShapeBlock(x, y, shape_type, color)
+
+    def _set_block(self, x, y, block):
+        bit = self._bit(x, y)
+        if self.occupied & bit:
+            self._clear_blocks(bit)
+        if block is None:
+            return
+        while block.match_key >= len(self.layers):
+            self.layers.append(0)
+        self.layers[block.match_key] |= bit
+        self.occupied |= bit
+        if block.is_special:
+            self.special |= bit
+        self.zobrist ^= zobrist_key(block.match_key, x, y)
+
+    def is_valid_position(self, x, y):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return False
+        return not self.occupied & self._bit(x, y)
+
+    def _shape_fits(self, cells):
+        width, height, stride = self.width, self.height, self.stride
+        shape_bits = 0
+        for x, y in cells:
+            if not (0 <= x < width and 0 <= y < height):
+                return False
+            shape_bits |= 1 << (x * stride + y)
+        return not shape_bits & self.occupied
+
+    def _active_shape_fits(self, dx, dy):
+        width, height, stride = self.width, self.height, self.stride
+        occupied = self.occupied
+        for block in self.active_shape_blocks:
+            x = block.x + dx
+            y = block.y + dy
+            if not (0 <= x < width and 0 <= y < height) or (occupied >> (x * stride + y)) & 1:
+                return False
+        return True
+
+    def _dilate(self, bits):
+        # ขยาย 1 ช่องทั้ง 8 ทิศ: แนวตั้ง (Shift 1) แล้วแนวนอน (Shift stride) ได้กรอบ 3x3 รวมแนวทแยง
+        vertical = (bits | (bits << 1) | (bits >> 1)) & self.board_mask
+        stride = self.stride
+        return (vertical | (vertical << stride) | (vertical >> stride)) & self.board_mask
+
+    def _flood_bits(self, start_bit, layer):
+        group = start_bit
+        while True:
+            grown = self._dilate(group) & layer
+            if grown == group:
+                break
+            group = grown
+        self.dfs_nodes += popcount(group)
+        return group
+
+    def _bits_of(self, blocks):
+        stride = self.stride
+        bits = 0
+        for block in blocks:
+            bits |= 1 << (block.x * stride + block.y)
+        return bits
+
+    def _find_all_matches(self, seed_blocks=None):
+        """คืน Bitmask ของช่องที่ต้องเคลียร์
+        
+        seed_blocks: บล็อกที่มี .x/.y หรือ Bitmask จาก apply_gravity (None = ทั้งกระดาน)
+        """
+        if seed_blocks is None:
+            seeds = self.occupied
+        elif isinstance(seed_blocks, int):
+            seeds = seed_blocks & self.occupied
+        else:
+            seeds = self._bits_of(seed_blocks)
+
+        cleared = 0
+        diamonds = 0
+        board_mask, stride = self.board_mask, self.stride
+        min_match = self.rules.min_match
+        for layer in self.layers:
+            if not layer & seeds or popcount(layer) < min_match:
+                continue
+            pending = layer & seeds
+            if min_match > 1:
+                # ตัดบล็อกที่ไม่มีเพื่อนบ้านชนิดเดียวกันเลยทิ้งในครั้งเดียว (กลุ่มขนาด 1 ไม่ต้อง Flood)
+                vertical = ((layer << 1) | (layer >> 1)) & board_mask
+                column = layer | vertical
+                pending &= vertical | (((column << stride) | (column >> stride)) & board_mask)
+            while pending:
+                group = self._flood_bits(pending & -pending, layer)
+                pending &= ~group
+                if popcount(group) >= min_match:
+                    cleared |= group
+                    diamonds |= group & self.special
+
+        # Diamond ในกลุ่มที่เคลียร์ = เคลียร์ทั้งแถวนั้นด้วย
+        while diamonds:
+            low_bit = diamonds & -diamonds
+            diamonds ^= low_bit
+            cleared |= self.row_masks[(low_bit.bit_length() - 1) % self.stride] & self.occupied
+
+        return cleared
+
+    def _dfs_match_check(self, start_block):
+        bit = self._bit(start_block.x, start_block.y)
+        group = self._flood_bits(bit, self.layers[start_block.match_key])
+        return [self._block_at(*self._cell_of(low_bit)) for low_bit in self._iter_bits(group)]
+
+    def _cell_of(self, bit):
+        return divmod(bit.bit_length() - 1, self.stride)
+
+    def _iter_bits(self, bits):
+        while bits:
+            low_bit = bits & -bits
+            bits ^= low_bit
+            yield low_bit
+
+    def _add_horizontal_row_to_clear(self, y_row, cleared_set):
+        return cleared_set | (self.row_masks[y_row] & self.occupied)
+
+    def _match_count(self, matches):
+        return popcount(matches)
+
+    def _match_cells(self, matches):
+        return [self._cell_of(bit) for bit in self._iter_bits(matches)]
+
+    def _clear_blocks(self, blocks_to_clear):
+        if not blocks_to_clear:
+            return 0
+        self.zobrist ^= self._hash_bits(blocks_to_clear)
+        keep = ~blocks_to_clear
+        self.layers = [layer & keep for layer in self.layers]
+        self.occupied &= keep
+        self.special &= keep
+        return popcount(blocks_to_clear)
+
+    def apply_gravity(self):
+        """บีบแต่ละคอลัมน์ลงด้านล่าง (ปิดช่องว่างทีละช่วง) และคืน Bitmask ของช่องที่ถูกเลื่อน
+        
+        ทุก Layer และ special ถูกต่อเป็นจำนวนเต็มตัวเดียว (ช่วงละ width * stride บิต)
+        การเลื่อน 1 ช่วงจึงเป็น AND + Shift ครั้งเดียวสำหรับทุก Match Key
+        และ Zobrist Hash อัปเดตเฉพาะบิตที่เปลี่ยนจริงหลังบีบครบทุกคอลัมน์
+        """
+        height, stride, column_mask = self.height, self.stride, self.column_mask
+        slot = self.width * stride
+        moved = 0
+        packed = None
+        for x in range(self.width):
+            start = x * stride
+            column = (self.occupied >> start) & column_mask
+            count = popcount(column)
+            # คอลัมน์ที่บล็อกชิดพื้นอยู่แล้ว (ตรวจด้วย popcount) ไม่ต้องทำอะไร
+            if column == ((1 << count) - 1) << (height - count):
+                continue
+            if packed is None:
+                # เฉพาะ Layer ที่มีบล็อก (special ต่อท้ายถ้ามี) ตัวที่ต่อกันจึงเล็กที่สุด
+                keys = [match_key for match_key, layer in enumerate(self.layers) if layer]
+                layers = [self.layers[match_key] for match_key in keys]
+                if self.special:
+                    layers.append(self.special)
+                packed = 0
+                for layer in reversed(layers):
+                    packed = (packed << slot) | layer
+                # บิต 1 ที่ต้นทุกช่วง: segment * repeat = segment ซ้ำในทุก Layer
+                repeat = ((1 << (len(layers) * slot)) - 1) // ((1 << slot) - 1)
+            column_repeat = repeat << start
+            # บล็อกที่อยู่ใต้ช่องว่างล่างสุดไม่ขยับ ที่เหลือคือบล็อกที่ถูกเลื่อน
+            lowest_hole = (~column & column_mask).bit_length() - 1
+            settled = ((1 << count) - 1) << (height - count)
+            moved |= (settled & ((1 << (lowest_hole + 1)) - 1)) << start
+            while True:
+                # ช่องว่างล่างสุด และบล็อกล่างสุดที่อยู่เหนือช่องนั้น
+                hole_y = (~column & column_mask).bit_length() - 1
+                above = column & ((1 << hole_y) - 1)
+                if not above:
+                    break
+                gap = hole_y - (above.bit_length() - 1)
+                segment = (1 << (hole_y - gap + 1)) - 1
+                column = (column & ~segment) | ((column & segment) << gap)
+                # บิตที่เลื่อนไม่เกินช่อง hole_y จึงไม่ล้นไปช่วงของ Layer ถัดไป
+                packed_segment = segment * column_repeat
+                packed = (packed & ~packed_segment) | ((packed & packed_segment) << gap)
+            self.occupied = (self.occupied & ~(column_mask << start)) | (settled << start)
+        if packed is None:
+            return 0
+
+        slot_mask = (1 << slot) - 1
+        zobrist = self.zobrist
+        new_layers = list(self.layers)
+        for match_key, old_layer in zip(keys, layers):
+            layer = packed & slot_mask
+            packed >>= slot
+            new_layers[match_key] = layer
+            # Hash: XOR ช่องที่ Layer นี้เปลี่ยน (บล็อกที่ออกจากช่องเดิม + ที่เข้าช่องใหม่)
+            if old_layer != layer:
+                zobrist ^= self._hash_layer(match_key, old_layer ^ layer)
+        if self.special:
+            self.special = packed & slot_mask
+        self.layers = new_layers
+        self.zobrist = zobrist
+        return moved
+
+    # ค่า Zobrist เรียงตามตำแหน่งบิต ต่อ (width, height, match_key) (บิตกั้น = 0)
+    _ZOBRIST_BITS = {}
+
+    def _zobrist_bits(self, match_key):
+        table = self._ZOBRIST_BITS.get((self.width, self.height, match_key))
+        if table is None:
+            table = [0] * (self.width * self.stride)
+            for x in range(self.width):
+                for y in range(self.height):
+                    table[x * self.stride + y] = zobrist_key(match_key, x, y)
+            self._ZOBRIST_BITS[(self.width, self.height, match_key)] = table
+        return table
+
+    # ค่า Zobrist รวมต่อไบต์: [ไบต์ที่ i][ค่าของไบต์] = XOR ของทุกบิตที่ตั้งในไบต์นั้น ต่อ (width, height, match_key)
+    _ZOBRIST_BYTES = {}
+
+    def _zobrist_bytes(self, match_key):
+        rows = self._ZOBRIST_BYTES.get((self.width, self.height, match_key))
+        if rows is None:
+            table = self._zobrist_bits(match_key) + [0] * 8
+            rows = []
+            for start in range(0, self.width * self.stride, 8):
+                row = [0] * 256
+                for value in range(1, 256):
+                    low_bit = value & -value
+                    row[value] = row[value ^ low_bit] ^ table[start + low_bit.bit_length() - 1]
+                rows.append(row)
+            self._ZOBRIST_BYTES[(self.width, self.height, match_key)] = rows
+        return rows
+
+    def _hash_layer(self, match_key, bits):
+        # XOR ของค่า Zobrist ของบล็อก match_key ที่บิต bits: ดูตารางครั้งเดียวต่อไบต์ที่ไม่เป็นศูนย์
+        rows = self._zobrist_bytes(match_key)
+        data = bits.to_bytes(len(rows), 'little')
+        zobrist = 0
+        for index in compress(range(len(rows)), data):
+            zobrist ^= rows[index][data[index]]
+        return zobrist
+
+    def _hash_bits(self, bits):
+        # XOR ของค่า Zobrist ของทุกบล็อกในบิต bits
+        zobrist = 0
+        for match_key, layer in enumerate(self.layers):
+            found = layer & bits
+            if found:
+                zobrist ^= self._hash_layer(match_key, found)
+        return zobrist
+
+    def copy(self):
+        # int เปลี่ยนค่าไม่ได้ จึงแชร์กันได้เลย (เร็วกว่าแปลงผ่าน snapshot)
+        clone = self.__class__(spawn_weights=self.spawn_weights, seed=0, rules=self.rules)
+        clone.layers = list(self.layers)
+        clone.occupied = self.occupied
+        clone.special = self.special
+        clone.zobrist = self.zobrist
+        clone.active_shape_blocks = [ShapeBlock(b.x, b.y, b.shape_type, b.color) for b in self.active_shape_blocks]
+        return clone
+
+    def _cell_bytes(self):
+        height, stride = self.height, self.stride
+        cells = bytearray(self.width * height)
+        for match_key, layer in enumerate(self.layers):
+            while layer:
+                low_bit = layer & -layer
+                layer ^= low_bit
+                x, y = divmod(low_bit.bit_length() - 1, stride)
+                cells[x * height + y] = match_key
+        return bytes(cells)
+
+    def _load_cells(self, cells):
+        height, stride = self.height, self.stride
+        layers = [0] * max(len(MATCH_KEY_PAIRS), max(cells, default=0) + 1)
+        special = 0
+        for index in compress(range(len(cells)), cells):
+            match_key = cells[index]
+            x, y = divmod(index, height)
+            bit = 1 << (x * stride + y)
+            layers[match_key] |= bit
+            if MATCH_KEY_PAIRS[match_key][0] == 'Diamond':
+                special |= bit
+        self.layers = layers
+        self.occupied = 0
+        for layer in layers:
+            self.occupied |= layer
+        self.special = special
+
+# ====================================================================
+# 5. CLASS Cascade
+# ====================================================================
+
+class Cascade:
+    """Cascade ของการ Lock 1 ครั้งแบบทำต่อได้ทีละขั้น (แทน check_and_clear_matches ที่ทำจบในครั้งเดียว)
+    
+    ขั้นของ phase:
+        "CLEAR"  มีกลุ่มที่ตรงกันรอเคลียร์ (matched_cells() = ช่องที่จะหายไป)
+        "FALL"   เคลียร์แล้ว รอ Gravity
+        "DONE"   จบแล้ว (score, combo_count เป็นค่าสุดท้าย)
+    step() ทำ 1 ขั้น (งานไม่เกินการหากลุ่ม + Gravity 1 รอบ) คะแนนเท่ากับ check_and_clear_matches ทุกครั้ง
+    """
+
+    def __init__(self, grid, seed_blocks=None):
+        self.grid = grid
+        self.score = 0
+        self.combo_count = 0
+        self.matches = None
+        self.phase = None
+        # การหากลุ่มแรกทำทันที: Lock ที่ไม่มีอะไรเคลียร์ (กรณีส่วนใหญ่) จบใน Tick เดียวกับแบบเดิม
+        self._find(seed_blocks)
+
+    @property
+    def done(self):
+        return self.phase == "DONE"
+
+    def matched_cells(self):
+        """ช่องของกลุ่มที่กำลังจะถูกเคลียร์ (เฉพาะ phase "CLEAR")"""
+        if self.phase != "CLEAR":
+            return []
+        return self.grid._match_cells(self.matches)
+
+    def _find(self, seed_blocks):
+        grid = self.grid
+        start = time.perf_counter()
+        self.matches = grid._find_all_matches(seed_blocks)
+        if grid._match_count(self.matches):
+            self.phase = "CLEAR"
+        else:
+            self.phase = "DONE"
+            self.matches = None
+            grid.last_combo_count = self.combo_count
+        grid.match_seconds += time.perf_counter() - start
+
+    def step(self):
+        """ทำขั้นถัดไป และคืน True เมื่อ Cascade จบแล้ว"""
+        grid = self.grid
+        if self.phase == "CLEAR":
+            start = time.perf_counter()
+            points = grid._clear_blocks(self.matches)
+            self.score += grid._calculate_combo_score(points, self.combo_count)
+            self.matches = None
+            self.phase = "FALL"
+            grid.match_seconds += time.perf_counter() - start
+        elif self.phase == "FALL":
+            start = time.perf_counter()
+            seed_blocks = grid.apply_gravity()
+            self.combo_count += 1
+            grid.last_combo_count = self.combo_count
+            grid.match_seconds += time.perf_counter() - start
+            self._find(seed_blocks)
+        return self.done
+
+    def run(self):
+        """ทำทุกขั้นที่เหลือจนจบ และคืนคะแนนรวม"""
+        while not self.step():
+            pass
+        return self.score
+
+# ====================================================================
+# 6. AUDIO / EVENT SINKS
+# ====================================================================
+
+class NullAudio:
+    """Audio Sink ที่ไม่เล่นเสียง (ใช้ในโหมด Headless) มีเมธอดชุดเดียวกับ pygame.mixer.music"""
+
+    def get_volume(self):
+        return 0.0
+
+    def get_busy(self):
+        return False
+
+    def play(self, loops=0):
+        pass
+
+    def stop(self):
+        pass
+
+    def pause(self):
+        pass
+
+    def unpause(self):
+        pass
+
+    def set_volume(self, volume):
+        pass
+
+# ====================================================================
+# 7. CLASS GameManager
+# ====================================================================
+
+class GameManager:
+    """ควบคุม Game State, Score, Time, และ Input"""
+    
+    def __init__(self, grid_class=Grid, audio=None, event_sink=None,
+                 fall_speed=DEFAULT_FALL_SPEED, target_score=DEFAULT_TARGET_SCORE,
+                 time_limit=DEFAULT_TIME_LIMIT, spawn_weights=None, seed=None, recorder=None,
+                 cascade_step_time=None, rules=None):
+        # grid_class: Grid (ค่าเริ่มต้น), ArrayGrid (NumPy) หรือ BitboardGrid
+        # audio: อ็อบเจกต์แบบ pygame.mixer.music (None = ไม่มีเสียง)
+        # event_sink: ฟังก์ชัน event_sink(name, data) รับเหตุการณ์ของเกม
+        #             (CLEAR ของแต่ละขั้นของ Cascade ส่งเฉพาะเมื่อตั้ง cascade_step_time)
+        # seed: Seed ของทุกเกม (None = สุ่มใหม่ทุกครั้งที่ reset_game)
+        # recorder: ตัวบันทึก Replay (ดู geomatch_replay.ReplayRecorder)
+        # cascade_step_time: วินาทีต่อขั้นของ Cascade (ไม่เกิน 1 ขั้นต่อ Tick)
+        #                    None = เคลียร์ทั้ง Cascade ใน Tick ที่ Lock แบบเดิม (Headless/Simulator)
+        # rules: GameRules ของทุกกระดานในเกมนี้ (None = ขนาดและกติกามาตรฐาน)
+        self.grid_class = grid_class
+        self.rules = rules or GameRules.for_size()
+        self.audio = audio if audio is not None else NullAudio()
+        self.event_sink = event_sink
+        self.spawn_weights = spawn_weights
+        self.seed = seed
+        self.game_seed = seed
+        self.recorder = recorder
+        self.time_limit = time_limit
+        self.grid = self.new_grid()
+        self.score = 0
+        self.time_left = time_limit
+        self.target_score = target_score
+        # สถานะที่เป็นไปได้: "MENU", "RUNNING", "PAUSED", "LOSE", "WIN"
+        self.game_state = "MENU" 
+        self.fall_timer = 0
+        self.fall_speed = fall_speed
+        self.cascade_step_time = cascade_step_time
+        self.cascade = None  # Cascade ที่กำลังเคลียร์ (ระหว่างนี้ยังไม่มี Active Shape)
+        self.cascade_timer = 0
+
+    def new_grid(self, seed=None):
+        return self.grid_class(spawn_weights=self.spawn_weights, seed=seed, rules=self.rules)
+
+    def _emit(self, name, **data):
+        if self.event_sink is not None:
+            self.event_sink(name, data)
+
+    def reset_game(self):
+        """รีเซ็ตทุกอย่างเพื่อเริ่มเกมใหม่"""
+        self.game_seed = self.seed if self.seed is not None else random.getrandbits(63)
+        self.grid = self.new_grid(self.game_seed)
+        self.score = 0
+        self.time_left = self.time_limit
+        self.game_state = "RUNNING"
+        self.fall_timer = 0
+        self.cascade = None
+        if self.recorder is not None:
+            self.recorder.begin(self)
+        self.grid.spawn_new_shape() 
+        self._emit("RESET", seed=self.game_seed)
+
+        # Music Logic
+        if self.audio.get_volume() > 0:
+            if not self.audio.get_busy():
+                self.audio.play(-1)
+
+    def return_to_menu(self):
+        """กลับหน้าเมนูพร้อมกระดานว่าง"""
+        self.game_state = "MENU"
+        self.grid = self.new_grid()
+        self.cascade = None
+
+    def handle_input(self, action):
+        if self.game_state != "RUNNING":
+            return
+        if self.recorder is not None:
+            self.recorder.record_input(action)
+        if self.cascade is not None:
+            # ระหว่าง Cascade ยังไม่มีชิ้นให้บังคับ
+            return
+            
+        if action == 'LEFT':
+            self.grid.move_active_shape(-1, 0)
+        elif action == 'RIGHT':
+            self.grid.move_active_shape(1, 0)
+        elif action == 'DOWN':
+            self.grid.move_active_shape(0, 1)
+        elif action == 'ROTATE':
+            # ปุ่มลูกศรขึ้น (UP) สำหรับการหมุน
+            self.grid.rotate_active_shape()
+        elif action == 'HARD_DROP':
+            # ตกถึงจุดลงจอดทันที แล้ว Lock ใน Tick ถัดไป (ผ่านเส้นทางเดียวกับการตกปกติ)
+            self.grid.hard_drop()
+            self.fall_timer = self.fall_speed
+
+    def update(self, delta_time):
+        # ไม่ต้องอัปเดตเกมถ้าอยู่ในสถานะอื่นที่ไม่ใช่ RUNNING
+        if self.game_state != "RUNNING":
+            return
+        if self.recorder is not None:
+            # Recorder ปัดเวลาเป็นไมโครวินาที และคืนค่าที่ปัดแล้วเพื่อให้ Replay ตรงทุกบิต
+            delta_time = self.recorder.record_tick(delta_time)
+            
+        self.time_left -= delta_time
+        
+        if self.cascade is not None:
+            self._advance_cascade(delta_time)
+            self.check_win_or_lose()
+            return
+
+        self.fall_timer += delta_time
+        if self.fall_timer >= self.fall_speed:
+            if not self.grid.drop_active_shape():
+                
+                if self.cascade_step_time is None:
+                    lock_result = self.grid.lock_shape()
+                else:
+                    lock_result = self.grid.place_active_shape()
+                
+                if lock_result == "GAME_OVER":
+                    self.game_state = "LOSE" 
+                    self.audio.stop() 
+                    self._emit("LOSE", reason="LOCK_OUT")
+                    self.fall_timer = 0
+                    return 
+                    
+                if self.cascade_step_time is None:
+                    self._finish_lock(lock_result, self.grid.last_combo_count)
+                else:
+                    cascade = Cascade(self.grid, lock_result)
+                    if cascade.done:
+                        self._finish_lock(cascade.score, cascade.combo_count)
+                    else:
+                        self.cascade = cascade
+                        self.cascade_timer = 0
+                    
+            self.fall_timer = 0
+        
+        self.check_win_or_lose()
+
+    def _advance_cascade(self, delta_time):
+        # ทำ Cascade ต่อไม่เกิน 1 ขั้นต่อ Tick เมื่อครบ cascade_step_time (งานต่อ Tick จึงมีขอบเขต)
+        self.cascade_timer += delta_time
+        if self.cascade_timer < self.cascade_step_time:
+            return
+        self.cascade_timer = 0
+        cascade = self.cascade
+        if self.event_sink is not None and cascade.phase == "CLEAR":
+            # อ่านบล็อกก่อนถูกเคลียร์ (สำหรับเอฟเฟกต์) แล้วส่งพร้อมคะแนนของขั้นนี้
+            grid_matrix = self.grid.grid_matrix
+            blocks = [grid_matrix[x][y] for x, y in cascade.matched_cells()]
+            combo, score = cascade.combo_count, cascade.score
+            cascade.step()
+            self._emit("CLEAR", blocks=blocks, points=cascade.score - score, combo=combo)
+            return
+        if cascade.step():
+            self.cascade = None
+            self.fall_timer = 0
+            self._finish_lock(cascade.score, cascade.combo_count)
+
+    def _finish_lock(self, points, combo):
+        self.score += points
+        self._emit("LOCK", points=points, combo=combo)
+        
+        if self.grid.spawn_new_shape() == "GAME_OVER":
+            self.game_state = "LOSE"
+            self.audio.stop()
+            self._emit("LOSE", reason="BLOCK_OUT")
+
+    def check_win_or_lose(self):
+        if self.score >= self.target_score:
+            self.game_state = "WIN"
+            self.audio.stop()
+            self._emit("WIN")
+        elif self.time_left <= 0 and self.game_state != "LOSE":
+            self.game_state = "LOSE"
+            self.audio.stop()
+            self._emit("LOSE", reason="TIME_UP")
+
+    def step(self, action=None, delta_time=None):
+        """เดินเกม 1 Tick โดยไม่ใช้นาฬิกาจริง (โหมด Headless)
+        
+        action: 'LEFT', 'RIGHT', 'DOWN', 'ROTATE', 'HARD_DROP' หรือ None
+        delta_time: เวลาในเกมที่ผ่านไป (ค่าเริ่มต้น = fall_speed คือตก 1 ช่องต่อ Tick)
+        """
+        if action is not None:
+            self.handle_input(action)
+        self.update(self.fall_speed if delta_time is None else delta_time)
+        return self.game_state
+
+# ====================================================================
+# RUN EXECUTION (วัดความเร็วโหมด Headless)
+# ====================================================================
+
+if __name__ == '__main__':
+    import sys
+
+    n_games = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    actions = [None, 'LEFT', 'RIGHT', 'DOWN', 'ROTATE']
+    game_manager = GameManager()
+    start = time.perf_counter()
+    for _ in range(n_games):
+        game_manager.reset_game()
+        while game_manager.step(random.choice(actions)) == "RUNNING":
+            pass
+    elapsed = time.perf_counter() - start
+    print(f"{n_games} headless games in {elapsed:.2f}s ({n_games / elapsed:.0f} games/s)")
@@ -1,22 +1,24 @@
 import pygame
-import random
 import time
+import traceback
+from collections import OrderedDict
+
+from geomatch_engine import SHAPES, GRID_WIDTH, GRID_HEIGHT, SPAWN_ROWS, GameManager
+from geomatch_replay import ReplayRecorder
+from geomatch_profiler import FrameProfiler, SECTIONS, COUNTERS
+from geomatch_timestep import FixedTimestep
+from geomatch_assets import AssetLoader
+from geomatch_input import InputHandler
+from geomatch_effects import ClearEffects
 
 # ====================================================================
 # 1. CONSTANTS (ค่าคงที่)
 # ====================================================================
 
-# การตั้งค่ากระดานและวัตถุ
-SHAPES = ['Triangle', 'Square', 'Circle', 'Pentagon', 'Star', 'Diamond']
-COLORS = {'Triangle': 'RED', 'Square': 'BLUE', 'Circle': 'PINK', 'Pentagon': 'YELLOW', 'Star': 'PURPLE', 'Diamond': 'WHITE'}
-
-GRID_WIDTH = 12
-GRID_HEIGHT = 22 # 2 แถวบนสุดใช้สำหรับ Spawn
-
 # การตั้งค่า Pygame และการแสดงผล
 BLOCK_SIZE = 30
 SCREEN_WIDTH = GRID_WIDTH * BLOCK_SIZE + 300 
-SCREEN_HEIGHT = (GRID_HEIGHT - 2) * BLOCK_SIZE + 150 
+SCREEN_HEIGHT = (GRID_HEIGHT - SPAWN_ROWS) * BLOCK_SIZE + 150 
 
 # สี RGB
 BLACK = (0, 0, 0)
@@ -41,326 +43,150 @@ COLOR_MAP = {
 # 🎶 ไฟล์เพลงประกอบ
 MUSIC_FILE = 'Sis Puella Magica!.mp3'
 
-# 🖼️ Global Variables สำหรับภาพพื้นหลัง
+# 🎞️ ไฟล์ Replay ของเกมล่าสุด (เปิดดูด้วย geomatch_replay.py)
+REPLAY_FILE = 'last_game.gmr'
+
+# ⏱️ Profiler: F3 เปิด/ปิดตารางเวลา, F4 บันทึกเฟรมล่าสุดลงไฟล์ (.csv หรือ .json)
+PROFILE_FILE = 'frame_profile.csv'
+PROFILER_FONT_SIZE = 20
+PROFILER_REFRESH_FRAMES = 15   # อัปเดตตัวเลขบนจอทุก 15 เฟรม
+PROFILE_DUMP_FRAMES = 600      # ขณะเปิดตาราง บันทึกไฟล์ใหม่ทุก 600 เฟรม
+STALL_SECONDS = 0.1            # เฟรมที่นานกว่านี้จะพิมพ์รายละเอียดออกคอนโซล
+
+# 🕹️ ลอจิกเดินด้วย Tick คงที่ แยกจากอัตราการวาด (เล่นเหมือนกันที่ 30/60/144 FPS)
+TARGET_FPS = 60
+LOGIC_TICK_RATE = 120
+INTERPOLATE_FALL = True        # วาด Active Shape เลื่อนต่อเนื่องระหว่างช่องตามเวลาการตก
+SHOW_GHOST = True              # วาดเงาของ Active Shape ที่จุดลงจอด
+GHOST_ALPHA = 90
+CASCADE_STEP_SECONDS = 0.08    # Cascade เดินทีละขั้น (กลุ่มที่จะหายกะพริบก่อนเคลียร์ แล้วจึงตก) แทนการเคลียร์จบใน Tick เดียว
+FLASH_BRIGHTNESS = 110         # สีที่บวกเพิ่มให้บล็อกที่กำลังจะถูกเคลียร์
+SHOW_EFFECTS = True            # Particle, แถวของ Diamond สว่างวาบ และป้ายคะแนน/Combo ตอนเคลียร์ (ต้องมี numpy)
+EFFECTS_FRAME_BUDGET = 0.012   # เฟรมก่อนหน้าทำงานนานกว่านี้ (วินาที) = ข้ามการวาดเอฟเฟกต์เพื่อรักษา 60 FPS
+
+# 🎮 ปุ่ม -> Action ของ GameManager และการซ้ำเมื่อกดค้าง (วินาที)
+KEY_ACTIONS = {
+    pygame.K_LEFT: 'LEFT',
+    pygame.K_RIGHT: 'RIGHT',
+    pygame.K_DOWN: 'DOWN',
+    pygame.K_UP: 'ROTATE',
+    pygame.K_SPACE: 'HARD_DROP',
+}
+INPUT_DAS = 0.17   # กดค้างนานเท่านี้ก่อนเริ่มซ้ำ
+INPUT_ARR = 0.05   # จากนั้นซ้ำทุกๆ เท่านี้
+
+# 🖼️ Global Variables สำหรับภาพพื้นหลัง (None = ใช้พื้นดำไปก่อนระหว่างที่ AssetLoader โหลด)
 MENU_BG_IMAGE = None
 GAME_BG_IMAGE = None
+BACKGROUND_FILES = {'menu': 'menu_bg.jpg', 'game': 'game_bg.jpg'}
+
+# 🔤 ฟอนต์ที่โหลดแล้ว และ Cache ของข้อความที่ Render แล้ว (LRU)
+FONT_SIZE = 36
+HUD_FONT_SIZE = 28
+SMALL_FONT_SIZE = 24
+TEXT_CACHE_LIMIT = 256
+_FONTS = {}
+_TEXT_CACHE = OrderedDict()
+
+# 🪟 Overlay โปร่งแสงที่ใช้ซ้ำ: (width, height, alpha) -> Surface
+#    และกล่อง Pop-up ที่ประกอบแล้ว: kind -> (signature, Surface)
+GRID_OVERLAY_ALPHA = 50
+UI_OVERLAY_ALPHA = 100
+POPUP_OVERLAY_ALPHA = 150
+UI_PANEL_SIZE = (250, 200)
+_OVERLAYS = {}
+_POPUP_CACHE = {}
+
+# 🎆 ค่าใน DirtyRectRenderer.cells ของช่องที่เอฟเฟกต์วาดทับ (ไม่เท่ากับ Key ใดๆ จึงถูกวาดใหม่ในเฟรมถัดไป)
+_OVERDRAWN = ()
+
+# 🧱 Sprite Atlas ของบล็อก: (shape_type, color) หรือ (shape_type, color, 'ghost'/'flash') -> Surface ขนาด BLOCK_SIZE
+_BLOCK_ATLAS = {}
+_BLOCK_ATLAS_SIZE = None
 
 # ====================================================================
-# 2. CLASS ShapeBlock
+# 2. AUDIO (เชื่อม GameManager กับ pygame.mixer.music)
 # ====================================================================
 
-class ShapeBlock:
-    """แทนวัตถุ 1 ชิ้น (1x1) บนกระดาน"""
-    
-    def __init__(self, x, y, shape_type, color):
-        self.x = x
-        self.y = y
-        self.shape_type = shape_type
-        self.color = color
-        self.is_special = (shape_type == 'Diamond')
-        
-    def get_match_key(self):
-        return (self.shape_type, self.color)
-    
-    def __repr__(self):
-        return f"({self.shape_type[:3]}/{self.color[:3]} @ {self.x},{self.y})"
+class PygameAudio:
+    """Audio Sink ของเกมจริง: ส่งต่อคำสั่งไปยัง pygame.mixer.music"""
 
-# ====================================================================
-# 3. CLASS Grid
-# ====================================================================
+    def get_volume(self):
+        return pygame.mixer.music.get_volume()
 
-class Grid:
-    """จัดการกระดานเกมและกลไกหลัก"""
-    
-    def __init__(self):
-        self.grid_matrix = [[None for _ in range(GRID_HEIGHT)] for _ in range(GRID_WIDTH)] 
-        self.active_shape_blocks = []
-        
-    def is_valid_position(self, x, y):
-        # ใช้สำหรับการตรวจสอบการ Spawn และการ Lock
-        if not (0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT):
-            return False
-        return self.grid_matrix[x][y] is None
-
-    def spawn_new_shape(self):
-        num_blocks = random.randint(1, 3)
-        start_x = GRID_WIDTH // 2
-        
-        weights = [10] * (len(SHAPES) - 1) + [3] 
-        selected_type = random.choices(SHAPES, weights=weights, k=1)[0]
-        selected_color = COLORS[selected_type]
-
-        new_blocks = []
-        for i in range(num_blocks):
-            block = ShapeBlock(start_x, 0 + i, selected_type, selected_color) 
-            new_blocks.append(block)
-        
-        self.active_shape_blocks = new_blocks
-        
-        if not all(self.is_valid_position(b.x, b.y) for b in self.active_shape_blocks):
-            return "GAME_OVER"
-
-    def move_active_shape(self, dx, dy):
-        can_move = True
-        for block in self.active_shape_blocks:
-            new_x = block.x + dx
-            new_y = block.y + dy
-            
-            if not (0 <= new_x < GRID_WIDTH and 0 <= new_y < GRID_HEIGHT):
-                can_move = False
-                break
-            
-            # ตรวจสอบการชนกับบล็อกที่วางอยู่แล้ว โดยต้องไม่ใช่บล็อกใน Active Shape ตัวเอง
-            target_block = self.grid_matrix[new_x][new_y]
-            if target_block is not None and target_block not in self.active_shape_blocks:
-                can_move = False
-                break
-                
-        if can_move:
-            for block in self.active_shape_blocks:
-                block.x += dx
-                block.y += dy
-            return True
-        
-        return False
+    def get_busy(self):
+        return pygame.mixer.music.get_busy()
 
-    def rotate_active_shape(self):
-        # ⚠️ แก้ไขเมธอดนี้เพื่อให้การหมุนทำงานได้ถูกต้อง
-        if not self.active_shape_blocks or len(self.active_shape_blocks) == 1:
-            return
-        
-        pivot_block = self.active_shape_blocks[0]
-        new_positions = []
-        
-        for block in self.active_shape_blocks:
-            rel_x = block.x - pivot_block.x
-            rel_y = block.y - pivot_block.y
-            
-            # Rotate 90 degrees counter-clockwise: (rel_x, rel_y) -> (-rel_y, rel_x)
-            new_rel_x = -rel_y
-            new_rel_y = rel_x
-            
-            new_x = pivot_block.x + new_rel_x
-            new_y = pivot_block.y + new_rel_y
-            
-            # 1. ตรวจสอบขอบเขต (รวมถึงแถวบนที่มองไม่เห็น)
-            if not (0 <= new_x < GRID_WIDTH and 0 <= new_y < GRID_HEIGHT):
-                return 
-            
-            # 2. ตรวจสอบการชนกับบล็อกที่วางอยู่แล้ว (ไม่ชนกับตัวเอง)
-            target_block = self.grid_matrix[new_x][new_y]
-            if target_block is not None and target_block not in self.active_shape_blocks:
-                return 
-                
-            new_positions.append((new_x, new_y))
-
-        # อัปเดตตำแหน่งจริง
-        for i, block in enumerate(self.active_shape_blocks):
-            block.x, block.y = new_positions[i]
-
-    def drop_active_shape(self):
-        return self.move_active_shape(0, 1)
-
-    def lock_shape(self):
-        """วาง Active Shape และตรวจสอบ Game Over"""
-        for block in self.active_shape_blocks:
-            self.grid_matrix[block.x][block.y] = block
-            
-            if block.y < 2:
-                self.active_shape_blocks = []
-                return "GAME_OVER" 
-                
-        self.active_shape_blocks = []
-        
-        total_cleared_score = self.check_and_clear_matches()
-        return total_cleared_score
-
-    def check_and_clear_matches(self):
-        score = 0
-        combo_count = 0
-        
-        while True:
-            cleared_blocks = self._find_all_matches()
-            if not cleared_blocks:
-                break
-
-            points = self._clear_blocks(cleared_blocks)
-            score += self._calculate_combo_score(points, combo_count)
-            
-            self.apply_gravity()
-            combo_count += 1
-            
-        return score
+    def play(self, loops=0):
+        try:
+            pygame.mixer.music.play(loops)
+        except pygame.error:
+            pass
 
-    def _find_all_matches(self):
-        cleared_blocks = set()
-        
-        for x in range(GRID_WIDTH):
-            for y in range(GRID_HEIGHT):
-                block = self.grid_matrix[x][y]
-                if block and block not in cleared_blocks:
-                    match_group = self._dfs_match_check(block)
-                    if len(match_group) >= 4:
-                        for matched_block in match_group:
-                            if matched_block.is_special:
-                                self._add_horizontal_row_to_clear(matched_block.y, cleared_blocks)
-                        
-                        cleared_blocks.update(match_group)
-                        
-        return cleared_blocks
+    def stop(self):
+        pygame.mixer.music.stop()
 
-    def _dfs_match_check(self, start_block):
-        stack = [start_block]
-        visited = {start_block}
-        group = []
-        match_key = start_block.get_match_key()
-        
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (1, 1), (-1, 1), (1, -1)]
-
-        while stack:
-            current = stack.pop()
-            group.append(current)
-
-            for dx, dy in directions:
-                nx, ny = current.x + dx, current.y + dy
-                if 0 <= nx < GRID_WIDTH and 0 <= ny < GRID_HEIGHT:
-                    neighbor = self.grid_matrix[nx][ny]
-                    if neighbor and neighbor.get_match_key() == match_key and neighbor not in visited:
-                        visited.add(neighbor)
-                        stack.append(neighbor)
-        
-        return group
-    
-    def _add_horizontal_row_to_clear(self, y_row, cleared_set):
-        for x in range(GRID_WIDTH):
-            block = self.grid_matrix[x][y_row]
-            if block:
-                cleared_set.add(block)
-
-    def _clear_blocks(self, blocks_to_clear):
-        cleared_count = len(blocks_to_clear)
-        for block in blocks_to_clear:
-            self.grid_matrix[block.x][block.y] = None
-        return cleared_count
-
-    def _calculate_combo_score(self, cleared_count, combo_count):
-        if cleared_count >= 8: base_score = 500
-        elif cleared_count >= 6: base_score = 250
-        else: base_score = 100
-        
-        if combo_count == 1: multiplier = 1.5 
-        elif combo_count >= 2: multiplier = 2.0
-        else: multiplier = 1.0
+    def pause(self):
+        pygame.mixer.music.pause()
 
-        return int(base_score * multiplier)
+    def unpause(self):
+        pygame.mixer.music.unpause()
 
-    def apply_gravity(self):
-        for x in range(GRID_WIDTH):
-            blocks_in_col = [self.grid_matrix[x][y] for y in range(GRID_HEIGHT) if self.grid_matrix[x][y] is not None]
-            
-            for y in range(GRID_HEIGHT):
-                self.grid_matrix[x][y] = None
-                
-            for i, block in enumerate(blocks_in_col):
-                new_y = GRID_HEIGHT - len(blocks_in_col) + i
-                block.y = new_y
-                self.grid_matrix[x][new_y] = block
+    def set_volume(self, volume):
+        pygame.mixer.music.set_volume(volume)
 
 # ====================================================================
-# 4. CLASS GameManager
+# 3. RENDERING & UI FUNCTIONS
 # ====================================================================
 
-class GameManager:
-    """ควบคุม Game State, Score, Time, และ Input"""
+def get_font(size, name=None):
+    """คืนฟอนต์ที่โหลดไว้แล้ว (โหลดครั้งแรกที่ขอ)"""
+    key = (name, size)
+    font = _FONTS.get(key)
+    if font is None:
+        font = pygame.font.Font(name, size)
+        _FONTS[key] = font
+    return font
+
+def load_fonts():
+    """โหลดฟอนต์ทุกขนาดที่เกมใช้ตอนเริ่มโปรแกรม"""
+    for size in (FONT_SIZE, HUD_FONT_SIZE, SMALL_FONT_SIZE):
+        get_font(size)
+    return get_font(FONT_SIZE)
+
+def render_text(font, text, color, outline_color=None, outline=0):
+    """Render ข้อความ (พร้อมขอบ) ครั้งเดียวแล้วเก็บใน Cache
     
-    def __init__(self):
-        self.grid = Grid()
-        self.score = 0
-        self.time_left = 180.0
-        self.target_score = 2000
-        # สถานะที่เป็นไปได้: "MENU", "RUNNING", "PAUSED", "LOSE", "WIN"
-        self.game_state = "MENU" 
-        self.fall_timer = 0
-        self.fall_speed = 0.5
-
-    def reset_game(self):
-        """รีเซ็ตทุกอย่างเพื่อเริ่มเกมใหม่"""
-        self.grid = Grid()
-        self.score = 0
-        self.time_left = 180.0
-        self.game_state = "RUNNING"
-        self.fall_timer = 0
-        self.fall_speed = 0.5
-        self.grid.spawn_new_shape() 
-
-        # Music Logic
-        if pygame.mixer.music.get_volume() > 0:
-            if not pygame.mixer.music.get_busy():
-                try:
-                    pygame.mixer.music.play(-1)
-                except pygame.error:
-                    pass
-
-    def handle_input(self, action):
-        if self.game_state != "RUNNING":
-            return
-            
-        if action == 'LEFT':
-            self.grid.move_active_shape(-1, 0)
-        elif action == 'RIGHT':
-            self.grid.move_active_shape(1, 0)
-        elif action == 'DOWN':
-            self.grid.move_active_shape(0, 1)
-        elif action == 'ROTATE':
-            # ปุ่มลูกศรขึ้น (UP) สำหรับการหมุน
-            self.grid.rotate_active_shape()
-
-    def update(self, delta_time):
-        # ไม่ต้องอัปเดตเกมถ้าอยู่ในสถานะอื่นที่ไม่ใช่ RUNNING
-        if self.game_state != "RUNNING":
-            return
-            
-        self.time_left -= delta_time
-        
-        self.fall_timer += delta_time
-        if self.fall_timer >= self.fall_speed:
-            if not self.grid.drop_active_shape():
-                
-                lock_result = self.grid.lock_shape()
-                
-                if lock_result == "GAME_OVER":
-                    self.game_state = "LOSE" 
-                    pygame.mixer.music.stop() 
-                    self.fall_timer = 0
-                    return 
-                    
-                self.score += lock_result
-                
-                if self.grid.spawn_new_shape() == "GAME_OVER":
-                    self.game_state = "LOSE"
-                    pygame.mixer.music.stop()
-                    
-            self.fall_timer = 0
-        
-        self.check_win_or_lose()
-
-    def check_win_or_lose(self):
-        if self.score >= self.target_score:
-            self.game_state = "WIN"
-            pygame.mixer.music.stop()
-        elif self.time_left <= 0:
-            self.game_state = "LOSE"
-            pygame.mixer.music.stop()
-
-# ====================================================================
-# 5. RENDERING & UI FUNCTIONS
-# ====================================================================
+    ข้อความที่มีขอบจะประกอบเป็น Surface เดียว ขนาดใหญ่กว่าข้อความ outline พิกเซลทุกด้าน
+    """
+    key = (font, text, color, outline_color, outline)
+    surf = _TEXT_CACHE.get(key)
+    if surf is not None:
+        _TEXT_CACHE.move_to_end(key)
+        return surf
+
+    surf = font.render(text, True, color)
+    if outline:
+        width, height = surf.get_size()
+        composed = pygame.Surface((width + 2 * outline, height + 2 * outline), pygame.SRCALPHA)
+        edge_surf = font.render(text, True, outline_color)
+        for dx in range(-outline, outline + 1):
+            for dy in range(-outline, outline + 1):
+                if dx != 0 or dy != 0: # หลีกเลี่ยงการวาดทับตัวเองตรงกลาง
+                    composed.blit(edge_surf, (outline + dx, outline + dy))
+        composed.blit(surf, (outline, outline))
+        surf = composed
+
+    _TEXT_CACHE[key] = surf
+    if len(_TEXT_CACHE) > TEXT_CACHE_LIMIT:
+        _TEXT_CACHE.popitem(last=False)
+    return surf
 
 def draw_button(screen, rect, text, font, color, text_color):
     """ฟังก์ชันวาดปุ่มมาตรฐาน"""
     pygame.draw.rect(screen, color, rect, 0, 5)
     pygame.draw.rect(screen, WHITE, rect, 2, 5)
-    text_surf = font.render(text, True, text_color)
+    text_surf = render_text(font, text, text_color)
     screen.blit(text_surf, (rect.centerx - text_surf.get_width() // 2, rect.centery - text_surf.get_height() // 2))
     return rect
 
@@ -372,20 +198,14 @@ def draw_menu(screen, font, SCREEN_WIDTH, SCREEN_HEIGHT, current_volume, is_mute
     OUTLINE_THICKNESS = 2 # ความหนาของขอบ (พิกเซล)
 
     # --- วาด Title และ Subtitle พร้อมขอบ ---
+    # (Surface ที่มีขอบใหญ่กว่าข้อความ OUTLINE_THICKNESS ทุกด้าน จึงเลื่อนตำแหน่งวาดขึ้น/ซ้าย)
     
     # 1. Title (GEOMADOKA)
     title_text = "GEOMADOKA"
     title_color = WHITE
 
-    # วาดขอบ
-    for dx in range(-OUTLINE_THICKNESS, OUTLINE_THICKNESS + 1):
-        for dy in range(-OUTLINE_THICKNESS, OUTLINE_THICKNESS + 1):
-            if dx != 0 or dy != 0: # หลีกเลี่ยงการวาดทับตัวเองตรงกลาง
-                outline_surf = font.render(title_text, True, OUTLINE_COLOR)
-                screen.blit(outline_surf, (SCREEN_WIDTH // 2 - outline_surf.get_width() // 2 + dx, SCREEN_HEIGHT // 4 + dy))
-    # วาดข้อความหลัก
-    title_surf = font.render(title_text, True, title_color)
-    screen.blit(title_surf, (SCREEN_WIDTH // 2 - title_surf.get_width() // 2, SCREEN_HEIGHT // 4))
+    title_surf = render_text(font, title_text, title_color, OUTLINE_COLOR, OUTLINE_THICKNESS)
+    screen.blit(title_surf, (SCREEN_WIDTH // 2 - title_surf.get_width() // 2, SCREEN_HEIGHT // 4 - OUTLINE_THICKNESS))
 
 
     # 2. Subtitle (Falling Geo-Block Puzzle)
@@ -396,15 +216,8 @@ def draw_menu(screen, font, SCREEN_WIDTH, SCREEN_HEIGHT, current_volume, is_mute
     PURPLE = (128, 0, 128) 
     subtitle_color = PURPLE
 
-    # วาดขอบ
-    for dx in range(-OUTLINE_THICKNESS, OUTLINE_THICKNESS + 1):
-        for dy in range(-OUTLINE_THICKNESS, OUTLINE_THICKNESS + 1):
-            if dx != 0 or dy != 0:
-                outline_surf = font.render(subtitle_text, True, OUTLINE_COLOR)
-                screen.blit(outline_surf, (SCREEN_WIDTH // 2 - outline_surf.get_width() // 2 + dx, SCREEN_HEIGHT // 4 + 50 + dy))
-    # วาดข้อความหลัก
-    subtitle_surf = font.render(subtitle_text, True, subtitle_color)
-    screen.blit(subtitle_surf, (SCREEN_WIDTH // 2 - subtitle_surf.get_width() // 2, SCREEN_HEIGHT // 4 + 50))
+    subtitle_surf = render_text(font, subtitle_text, subtitle_color, OUTLINE_COLOR, OUTLINE_THICKNESS)
+    screen.blit(subtitle_surf, (SCREEN_WIDTH // 2 - subtitle_surf.get_width() // 2, SCREEN_HEIGHT // 4 + 50 - OUTLINE_THICKNESS))
 
     # ตำแหน่งปุ่ม START
     start_button_rect = pygame.Rect(SCREEN_WIDTH // 2 - 125, SCREEN_HEIGHT // 2, 250, 60)
@@ -434,52 +247,60 @@ def draw_menu(screen, font, SCREEN_WIDTH, SCREEN_HEIGHT, current_volume, is_mute
     vol_text = f"Vol: {int(current_volume * 100)}%"
     vol_color = WHITE # กำหนดสีข้อความหลัก
 
-    # วาดขอบ
-    for dx in range(-OUTLINE_THICKNESS, OUTLINE_THICKNESS + 1):
-        for dy in range(-OUTLINE_THICKNESS, OUTLINE_THICKNESS + 1):
-            if dx != 0 or dy != 0:
-                outline_surf = font.render(vol_text, True, OUTLINE_COLOR)
-                screen.blit(outline_surf, (start_x + dx, start_y + button_size + 10 + dy))
-    # วาดข้อความหลัก
-    vol_surf = font.render(vol_text, True, vol_color)
-    screen.blit(vol_surf, (start_x, start_y + button_size + 10))
+    vol_surf = render_text(font, vol_text, vol_color, OUTLINE_COLOR, OUTLINE_THICKNESS)
+    screen.blit(vol_surf, (start_x - OUTLINE_THICKNESS, start_y + button_size + 10 - OUTLINE_THICKNESS))
     
     # 5. แสดงชื่อเพลง (พร้อมขอบ)
     song_name_text = "Song name: Sis Puella Magica!"
     song_color = YELLOW # กำหนดสีข้อความหลัก
-    small_font = pygame.font.Font(None, 24) 
-    
-    song_y = start_y + button_size + 10 + vol_surf.get_height() + 5
-
-    # วาดขอบ
-    for dx in range(-OUTLINE_THICKNESS, OUTLINE_THICKNESS + 1):
-        for dy in range(-OUTLINE_THICKNESS, OUTLINE_THICKNESS + 1):
-            if dx != 0 or dy != 0:
-                outline_surf = small_font.render(song_name_text, True, OUTLINE_COLOR)
-                screen.blit(outline_surf, (start_x + dx, song_y + dy))
-    # วาดข้อความหลัก
-    song_surf = small_font.render(song_name_text, True, song_color)
-    screen.blit(song_surf, (start_x, song_y))
+    small_font = get_font(SMALL_FONT_SIZE)
     
     # ตำแหน่ง: ใต้ Vol text
-    song_y = start_y + button_size + 10 + vol_surf.get_height() + 5
-    screen.blit(song_surf, (start_x, song_y))
+    song_y = start_y + button_size + 10 + font.size(vol_text)[1] + 5
+
+    song_surf = render_text(small_font, song_name_text, song_color, OUTLINE_COLOR, OUTLINE_THICKNESS)
+    screen.blit(song_surf, (start_x - OUTLINE_THICKNESS, song_y - OUTLINE_THICKNESS))
     
     return start_button_rect, mute_rect, vol_down_rect, vol_up_rect
 
+def get_overlay(width, height, alpha):
+    """คืน Overlay สีดำโปร่งแสงที่สร้างไว้แล้ว (สร้างครั้งแรกที่ขอขนาดนั้น)"""
+    key = (width, height, alpha)
+    overlay = _OVERLAYS.get(key)
+    if overlay is None:
+        overlay = pygame.Surface((width, height), pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, alpha))
+        _OVERLAYS[key] = overlay
+    return overlay
+
+def build_overlays(screen_size):
+    """สร้าง Overlay ทุกชุดที่เกมใช้ล่วงหน้า (เรียกตอนเริ่มเกมและเมื่อขนาดจอเปลี่ยน)"""
+    _OVERLAYS.clear()
+    _POPUP_CACHE.clear()
+    get_overlay(screen_size[0], screen_size[1], POPUP_OVERLAY_ALPHA)
+    get_overlay(GRID_WIDTH * BLOCK_SIZE, (GRID_HEIGHT - SPAWN_ROWS) * BLOCK_SIZE, GRID_OVERLAY_ALPHA)
+    get_overlay(UI_PANEL_SIZE[0], UI_PANEL_SIZE[1], UI_OVERLAY_ALPHA)
+
+def _cached_popup_box(kind, signature, box_rect, draw_contents):
+    """คืนกล่อง Pop-up ที่ประกอบแล้ว (กล่อง + ข้อความ + ปุ่ม) วาดใหม่เมื่อ signature เปลี่ยนเท่านั้น"""
+    cached = _POPUP_CACHE.get(kind)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    box_surf = pygame.Surface(box_rect.size, pygame.SRCALPHA)
+    local_rect = box_surf.get_rect()
+    pygame.draw.rect(box_surf, GRAY, local_rect, 0, 10)
+    pygame.draw.rect(box_surf, WHITE, local_rect, 3, 10)
+    draw_contents(box_surf, -box_rect.x, -box_rect.y)
+    _POPUP_CACHE[kind] = (signature, box_surf)
+    return box_surf
+
 def draw_pause_popup(screen, font, SCREEN_WIDTH, SCREEN_HEIGHT):
     """วาด Pop-up เมื่อเกมหยุดชั่วคราว (PAUSED)"""
     
-    s = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-    s.fill((0, 0, 0, 150))
-    screen.blit(s, (0, 0))
+    screen.blit(get_overlay(SCREEN_WIDTH, SCREEN_HEIGHT, POPUP_OVERLAY_ALPHA), (0, 0))
 
     box_rect = pygame.Rect(SCREEN_WIDTH // 2 - 200, SCREEN_HEIGHT // 2 - 170, 400, 340)
-    pygame.draw.rect(screen, GRAY, box_rect, 0, 10)
-    pygame.draw.rect(screen, WHITE, box_rect, 3, 10)
-
-    title_surf = font.render("GAME PAUSED", True, YELLOW)
-    screen.blit(title_surf, (box_rect.centerx - title_surf.get_width() // 2, box_rect.top + 30))
 
     # กำหนดขนาดและตำแหน่งปุ่ม
     button_width = 250
@@ -488,15 +309,20 @@ def draw_pause_popup(screen, font, SCREEN_WIDTH, SCREEN_HEIGHT):
     
     # 1. Continue Button (เล่นต่อ)
     continue_rect = pygame.Rect(button_x, box_rect.top + 100, button_width, button_height)
-    draw_button(screen, continue_rect, "CONTINUE (Q)", font, DARK_GREEN, WHITE)
-    
     # 2. Restart Button (เริ่มใหม่)
     restart_rect = pygame.Rect(button_x, box_rect.top + 170, button_width, button_height)
-    draw_button(screen, restart_rect, "RESTART", font, DARK_RED, WHITE)
-    
     # 3. Main Menu Button (กลับหน้าเมนู)
     menu_rect = pygame.Rect(button_x, box_rect.top + 240, button_width, button_height)
-    draw_button(screen, menu_rect, "MAIN MENU", font, DARK_RED, WHITE)
+
+    def draw_contents(surf, dx, dy):
+        title_surf = render_text(font, "GAME PAUSED", YELLOW)
+        surf.blit(title_surf, (box_rect.centerx - title_surf.get_width() // 2 + dx, box_rect.top + 30 + dy))
+        draw_button(surf, continue_rect.move(dx, dy), "CONTINUE (Q)", font, DARK_GREEN, WHITE)
+        draw_button(surf, restart_rect.move(dx, dy), "RESTART", font, DARK_RED, WHITE)
+        draw_button(surf, menu_rect.move(dx, dy), "MAIN MENU", font, DARK_RED, WHITE)
+
+    box_surf = _cached_popup_box("PAUSED", (font, box_rect.size), box_rect, draw_contents)
+    screen.blit(box_surf, box_rect)
 
     return continue_rect, restart_rect, menu_rect
 
@@ -505,13 +331,9 @@ def draw_game_over_popup(screen, game_manager, font, SCREEN_WIDTH, SCREEN_HEIGHT
     
     final_score = game_manager.score
     
-    s = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-    s.fill((0, 0, 0, 150))
-    screen.blit(s, (0, 0))
+    screen.blit(get_overlay(SCREEN_WIDTH, SCREEN_HEIGHT, POPUP_OVERLAY_ALPHA), (0, 0))
 
     box_rect = pygame.Rect(SCREEN_WIDTH // 2 - 200, SCREEN_HEIGHT // 2 - 150, 400, 300)
-    pygame.draw.rect(screen, GRAY, box_rect, 0, 10)
-    pygame.draw.rect(screen, WHITE, box_rect, 3, 10)
 
     if game_manager.game_state == "WIN":
         title = "CONGRATULATIONS!"
@@ -519,113 +341,463 @@ def draw_game_over_popup(screen, game_manager, font, SCREEN_WIDTH, SCREEN_HEIGHT
     else:
         title = "GAME OVER"
         color = RED
-        
-    title_surf = font.render(title, True, color)
-    score_surf = font.render(f"Final Score: {final_score}", True, WHITE)
-    
-    screen.blit(title_surf, (box_rect.centerx - title_surf.get_width() // 2, box_rect.top + 30))
-    screen.blit(score_surf, (box_rect.centerx - score_surf.get_width() // 2, box_rect.top + 80))
 
     play_again_rect = pygame.Rect(box_rect.left + 30, box_rect.bottom - 80, 160, 50)
     menu_rect = pygame.Rect(box_rect.right - 190, box_rect.bottom - 80, 160, 50)
-    
-    draw_button(screen, play_again_rect, "PLAY AGAIN", font, DARK_GREEN, WHITE)
-    draw_button(screen, menu_rect, "MAIN MENU", font, DARK_RED, WHITE)
+
+    def draw_contents(surf, dx, dy):
+        title_surf = render_text(font, title, color)
+        score_surf = render_text(font, f"Final Score: {final_score}", WHITE)
+        surf.blit(title_surf, (box_rect.centerx - title_surf.get_width() // 2 + dx, box_rect.top + 30 + dy))
+        surf.blit(score_surf, (box_rect.centerx - score_surf.get_width() // 2 + dx, box_rect.top + 80 + dy))
+        draw_button(surf, play_again_rect.move(dx, dy), "PLAY AGAIN", font, DARK_GREEN, WHITE)
+        draw_button(surf, menu_rect.move(dx, dy), "MAIN MENU", font, DARK_RED, WHITE)
+
+    box_surf = _cached_popup_box("GAME_OVER", (font, box_rect.size, title, final_score), box_rect, draw_contents)
+    screen.blit(box_surf, box_rect)
 
     return play_again_rect, menu_rect
 
-def draw_block(screen, block, offset_x=0, offset_y=0):
-    # ประกาศ global เพื่อช่วยให้ Linter ทำงานได้ถูกต้องกับ Global Constants
-    global BLOCK_SIZE, BLACK, WHITE
-    
-    color = COLOR_MAP.get(block.color, BLACK)
-    rect = pygame.Rect(
-        offset_x + block.x * BLOCK_SIZE,
-        offset_y + (block.y - 2) * BLOCK_SIZE,
-        BLOCK_SIZE,
-        BLOCK_SIZE
-    )
-    pygame.draw.rect(screen, color, rect)
-    pygame.draw.rect(screen, BLACK, rect, 1) 
+def _render_block_sprite(shape_type, color_name, size):
+    """วาดบล็อก 1 ชิ้นลง Surface ขนาด size x size (ใช้สร้าง Sprite Atlas)"""
+    color = COLOR_MAP.get(color_name, BLACK)
+    surf = pygame.Surface((size, size))
+    rect = surf.get_rect()
+    pygame.draw.rect(surf, color, rect)
+    pygame.draw.rect(surf, BLACK, rect, 1) 
     center_x = rect.centerx
     center_y = rect.centery
     
-    if block.shape_type == 'Triangle':
+    if shape_type == 'Triangle':
         points = [(center_x, rect.top + 5), (rect.right - 5, rect.bottom - 5), (rect.left + 5, rect.bottom - 5)]
-        pygame.draw.polygon(screen, WHITE, points, 0)
-        pygame.draw.polygon(screen, BLACK, points, 2)
-    elif block.shape_type == 'Circle':
-        pygame.draw.circle(screen, BLACK, (center_x, center_y), BLOCK_SIZE // 2 - 2, 0)
-        pygame.draw.circle(screen, WHITE, (center_x, center_y), BLOCK_SIZE // 2 - 2, 2)
-    elif block.shape_type == 'Square':
-        pygame.draw.rect(screen, BLACK, rect.inflate(-8, -8), 0)
-        pygame.draw.rect(screen, WHITE, rect.inflate(-8, -8), 2)
-    elif block.shape_type == 'Diamond':
+        pygame.draw.polygon(surf, WHITE, points, 0)
+        pygame.draw.polygon(surf, BLACK, points, 2)
+    elif shape_type == 'Circle':
+        pygame.draw.circle(surf, BLACK, (center_x, center_y), size // 2 - 2, 0)
+        pygame.draw.circle(surf, WHITE, (center_x, center_y), size // 2 - 2, 2)
+    elif shape_type == 'Square':
+        pygame.draw.rect(surf, BLACK, rect.inflate(-8, -8), 0)
+        pygame.draw.rect(surf, WHITE, rect.inflate(-8, -8), 2)
+    elif shape_type == 'Diamond':
         points = [rect.midtop, rect.midright, rect.midbottom, rect.midleft]
-        pygame.draw.polygon(screen, WHITE, points, 0)
-        pygame.draw.polygon(screen, BLACK, points, 2)
-    elif block.shape_type == 'Pentagon':
-        pygame.draw.circle(screen, BLACK, (center_x, center_y), BLOCK_SIZE // 2 - 2, 0)
-        pygame.draw.circle(screen, WHITE, (center_x, center_y), BLOCK_SIZE // 2 - 2, 2)
-        pygame.draw.line(screen, WHITE, (center_x, rect.top + 5), (center_x, rect.bottom - 5), 2)
-    elif block.shape_type == 'Star':
-        pygame.draw.line(screen, WHITE, rect.topleft, rect.bottomright, 2)
-        pygame.draw.line(screen, WHITE, rect.topright, rect.bottomleft, 2)
+        pygame.draw.polygon(surf, WHITE, points, 0)
+        pygame.draw.polygon(surf, BLACK, points, 2)
+    elif shape_type == 'Pentagon':
+        pygame.draw.circle(surf, BLACK, (center_x, center_y), size // 2 - 2, 0)
+        pygame.draw.circle(surf, WHITE, (center_x, center_y), size // 2 - 2, 2)
+        pygame.draw.line(surf, WHITE, (center_x, rect.top + 5), (center_x, rect.bottom - 5), 2)
+    elif shape_type == 'Star':
+        pygame.draw.line(surf, WHITE, rect.topleft, rect.bottomright, 2)
+        pygame.draw.line(surf, WHITE, rect.topright, rect.bottomleft, 2)
+
+    if pygame.display.get_surface() is not None:
+        surf = surf.convert()
+    return surf
+
+def build_block_atlas():
+    """สร้าง Sprite ของทุกคู่ (รูปทรง, สี) สำหรับ BLOCK_SIZE ปัจจุบัน"""
+    global _BLOCK_ATLAS_SIZE
+    _BLOCK_ATLAS.clear()
+    for shape_type in SHAPES:
+        for color_name in COLOR_MAP:
+            _BLOCK_ATLAS[(shape_type, color_name)] = _render_block_sprite(shape_type, color_name, BLOCK_SIZE)
+    _BLOCK_ATLAS_SIZE = BLOCK_SIZE
+
+def get_block_sprite(shape_type, color_name, variant=None):
+    # สร้าง Atlas ใหม่อัตโนมัติเมื่อ BLOCK_SIZE เปลี่ยน
+    if _BLOCK_ATLAS_SIZE != BLOCK_SIZE:
+        build_block_atlas()
+    key = (shape_type, color_name, variant) if variant else (shape_type, color_name)
+    sprite = _BLOCK_ATLAS.get(key)
+    if sprite is None:
+        # เงา/กะพริบ = Sprite ปกติที่ปรับแล้ว (สร้างเมื่อใช้ครั้งแรก)
+        if variant == 'ghost':
+            sprite = get_block_sprite(shape_type, color_name).copy()
+            sprite.set_alpha(GHOST_ALPHA)
+        elif variant == 'flash':
+            sprite = get_block_sprite(shape_type, color_name).copy()
+            sprite.fill((FLASH_BRIGHTNESS,) * 3, special_flags=pygame.BLEND_RGB_ADD)
+        else:
+            sprite = _render_block_sprite(shape_type, color_name, BLOCK_SIZE)
+        _BLOCK_ATLAS[key] = sprite
+    return sprite
+
+def first_visible_row(grid):
+    """แถวแรกของ grid ที่วาด: ใต้แถวเกิดตามกติกาของกระดาน (จอวางตำแหน่งไว้สำหรับซ่อน SPAWN_ROWS แถว)"""
+    return max(SPAWN_ROWS, grid.rules.spawn_rows)
 
-def draw_grid(screen, grid_instance, offset_x, offset_y):
-    global GRID_WIDTH, BLOCK_SIZE, GRID_HEIGHT, WHITE
-    
-    grid_rect = pygame.Rect(offset_x, offset_y, GRID_WIDTH * BLOCK_SIZE, (GRID_HEIGHT-2) * BLOCK_SIZE)
+def draw_block(screen, block, offset_x=0, offset_y=0):
+    sprite = get_block_sprite(block.shape_type, block.color)
+    screen.blit(sprite, (offset_x + block.x * BLOCK_SIZE, offset_y + (block.y - SPAWN_ROWS) * BLOCK_SIZE))
+
+def draw_grid_frame(screen, offset_x, offset_y):
+    """วาดพื้นหลังโปร่งแสงและกรอบของตาราง (ส่วนที่ไม่เปลี่ยนระหว่างเกม)"""
+    grid_rect = pygame.Rect(offset_x, offset_y, GRID_WIDTH * BLOCK_SIZE, (GRID_HEIGHT - SPAWN_ROWS) * BLOCK_SIZE)
     # พื้นหลังตารางโปร่งแสงสีดำ
-    s = pygame.Surface((grid_rect.width, grid_rect.height), pygame.SRCALPHA)
-    s.fill((0, 0, 0, 50)) 
-    screen.blit(s, (grid_rect.x, grid_rect.y))
+    screen.blit(get_overlay(grid_rect.width, grid_rect.height, GRID_OVERLAY_ALPHA), (grid_rect.x, grid_rect.y))
 
     pygame.draw.rect(screen, WHITE, grid_rect, 2) # วาดแค่ขอบ
+    return grid_rect
 
+def draw_grid(screen, grid_instance, offset_x, offset_y):
+    global GRID_WIDTH, BLOCK_SIZE, GRID_HEIGHT, WHITE
+    
+    draw_grid_frame(screen, offset_x, offset_y)
+
+    top = first_visible_row(grid_instance)
     for x in range(GRID_WIDTH):
-        for y in range(2, GRID_HEIGHT): 
+        for y in range(top, GRID_HEIGHT): 
             block = grid_instance.grid_matrix[x][y]
             if block:
                 draw_block(screen, block, offset_x, offset_y)
     for block in grid_instance.active_shape_blocks:
-        if block.y >= 2:
+        if block.y >= top:
             draw_block(screen, block, offset_x, offset_y)
-            
-def draw_running_ui(screen, game_manager, font, ui_x, grid_offset_y):
-    """วาด UI สำหรับสถานะ RUNNING (Time, Score, Goal และคำแนะนำ)"""
+
+def draw_running_ui_panel(screen, font, ui_x, grid_offset_y):
+    """วาดกรอบโปร่งแสงและคำแนะนำของ UI (ส่วนที่ไม่เปลี่ยนระหว่างเกม)"""
+    # พื้นหลังโปร่งแสงสีดำสำหรับข้อความ
+    ui_rect = pygame.Rect((ui_x - 10, grid_offset_y - 10), UI_PANEL_SIZE)
+    screen.blit(get_overlay(ui_rect.width, ui_rect.height, UI_OVERLAY_ALPHA), (ui_rect.x, ui_rect.y))
+
+    # แสดงคำแนะนำการหยุดเกม
+    stop_text = "Press Q for stop"
+    small_font = get_font(HUD_FONT_SIZE)
+    stop_surf = render_text(small_font, stop_text, YELLOW)
+    
+    # ตำแหน่ง: ใต้ Goal text
+    stop_y = grid_offset_y + 120 + font.get_height() + 30
+    screen.blit(stop_surf, (ui_x, stop_y))
+    return ui_rect
+
+def draw_running_ui_text(screen, game_manager, font, ui_x, grid_offset_y):
+    """วาดข้อความ Time, Score, Goal และคืนพื้นที่ที่วาด"""
     status_text = f"Time: {max(0, game_manager.time_left):.1f}s"
     score_text = f"Score: {game_manager.score}"
     goal_text = f"Goal: {game_manager.target_score}"
-    
-    # พื้นหลังโปร่งแสงสีดำสำหรับข้อความ
-    ui_width = 250
-    ui_rect = pygame.Rect(ui_x - 10, grid_offset_y - 10, ui_width, 200)
-    s = pygame.Surface((ui_rect.width, ui_rect.height), pygame.SRCALPHA)
-    s.fill((0, 0, 0, 100)) 
-    screen.blit(s, (ui_rect.x, ui_rect.y))
 
-    time_surf = font.render(status_text, True, WHITE)
+    time_surf = render_text(font, status_text, WHITE)
     screen.blit(time_surf, (ui_x, grid_offset_y))
 
-    score_surf = font.render(score_text, True, WHITE)
+    score_surf = render_text(font, score_text, WHITE)
     screen.blit(score_surf, (ui_x, grid_offset_y + 60))
     
-    goal_surf = font.render(goal_text, True, WHITE)
+    goal_surf = render_text(font, goal_text, WHITE)
     screen.blit(goal_surf, (ui_x, grid_offset_y + 120))
+            
+def draw_running_ui(screen, game_manager, font, ui_x, grid_offset_y):
+    """วาด UI สำหรับสถานะ RUNNING (Time, Score, Goal และคำแนะนำ)"""
+    draw_running_ui_panel(screen, font, ui_x, grid_offset_y)
+    draw_running_ui_text(screen, game_manager, font, ui_x, grid_offset_y)
+
+def create_clear_effects(grid_offset_x, grid_offset_y):
+    """สร้างเอฟเฟกต์ตอนเคลียร์สำหรับพื้นที่ตารางที่มองเห็น (None = ปิดไว้ หรือไม่มี numpy)"""
+    if not SHOW_EFFECTS:
+        return None
+    grid_rect = pygame.Rect(grid_offset_x, grid_offset_y, GRID_WIDTH * BLOCK_SIZE, (GRID_HEIGHT - SPAWN_ROWS) * BLOCK_SIZE)
+    try:
+        return ClearEffects(grid_rect, BLOCK_SIZE, COLOR_MAP, frame_budget=EFFECTS_FRAME_BUDGET)
+    except ImportError as e:
+        print(f"WARNING: Clear effects are disabled. Error: {e}")
+        return None
+
+def render_profiler_panel(profiler, size):
+    """ประกอบตารางเวลาเฉลี่ย/สูงสุดของ Profiler เป็น Surface ทึบแสง"""
+    panel = pygame.Surface(size).convert()
+    panel.fill(BLACK)
+    pygame.draw.rect(panel, WHITE, panel.get_rect(), 1)
+
+    lines = ["PROFILER  avg / max"]
+    for name, (avg, peak) in profiler.summary().items():
+        if name in COUNTERS:
+            lines.append(f"{name}: {avg:.1f} / {peak}")
+        else:
+            lines.append(f"{name}: {avg:.2f} / {peak:.2f} ms")
+
+    # ตัวเลขเปลี่ยนตลอด จึงไม่ผ่าน render_text เพื่อไม่ให้ดัน Cache ข้อความอื่นออก
+    small_font = get_font(PROFILER_FONT_SIZE)
+    y = 6
+    for line in lines:
+        panel.blit(small_font.render(line, True, GREEN), (6, y))
+        y += small_font.get_linesize()
+    return panel
 
-    # แสดงคำแนะนำการหยุดเกม
-    stop_text = "Press Q for stop"
-    small_font = pygame.font.Font(None, 28)
-    stop_surf = small_font.render(stop_text, True, YELLOW)
-    
-    # ตำแหน่ง: ใต้ Goal text
-    stop_y = grid_offset_y + 120 + goal_surf.get_height() + 30
-    screen.blit(stop_surf, (ui_x, stop_y))
+# ====================================================================
+# 3.1 DIRTY-RECTANGLE RENDERER
+# ====================================================================
 
+class DirtyRectRenderer:
+    """วาดเฉพาะส่วนที่เปลี่ยนจากเฟรมก่อน แล้วอัปเดตจอด้วย pygame.display.update(rects)
+    
+    ฉาก (สถานะเกม, กระดาน, ระดับเสียง) ที่เปลี่ยนจะวาดใหม่ทั้งจอ ส่วนระหว่างเล่น
+    จะวาดเฉพาะช่องตารางและข้อความ UI ที่เปลี่ยน ทับบนพื้นหลังที่ประกอบไว้แล้ว
+    """
+
+    def __init__(self, screen, font, grid_offset_x, grid_offset_y, profiler=None, interpolate=False, effects=None):
+        self.screen = screen
+        self.font = font
+        self.grid_offset_x = grid_offset_x
+        self.grid_offset_y = grid_offset_y
+        self.ui_x = grid_offset_x + GRID_WIDTH * BLOCK_SIZE + 50
+        self.play_background = None
+        self.ui_rect = None
+        self.scene = None
+        self.cells = {}
+        self.ui_key = None
+        self.full_update = True
+        self.dirty_rects = []
+
+        # interpolate: วาด Active Shape แยกจากช่องตาราง โดยเลื่อนลงตามเวลาที่ผ่านไปของรอบการตก
+        self.interpolate = interpolate
+        self.pending_time = 0.0
+        self.piece_rects = []
+
+        # Profiler (ถ้ามี) รับเวลา draw_grid / draw_ui และจำนวน blit ของแต่ละเฟรม
+        self.profiler = profiler
+        self.blits = 0
+        # ใต้กรอบ UI และข้อความ "Press Q for stop"
+        profiler_y = grid_offset_y + UI_PANEL_SIZE[1] + 30
+        self.profiler_rect = pygame.Rect(self.ui_x - 10, profiler_y,
+                                         screen.get_width() - self.ui_x, 11 * PROFILER_FONT_SIZE)
+        self.profiler_surface = None
+
+        # effects: ClearEffects ที่วาดทับตาราง (None = ไม่มีเอฟเฟกต์)
+        self.effects = effects
+
+        self.menu_buttons = (None, None, None, None)
+        self.pause_buttons = (None, None, None)
+        self.popup_buttons = (None, None)
+
+    def invalidate(self):
+        """วาดใหม่ทั้งจอในเฟรมถัดไป (เช่นเมื่อภาพพื้นหลังเปลี่ยนหรือหน้าต่างถูกบัง)"""
+        self.scene = None
+        self.play_background = None
+        self.profiler_surface = None
+
+    def _add_time(self, name, start):
+        # ส่งเวลาตั้งแต่ start ให้ Profiler และคืนเวลาปัจจุบันสำหรับช่วงถัดไป
+        now = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.add_time(name, now - start)
+        return now
+
+    def _build_play_background(self):
+        # พื้นหลังเกม + ตารางโปร่งแสง + กรอบ UI ประกอบไว้ครั้งเดียว
+        background = pygame.Surface(self.screen.get_size()).convert()
+        if GAME_BG_IMAGE:
+            background.blit(GAME_BG_IMAGE, (0, 0))
+        else:
+            background.fill(BLACK)
+        draw_grid_frame(background, self.grid_offset_x, self.grid_offset_y)
+        self.ui_rect = draw_running_ui_panel(background, self.font, self.ui_x, self.grid_offset_y)
+        self.play_background = background
+
+    def _cell_rect(self, x, y):
+        return pygame.Rect(self.grid_offset_x + x * BLOCK_SIZE, self.grid_offset_y + (y - SPAWN_ROWS) * BLOCK_SIZE,
+                           BLOCK_SIZE, BLOCK_SIZE)
+
+    def _visible_cells(self, grid, cascade=None):
+        cells = {}
+        top = first_visible_row(grid)
+        for x in range(GRID_WIDTH):
+            column = grid.grid_matrix[x]
+            for y in range(top, GRID_HEIGHT):
+                block = column[y]
+                if block:
+                    cells[(x, y)] = (block.shape_type, block.color)
+        if cascade is not None:
+            # กลุ่มที่กำลังจะถูกเคลียร์ในขั้นถัดไปของ Cascade
+            for pos in cascade.matched_cells():
+                if pos in cells:
+                    cells[pos] += ('flash',)
+        if SHOW_GHOST and grid.active_shape_blocks:
+            # ไม่วาดเงาในช่องที่ Active Shape ทับ (รวมช่องถัดลงไปที่ภาพ Interpolate เลื่อนเข้าไป)
+            piece = {(block.x, block.y) for block in grid.active_shape_blocks}
+            if self.interpolate:
+                piece |= {(x, y + 1) for x, y in piece}
+            block = grid.active_shape_blocks[0]
+            for x, y in grid.ghost_cells():
+                if y >= top and (x, y) not in piece:
+                    cells[(x, y)] = (block.shape_type, block.color, 'ghost')
+        if not self.interpolate:
+            for block in grid.active_shape_blocks:
+                if block.y >= top:
+                    cells[(block.x, block.y)] = (block.shape_type, block.color)
+        return cells
+
+    def _fall_offset(self, game_manager):
+        # ระยะ (พิกเซล) ที่ Active Shape ตกไปแล้วระหว่างช่องปัจจุบันกับช่องถัดไป
+        if not game_manager.grid._active_shape_fits(0, 1):
+            return 0
+        progress = (game_manager.fall_timer + self.pending_time) / game_manager.fall_speed
+        return int(min(1.0, progress) * BLOCK_SIZE)
+
+    def _draw_active_piece(self, game_manager):
+        # ช่องใต้ Active Shape ที่ตกได้ว่างเสมอ จึงวาดทับโดยไม่บังบล็อกที่วางแล้ว
+        offset = self._fall_offset(game_manager)
+        self.piece_rects = []
+        top = first_visible_row(game_manager.grid)
+        for block in game_manager.grid.active_shape_blocks:
+            if block.y >= top:
+                rect = self._cell_rect(block.x, block.y).move(0, offset)
+                self.screen.blit(get_block_sprite(block.shape_type, block.color), rect)
+                self.piece_rects.append(rect)
+        self.blits += len(self.piece_rects)
+
+    def add_clear_effects(self, blocks, points, combo):
+        """เอฟเฟกต์ของ Event "CLEAR": Particle จากทุกบล็อก, แถวของ Diamond สว่างวาบ และป้ายคะแนน/Combo"""
+        effects = self.effects
+        blocks = [block for block in blocks if block.y >= SPAWN_ROWS]
+        if effects is None or not blocks:
+            return
+        rects = [self._cell_rect(block.x, block.y) for block in blocks]
+        effects.burst([rect.center for rect in rects], [block.color for block in blocks])
+        # Diamond ที่ถูกเคลียร์ทุกตัวอยู่ในแถวที่ถูกเคลียร์ทั้งแถว
+        for y in {block.y for block in blocks if block.is_special}:
+            effects.flash_row(self._cell_rect(0, y).top)
+        text = f"+{points}" if combo == 0 else f"+{points} COMBO x{combo + 1}"
+        label = render_text(get_font(HUD_FONT_SIZE), text, YELLOW, BLACK, 2)
+        effects.popup(label, rects[0].unionall(rects).center)
+
+    def _draw_effects(self):
+        # ช่องที่เอฟเฟกต์วาดทับถูกทำเครื่องหมายใน self.cells จึงถูกวาดใหม่จากพื้นหลังในเฟรมถัดไป
+        effects = self.effects
+        if effects is None:
+            return
+        start = time.perf_counter()
+        profiler = self.profiler
+        last_frame = profiler.frames[-1]['total'] if profiler is not None and profiler.frames else 0.0
+        tiles = effects.draw(self.screen, last_frame)
+        if tiles:
+            cells = self.cells
+            for column, row in tiles:
+                cells[(column, row + SPAWN_ROWS)] = _OVERDRAWN
+            # อัปเดตจอเป็นกรอบเดียวที่ครอบทุกช่องที่ถูกวาดทับ
+            columns, rows = zip(*tiles)
+            top_left = self._cell_rect(min(columns), min(rows) + SPAWN_ROWS)
+            self.dirty_rects.append(top_left.union(self._cell_rect(max(columns), max(rows) + SPAWN_ROWS)))
+        if profiler is not None:
+            profiler.count('particles', effects.count)
+        self._add_time('effects', start)
+
+    def _ui_key(self, game_manager):
+        return (f"{max(0, game_manager.time_left):.1f}", game_manager.score, game_manager.target_score)
+
+    def _draw_play_scene(self, game_manager):
+        start = time.perf_counter()
+        self.screen.blit(self.play_background, (0, 0))
+        self.cells = self._visible_cells(game_manager.grid, game_manager.cascade)
+        for (x, y), key in self.cells.items():
+            self.screen.blit(get_block_sprite(*key), self._cell_rect(x, y))
+        self.blits += 1 + len(self.cells)
+        if self.interpolate:
+            self._draw_active_piece(game_manager)
+        self._add_time('draw_grid', start)
+        self._draw_effects()
+
+        start = time.perf_counter()
+        self.ui_key = self._ui_key(game_manager)
+        draw_running_ui_text(self.screen, game_manager, self.font, self.ui_x, self.grid_offset_y)
+        self.blits += 3  # Time, Score, Goal
+        self._add_time('draw_ui', start)
+
+    def _update_play_scene(self, game_manager):
+        start = time.perf_counter()
+        if self.interpolate:
+            # ลบ Active Shape ตำแหน่งเดิมก่อน แล้ววาดใหม่หลังอัปเดตช่องตาราง
+            for rect in self.piece_rects:
+                self.screen.blit(self.play_background, rect, rect)
+            self.blits += len(self.piece_rects)
+            self.dirty_rects.extend(self.piece_rects)
+        cells = self._visible_cells(game_manager.grid, game_manager.cascade)
+        for pos in cells.keys() | self.cells.keys():
+            key = cells.get(pos)
+            if key == self.cells.get(pos):
+                continue
+            rect = self._cell_rect(*pos)
+            self.screen.blit(self.play_background, rect, rect)
+            self.blits += 1
+            if key is not None:
+                self.screen.blit(get_block_sprite(*key), rect)
+                self.blits += 1
+            self.dirty_rects.append(rect)
+        self.cells = cells
+        if self.interpolate:
+            self._draw_active_piece(game_manager)
+            self.dirty_rects.extend(self.piece_rects)
+        self._add_time('draw_grid', start)
+        self._draw_effects()
+
+        start = time.perf_counter()
+
+        ui_key = self._ui_key(game_manager)
+        if ui_key != self.ui_key:
+            self.screen.blit(self.play_background, self.ui_rect, self.ui_rect)
+            draw_running_ui_text(self.screen, game_manager, self.font, self.ui_x, self.grid_offset_y)
+            self.blits += 4
+            self.dirty_rects.append(self.ui_rect)
+            self.ui_key = ui_key
+        self._add_time('draw_ui', start)
+
+    def draw(self, game_manager, current_volume, is_muted, pending_time=0.0):
+        """pending_time: เวลาจริงที่ยังไม่ได้จำลองเป็น Tick (ใช้ Interpolate การตก)"""
+        state = game_manager.game_state
+        screen = self.screen
+        width, height = screen.get_size()
+        self.blits = 0
+        self.pending_time = pending_time if state == "RUNNING" else 0.0
+
+        if state == "MENU":
+            scene = (state, current_volume, is_muted)
+            if scene != self.scene:
+                start = time.perf_counter()
+                if MENU_BG_IMAGE:
+                    screen.blit(MENU_BG_IMAGE, (0, 0))
+                else:
+                    screen.fill(BLACK)
+                self.menu_buttons = draw_menu(screen, self.font, width, height, current_volume, is_muted)
+                self._add_time('draw_ui', start)
+                self.full_update = True
+        else:
+            if self.play_background is None:
+                self._build_play_background()
+            scene = (state, game_manager.grid)
+            if scene != self.scene:
+                self._draw_play_scene(game_manager)
+                start = time.perf_counter()
+                if state == "PAUSED":
+                    self.pause_buttons = draw_pause_popup(screen, self.font, width, height)
+                    self.blits += 2
+                elif state in ("LOSE", "WIN"):
+                    self.popup_buttons = draw_game_over_popup(screen, game_manager, self.font, width, height)
+                    self.blits += 2
+                self._add_time('draw_ui', start)
+                self.full_update = True
+            elif state == "RUNNING":
+                self._update_play_scene(game_manager)
+
+        if state != "PAUSED":
+            self.pause_buttons = (None, None, None)
+        self.scene = scene
+
+    def draw_profiler(self, profiler):
+        """วาดตาราง Profiler ทับมุมขวาล่าง (ปิดตารางแล้วต้องเรียก invalidate)"""
+        if self.profiler_surface is None or profiler.frame_index % PROFILER_REFRESH_FRAMES == 0:
+            self.profiler_surface = render_profiler_panel(profiler, self.profiler_rect.size)
+        self.screen.blit(self.profiler_surface, self.profiler_rect)
+        self.blits += 1
+        self.dirty_rects.append(self.profiler_rect)
+
+    def present(self):
+        if self.full_update:
+            pygame.display.flip()
+        elif self.dirty_rects:
+            pygame.display.update(self.dirty_rects)
+        self.full_update = False
+        self.dirty_rects = []
 
 # ====================================================================
-# 6. MAIN GAME LOOP
+# 4. MAIN GAME LOOP
 # ====================================================================
 
 def run_geomatch():
@@ -637,7 +809,12 @@ def run_geomatch():
         print(f"FATAL ERROR: Failed to initialize Pygame. Error: {e}")
         return
 
-    font = pygame.font.Font(None, 36)
+    # 🖼️ เริ่มถอดรหัสภาพพื้นหลังบน Thread แยกทันที เมนูแสดงพื้นดำไปก่อนจนภาพพร้อม
+    assets = AssetLoader()
+    for name, path in BACKGROUND_FILES.items():
+        assets.request_image(name, path, (SCREEN_WIDTH, SCREEN_HEIGHT))
+
+    font = load_fonts()
     grid_offset_x = 50
     grid_offset_y = 50
 
@@ -649,59 +826,107 @@ def run_geomatch():
         return
 
     pygame.display.set_caption("GeoMatch - Falling Block Game")
+    build_block_atlas()
+    build_overlays((SCREEN_WIDTH, SCREEN_HEIGHT))
     clock = pygame.time.Clock()
-    
-    # 🖼️ โหลดและปรับภาพพื้นหลัง
-    global MENU_BG_IMAGE, GAME_BG_IMAGE
-    try:
-        MENU_BG_IMAGE = pygame.image.load('menu_bg.jpg').convert()
-        MENU_BG_IMAGE = pygame.transform.scale(MENU_BG_IMAGE, (SCREEN_WIDTH, SCREEN_HEIGHT))
-    except pygame.error as e:
-        print(f"WARNING: Could not load 'menu_bg.jpg'. Using BLACK background. Error: {e}")
-        MENU_BG_IMAGE = None
-    
-    try:
-        GAME_BG_IMAGE = pygame.image.load('game_bg.jpg').convert()
-        GAME_BG_IMAGE = pygame.transform.scale(GAME_BG_IMAGE, (SCREEN_WIDTH, SCREEN_HEIGHT))
-    except pygame.error as e:
-        print(f"WARNING: Could not load 'game_bg.jpg'. Using BLACK background. Error: {e}")
-        GAME_BG_IMAGE = None
+
+    def apply_background(name, image, error):
+        global MENU_BG_IMAGE, GAME_BG_IMAGE
+        if image is None:
+            print(f"WARNING: Could not load '{BACKGROUND_FILES[name]}'. Using BLACK background. Error: {error}")
+            return
+        image = image.convert()
+        if name == 'menu':
+            MENU_BG_IMAGE = image
+        else:
+            GAME_BG_IMAGE = image
+        renderer.invalidate()
 
     current_volume = 0.5 
     is_muted = False
     
-    # Initial Music Setup
-    try:
-        pygame.mixer.music.load(MUSIC_FILE)
-        pygame.mixer.music.set_volume(current_volume)
-        pygame.mixer.music.play(-1)
-    except pygame.error as e:
-        print(f"WARNING: Could not load music file '{MUSIC_FILE}'. Music will be disabled. Error: {e}")
+    # 🎶 เพลงโหลดหลังเฟรมแรกขึ้นจอแล้ว (ไม่ถ่วงเวลาเริ่มเกม)
+    music_started = False
+
+    def start_music():
+        try:
+            pygame.mixer.music.load(MUSIC_FILE)
+            pygame.mixer.music.set_volume(0.0 if is_muted else current_volume)
+            pygame.mixer.music.play(-1)
+        except pygame.error as e:
+            print(f"WARNING: Could not load music file '{MUSIC_FILE}'. Music will be disabled. Error: {e}")
         
+    def on_game_event(name, data):
+        # เอฟเฟกต์เป็นภาพอย่างเดียว ไม่มีผลกับลอจิกหรือ Replay
+        if name == "CLEAR":
+            renderer.add_clear_effects(**data)
+        elif name == "RESET" and renderer.effects is not None:
+            renderer.effects.clear()
+
+    recorder = ReplayRecorder()
     try:
-        game_manager = GameManager() 
+        game_manager = GameManager(audio=PygameAudio(), recorder=recorder, cascade_step_time=CASCADE_STEP_SECONDS,
+                                   event_sink=on_game_event)
     except Exception as e:
         print(f"FATAL ERROR: Failed to create GameManager instance. Error: {e}")
         pygame.quit()
         return
 
-    menu_buttons = (None, None, None, None) 
-    popup_buttons = (None, None)
-    pause_buttons = (None, None, None) 
+    def save_replay():
+        try:
+            recorder.save(REPLAY_FILE)
+        except (OSError, ValueError) as e:
+            print(f"WARNING: Could not save replay '{REPLAY_FILE}'. Error: {e}")
+
+    profiler = FrameProfiler()
+    show_profiler = False
+
+    def dump_profile():
+        try:
+            profiler.dump(PROFILE_FILE)
+        except OSError as e:
+            print(f"WARNING: Could not save profile '{PROFILE_FILE}'. Error: {e}")
+
+    renderer = DirtyRectRenderer(screen, font, grid_offset_x, grid_offset_y, profiler, INTERPOLATE_FALL,
+                                 create_clear_effects(grid_offset_x, grid_offset_y))
+    timestep = FixedTimestep(LOGIC_TICK_RATE)
+    inputs = InputHandler(INPUT_DAS, INPUT_ARR)
+    menu_buttons = renderer.menu_buttons
+    popup_buttons = renderer.popup_buttons
+    pause_buttons = renderer.pause_buttons
 
     running = True
     while running:
+        profiler.begin_frame()
         try:
-            delta_time = clock.get_time() / 1000.0 
+            frame_seconds = clock.get_time() / 1000.0
+            for name, image, error in assets.poll():
+                apply_background(name, image, error)
+            previous_state = game_manager.game_state
             
             # --- Event Handling (Input) ---
+            events_start = time.perf_counter()
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
+
+                # หน้าต่างถูกบัง/ย่อแล้วกลับมา ต้องวาดใหม่ทั้งจอ
+                if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    renderer.invalidate()
                 
                 # 1. Input สำหรับสถานะ RUNNING & PAUSED (ปุ่ม Q) และการควบคุมทิศทาง
                 if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_q:
+                    # ⏱️ F3: เปิด/ปิดตาราง Profiler, F4: บันทึกเฟรมล่าสุดลงไฟล์
+                    if event.key == pygame.K_F3:
+                        show_profiler = not show_profiler
+                        renderer.invalidate()
+
+                    elif event.key == pygame.K_F4:
+                        dump_profile()
+                        print(f"Saved the last {len(profiler.frames)} frames to '{PROFILE_FILE}' "
+                              f"(input latency avg {inputs.average_latency() * 1000:.1f} ms)")
+
+                    elif event.key == pygame.K_q:
                         if game_manager.game_state == "RUNNING":
                             game_manager.game_state = "PAUSED"
                             pygame.mixer.music.pause()
@@ -710,17 +935,12 @@ def run_geomatch():
                             game_manager.game_state = "RUNNING"
                             pygame.mixer.music.unpause()
                             
-                    # Input ควบคุมทิศทาง (เฉพาะ RUNNING)
-                    elif game_manager.game_state == "RUNNING":
-                        if event.key == pygame.K_LEFT:
-                            game_manager.handle_input('LEFT')
-                        elif event.key == pygame.K_RIGHT:
-                            game_manager.handle_input('RIGHT')
-                        elif event.key == pygame.K_DOWN:
-                            game_manager.handle_input('DOWN')
-                        elif event.key == pygame.K_UP: 
-                            game_manager.handle_input('ROTATE')
+                    # Input ควบคุมทิศทาง (เฉพาะ RUNNING) เข้าคิวและถูกป้อนตอนต้น Tick ถัดไป
+                    elif game_manager.game_state == "RUNNING" and event.key in KEY_ACTIONS:
+                        inputs.press(KEY_ACTIONS[event.key])
 
+                elif event.type == pygame.KEYUP and event.key in KEY_ACTIONS:
+                    inputs.release(KEY_ACTIONS[event.key])
                             
                 # 2. Input สำหรับสถานะ MENU (คลิกปุ่มต่างๆ)
                 elif game_manager.game_state == "MENU" and event.type == pygame.MOUSEBUTTONDOWN:
@@ -754,8 +974,7 @@ def run_geomatch():
                     if play_again_rect.collidepoint(event.pos):
                         game_manager.reset_game()
                     elif menu_rect.collidepoint(event.pos):
-                        game_manager.game_state = "MENU"
-                        game_manager.grid = Grid() 
+                        game_manager.return_to_menu()
 
                 # 4. Input สำหรับสถานะ PAUSED (คลิกปุ่ม Pop-up)
                 elif game_manager.game_state == "PAUSED" and event.type == pygame.MOUSEBUTTONDOWN and pause_buttons[0]:
@@ -766,60 +985,76 @@ def run_geomatch():
                         pygame.mixer.music.unpause()
 
                     elif restart_rect.collidepoint(event.pos):
+                        # PAUSED -> RUNNING ไม่ผ่านจุดบันทึกท้ายเฟรม: บันทึกเกมที่เลิกกลางคันก่อนเริ่มใหม่
+                        save_replay()
                         game_manager.reset_game()
                         pygame.mixer.music.unpause()
 
                     elif menu_rect.collidepoint(event.pos):
-                        game_manager.game_state = "MENU"
-                        game_manager.grid = Grid()
+                        game_manager.return_to_menu()
                         pygame.mixer.music.unpause()
 
-            # --- Update & Drawing based on State ---
-            
-            # 🖼️ วาดภาพพื้นหลังตามสถานะก่อนเสมอ
-            if game_manager.game_state == "MENU":
-                if MENU_BG_IMAGE:
-                    screen.blit(MENU_BG_IMAGE, (0, 0))
-                else:
-                    screen.fill(BLACK)
-            elif game_manager.game_state == "RUNNING" or game_manager.game_state == "PAUSED" or game_manager.game_state == "LOSE" or game_manager.game_state == "WIN":
-                if GAME_BG_IMAGE:
-                    screen.blit(GAME_BG_IMAGE, (0, 0))
-                else:
-                    screen.fill(BLACK)
-            else:
-                screen.fill(BLACK)
-                
-            ui_x = grid_offset_x + GRID_WIDTH * BLOCK_SIZE + 50 
-
-            if game_manager.game_state == "RUNNING" or game_manager.game_state == "PAUSED":
-                game_manager.update(delta_time)
-                draw_grid(screen, game_manager.grid, grid_offset_x, grid_offset_y)
-                draw_running_ui(screen, game_manager, font, ui_x, grid_offset_y)
-                
-                # Draw Pause Pop-up
-                if game_manager.game_state == "PAUSED":
-                    pause_buttons = draw_pause_popup(screen, font, SCREEN_WIDTH, SCREEN_HEIGHT)
-                else:
-                    pause_buttons = (None, None, None)
-
-            elif game_manager.game_state == "MENU":
-                menu_buttons = draw_menu(screen, font, SCREEN_WIDTH, SCREEN_HEIGHT, current_volume, is_muted)
-                
-            elif game_manager.game_state == "LOSE" or game_manager.game_state == "WIN":
-                draw_grid(screen, game_manager.grid, grid_offset_x, grid_offset_y)
-                draw_running_ui(screen, game_manager, font, ui_x, grid_offset_y)
-                
-                popup_buttons = draw_game_over_popup(screen, game_manager, font, SCREEN_WIDTH, SCREEN_HEIGHT)
-
+            profiler.add_time('events', time.perf_counter() - events_start)
 
-            pygame.display.flip()
-            clock.tick(60) 
+            # --- Update & Drawing based on State ---
+            # 🕹️ ลอจิกเดินทีละ Tick ขนาดคงที่ (ไม่ขึ้นกับ FPS)
+            with profiler.section('update'):
+                steps = timestep.advance(frame_seconds)
+                if game_manager.game_state == "RUNNING" or game_manager.game_state == "PAUSED":
+                    if steps and game_manager.game_state == "RUNNING":
+                        # เวลาจริงของเฟรม (dt ของ Tick คงที่) ให้ Replay บอกได้ว่าเฟรมไหนช้า
+                        recorder.record_frame(frame_seconds)
+                    for _ in range(steps):
+                        # ระหว่าง Cascade ยังไม่มีชิ้นให้บังคับ: เก็บ Input ไว้ให้ชิ้นใหม่แทนที่จะทิ้ง
+                        for action in inputs.drain(timestep.dt, hold=game_manager.cascade is not None):
+                            game_manager.handle_input(action)
+                        game_manager.update(timestep.dt)
+                # ออกจากการเล่น (หยุด, แพ้/ชนะ, เมนู): ทิ้ง Input ที่ค้างและปุ่มที่กดค้าง
+                if game_manager.game_state != "RUNNING":
+                    inputs.clear()
+            profiler.count('ticks', steps)
+            profiler.sample_grid(game_manager.grid)
+            if renderer.effects is not None and game_manager.game_state == "RUNNING":
+                with profiler.section('effects'):
+                    renderer.effects.update(frame_seconds)
+
+            # 🖼️ วาดเฉพาะส่วนที่เปลี่ยน (ฉากใหม่จะวาดทั้งจอ) ตอนตามเวลาไม่ทันจะข้ามการวาดก่อนลด Tick
+            if timestep.should_render():
+                renderer.draw(game_manager, current_volume, is_muted, timestep.accumulator)
+                if show_profiler:
+                    renderer.draw_profiler(profiler)
+                menu_buttons = renderer.menu_buttons
+                pause_buttons = renderer.pause_buttons
+                popup_buttons = renderer.popup_buttons
+                with profiler.section('flip'):
+                    renderer.present()
+                profiler.count('blits', renderer.blits)
+                if not music_started:
+                    start_music()
+                    music_started = True
+
+            frame = profiler.end_frame()
+            if frame['total'] > STALL_SECONDS:
+                breakdown = ", ".join(f"{name} {frame[name] * 1000:.1f}" for name in SECTIONS)
+                print(f"STALL: frame {frame['frame']} took {frame['total'] * 1000:.1f} ms ({breakdown})")
+            if show_profiler and profiler.frame_index % PROFILE_DUMP_FRAMES == 0:
+                dump_profile()
+            clock.tick(TARGET_FPS)
+
+            # 🎞️ บันทึก Replay เมื่อเกมจบหรือออกจากเกมกลางคัน
+            in_game = ("RUNNING", "PAUSED")
+            if previous_state in in_game and game_manager.game_state not in in_game:
+                save_replay()
             
-        except Exception as e:
-            print(f"RUNTIME ERROR: An unexpected error occurred in the Game Loop. Error: {e}")
+        except Exception:
+            # พิมพ์ Traceback เต็มและเก็บเฟรมล่าสุดไว้ดูย้อนหลัง แทนการกลืน Error เงียบๆ
+            print("RUNTIME ERROR: An unexpected error occurred in the Game Loop.")
+            traceback.print_exc()
+            dump_profile()
             running = False
 
+    if game_manager.game_state in ("RUNNING", "PAUSED"):
+        save_replay()
     pygame.quit()
 
 # ====================================================================
@@ -0,0 +1,90 @@
+"""GeoMatch Input: คิว Input ตามนาฬิกาของลอจิก + Auto-Repeat แบบ DAS/ARR (ไม่ขึ้นกับ Pygame)
+
+- press/release รับ Action ('LEFT', 'RIGHT', 'DOWN', 'ROTATE', 'HARD_DROP') จาก Event ของหน้าต่าง
+- Input ทุกตัวเข้าคิวตามลำดับที่กด และถูกป้อนให้ GameManager ตอนต้น Tick ถัดไปของลอจิก
+  (ไม่ใช่ตอนที่ Event มาถึงกลางเฟรม ลำดับจึงเหมือนเดิมทุกครั้งและ Replay ตรงทุกบิต)
+- คิวไม่เก็บเลข Tick ของแต่ละ Input: ลำดับมาจากคิวแบบ FIFO ที่ drain ทีละ Tick อยู่แล้ว
+  และ Tick ที่ Input มีผลจริงถูกบันทึกโดย ReplayRecorder ตอน GameManager.handle_input
+- ปุ่มที่กดค้าง: รอ DAS วินาทีแล้วซ้ำทุก ARR วินาที (นับด้วยเวลาของลอจิก ไม่ใช่เวลาของเฟรม)
+- Tick ที่ยังไม่มีชิ้นให้บังคับ (ระหว่าง Cascade) ใช้ drain(dt, hold=True): Input รออยู่ในคิวจนชิ้นใหม่มา
+
+ตัวอย่าง:
+    inputs = InputHandler(das=0.17, arr=0.05)
+    inputs.press('LEFT')                     # KEYDOWN
+    for action in inputs.drain(timestep.dt, hold=game_manager.cascade is not None):  # ทุก Tick ก่อน update
+        game_manager.handle_input(action)
+    game_manager.update(timestep.dt)
+"""
+
+import time
+from collections import deque
+
+# Delayed Auto Shift: เวลากดค้างก่อนเริ่มซ้ำ และ Auto Repeat Rate: ระยะห่างของการซ้ำ (วินาที)
+DEFAULT_DAS = 0.17
+DEFAULT_ARR = 0.05
+# ROTATE และ HARD_DROP ไม่ซ้ำเมื่อกดค้าง
+REPEAT_ACTIONS = ('LEFT', 'RIGHT', 'DOWN')
+# จำนวนค่า Latency ล่าสุดที่เก็บไว้
+LATENCY_HISTORY = 256
+
+_OPPOSITE = {'LEFT': 'RIGHT', 'RIGHT': 'LEFT'}
+
+
+class InputHandler:
+    """คิว Input ที่ป้อนทีละ Tick และตัวจับเวลา Auto-Repeat ของปุ่มที่กดค้าง"""
+
+    def __init__(self, das=DEFAULT_DAS, arr=DEFAULT_ARR, repeat_actions=REPEAT_ACTIONS):
+        self.das = das
+        self.arr = arr
+        self.repeat_actions = frozenset(repeat_actions)
+        self.queue = deque()  # (เวลาจริงที่กด, action)
+        self.held = {}        # action -> เวลาของลอจิกที่เหลือก่อนซ้ำครั้งถัดไป
+        # เวลาจริงจาก Event ถึง Tick ที่ Input ถูกป้อน (วินาที)
+        self.latencies = deque(maxlen=LATENCY_HISTORY)
+
+    def press(self, action):
+        self.queue.append((time.perf_counter(), action))
+        if action in self.repeat_actions:
+            # ซ้าย/ขวา: ปุ่มที่กดล่าสุดเป็นฝ่ายซ้ำ
+            self.held.pop(_OPPOSITE.get(action), None)
+            self.held[action] = self.das
+
+    def release(self, action):
+        self.held.pop(action, None)
+
+    def clear(self):
+        """ทิ้งคิวและปุ่มที่กดค้างทั้งหมด (เช่นตอนหยุดเกมหรือเริ่มเกมใหม่)"""
+        self.queue.clear()
+        self.held.clear()
+
+    def drain(self, dt, hold=False):
+        """คืน Action ที่ต้องป้อนก่อน Tick นี้ตามลำดับ แล้วเดินนาฬิกาไป dt วินาที
+
+        hold: Tick นี้ป้อน Input ไม่ได้ คิวรอ Tick ถัดไปที่ป้อนได้ และปุ่มที่กดค้างยังไม่ซ้ำ
+              (ถ้าถึงเวลาซ้ำระหว่างนั้น จะซ้ำ 1 ครั้งใน Tick แรกที่ป้อนได้)
+        """
+        if hold:
+            for action, remaining in self.held.items():
+                self.held[action] = max(remaining - dt, 0.0)
+            return []
+        actions = []
+        if self.queue:
+            now = time.perf_counter()
+            for pressed_at, action in self.queue:
+                actions.append(action)
+                self.latencies.append(now - pressed_at)
+            self.queue.clear()
+        for action, remaining in self.held.items():
+            remaining -= dt
+            if remaining <= 0:
+                # ซ้ำได้ไม่เกิน 1 ครั้งต่อ Tick (ARR ที่สั้นกว่า Tick = ซ้ำทุก Tick)
+                actions.append(action)
+                remaining = max(remaining + self.arr, 0.0)
+            self.held[action] = remaining
+        return actions
+
+    def average_latency(self):
+        """ค่าเฉลี่ยของเวลาจาก Event ถึง Tick ที่ Input ถูกป้อน (วินาที)"""
+        if not self.latencies:
+            return 0.0
+        return sum(self.latencies) / len(self.latencies)
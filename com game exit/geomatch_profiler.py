@@ -0,0 +1,116 @@
+"""GeoMatch Profiler: จับเวลาแต่ละส่วนของเฟรมและตัวนับของ Hot Path (ไม่ขึ้นกับ Pygame)
+
+ส่วนที่จับเวลา (มิลลิวินาที):
+    events     การอ่าน Input
+    update     GameManager.update (รวม matches)
+    matches    Grid.check_and_clear_matches
+    draw_grid  การวาดช่องตาราง
+    draw_ui    การวาด UI / เมนู / Pop-up
+    effects    การอัปเดตและวาดเอฟเฟกต์ตอนเคลียร์
+    flip       pygame.display.flip / update
+ตัวนับต่อเฟรม: dfs_nodes, cascade_depth, blits, ticks (จำนวน Tick ของลอจิก), particles
+
+ตัวอย่าง:
+    profiler = FrameProfiler()
+    profiler.begin_frame()
+    with profiler.section('update'):
+        game_manager.update(delta_time)
+    profiler.sample_grid(game_manager.grid)
+    profiler.end_frame()
+    profiler.dump('frame_profile.csv')
+"""
+
+import csv
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+
+SECTIONS = ('events', 'update', 'matches', 'draw_grid', 'draw_ui', 'effects', 'flip')
+COUNTERS = ('dfs_nodes', 'cascade_depth', 'blits', 'ticks', 'particles')
+
+# จำนวนเฟรมล่าสุดที่เก็บไว้ (ประมาณ 10 วินาทีที่ 60 FPS)
+DEFAULT_HISTORY = 600
+
+
+class FrameProfiler:
+    """เก็บเวลาและตัวนับของเฟรมล่าสุดแบบวนซ้ำ (Ring Buffer)"""
+
+    def __init__(self, history=DEFAULT_HISTORY):
+        self.frames = deque(maxlen=history)
+        self.frame_index = 0
+        self.current = None
+        self._frame_start = 0.0
+
+    def begin_frame(self):
+        self.current = dict.fromkeys(SECTIONS, 0.0)
+        self.current.update(dict.fromkeys(COUNTERS, 0))
+        self._frame_start = time.perf_counter()
+
+    def add_time(self, name, seconds):
+        if self.current is not None:
+            self.current[name] += seconds
+
+    def count(self, name, amount=1):
+        if self.current is not None:
+            self.current[name] += amount
+
+    @contextmanager
+    def section(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def sample_grid(self, grid):
+        """อ่านตัวนับของกระดานที่สะสมตั้งแต่เฟรมก่อน แล้วเริ่มนับใหม่"""
+        self.add_time('matches', grid.match_seconds)
+        self.count('dfs_nodes', grid.dfs_nodes)
+        if grid.match_seconds:
+            # มีการ Lock ในเฟรมนี้: ความลึกของ Cascade ครั้งล่าสุด
+            self.current['cascade_depth'] = max(self.current['cascade_depth'], grid.last_combo_count)
+        grid.match_seconds = 0.0
+        grid.dfs_nodes = 0
+
+    def end_frame(self):
+        """ปิดเฟรมปัจจุบันและคืน dict ของเฟรมนั้น (เวลาเป็นวินาที)"""
+        frame = self.current
+        if frame is None:
+            return None
+        frame['frame'] = self.frame_index
+        frame['total'] = time.perf_counter() - self._frame_start
+        self.frames.append(frame)
+        self.frame_index += 1
+        self.current = None
+        return frame
+
+    def summary(self):
+        """คืน {ชื่อ: (ค่าเฉลี่ย, ค่าสูงสุด)} ของเฟรมที่เก็บไว้ (เวลาเป็นมิลลิวินาที)"""
+        result = {}
+        if not self.frames:
+            return result
+        for name in ('total',) + SECTIONS:
+            values = [frame[name] * 1000 for frame in self.frames]
+            result[name] = (sum(values) / len(values), max(values))
+        for name in COUNTERS:
+            values = [frame[name] for frame in self.frames]
+            result[name] = (sum(values) / len(values), max(values))
+        return result
+
+    def dump(self, path):
+        """เขียนเฟรมที่เก็บไว้ลงไฟล์ (.json = สรุป + ทุกเฟรม, นามสกุลอื่น = CSV)"""
+        fields = ('frame', 'total') + SECTIONS + COUNTERS
+        if path.endswith('.json'):
+            data = {
+                'summary': {name: {'avg': avg, 'max': peak} for name, (avg, peak) in self.summary().items()},
+                'frames': [{name: frame[name] for name in fields} for frame in self.frames],
+            }
+            with open(path, 'w') as dump_file:
+                json.dump(data, dump_file, indent=1)
+            return
+        with open(path, 'w', newline='') as dump_file:
+            writer = csv.writer(dump_file)
+            writer.writerow(fields)
+            for frame in self.frames:
+                writer.writerow([frame[name] for name in fields])
@@ -0,0 +1,377 @@
+"""GeoMatch Replay: บันทึก Seed + ลำดับ Input/Tick ของเกมเป็นไฟล์ไบนารีขนาดเล็ก และเล่นซ้ำแบบ Headless
+
+รูปแบบไฟล์ (little-endian):
+    Header  : MAGIC, version, grid kind, width, height, seed,
+              fall_speed, time_limit, target_score, cascade_step_time (v2, -1 = None),
+              spawn_rows, min_match (v3), spawn weights
+    Records : 0x00-0x04            Input (LEFT, RIGHT, DOWN, ROTATE, HARD_DROP)
+              0x10 <varint us>     Tick 1 ครั้ง ด้วย delta_time ใหม่ (ไมโครวินาที)
+              0x11 <varint n>      Tick ซ้ำ n ครั้งด้วย delta_time เดิม
+              0x12 <varint tick> <varint us>
+                                   เวลาจริงของเฟรมที่ช้า (v4, ท้ายไฟล์, การเล่นซ้ำไม่ใช้)
+              0xFF                 จบไฟล์
+
+ตัวอย่าง:
+    python geomatch_replay.py last_game.gmr --seek 1200
+    python geomatch_replay.py last_game.gmr --verify-seek 200
+"""
+
+import argparse
+import heapq
+import random
+import struct
+import sys
+import time
+
+from geomatch_engine import Grid, ArrayGrid, BitboardGrid, GameManager, GameRules, SPAWN_ROWS, MIN_MATCH
+
+MAGIC = b'GMRP'
+VERSION = 4
+
+ACTION_CODES = ['LEFT', 'RIGHT', 'DOWN', 'ROTATE', 'HARD_DROP']
+GRID_KINDS = [Grid, ArrayGrid, BitboardGrid]
+
+OP_TICK = 0x10
+OP_TICK_REPEAT = 0x11
+OP_FRAME = 0x12
+OP_END = 0xFF
+
+# Header หลัง MAGIC: version, grid kind, width, height, seed, fall_speed, time_limit, target_score,
+# cascade_step_time, spawn_rows, min_match, จำนวน weights
+# (version 3 เหมือน 4 แต่ไม่มีเวลาของเฟรม, version 2 ไม่มี spawn_rows/min_match
+#  และ version 1 ไม่มี cascade_step_time = ค่ามาตรฐาน)
+_HEADER = struct.Struct('<BBHHQddIdBBB')
+_HEADER_V2 = struct.Struct('<BBHHQddIdB')
+_HEADER_V1 = struct.Struct('<BBHHQddIB')
+
+# จำนวน Tick ระหว่าง Snapshot ของกระดานตอนเล่นซ้ำ
+DEFAULT_SNAPSHOT_INTERVAL = 600
+# จำนวนเฟรมที่ช้าที่สุดที่เก็บเวลาจริงไว้ในไฟล์
+SLOW_FRAMES_KEPT = 32
+
+
+def _write_varint(out, value):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def _read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+# ====================================================================
+# 1. RECORDING
+# ====================================================================
+
+class ReplayRecorder:
+    """ตัวบันทึกที่ GameManager เรียกใน reset_game, handle_input และ update"""
+
+    def __init__(self):
+        self.header = None
+        self.body = bytearray()
+        self.ticks = 0
+        self._last_tick_us = None
+        self._repeat = 0
+        self._slow_frames = []
+
+    def begin(self, game_manager):
+        grid_kind = GRID_KINDS.index(game_manager.grid_class)
+        weights = game_manager.grid.spawn_weights
+        cascade_step_time = game_manager.cascade_step_time
+        rules = game_manager.grid.rules
+        self.header = MAGIC + _HEADER.pack(
+            VERSION, grid_kind, rules.width, rules.height,
+            game_manager.game_seed, game_manager.fall_speed, game_manager.time_limit,
+            game_manager.target_score, -1.0 if cascade_step_time is None else cascade_step_time,
+            rules.spawn_rows, rules.min_match, len(weights),
+        ) + struct.pack(f'<{len(weights)}d', *weights)
+        self.body = bytearray()
+        self.ticks = 0
+        self._last_tick_us = None
+        self._repeat = 0
+        self._slow_frames = []
+
+    def record_input(self, action):
+        self._flush_repeat()
+        self.body.append(ACTION_CODES.index(action))
+
+    def record_tick(self, delta_time):
+        tick_us = round(delta_time * 1_000_000)
+        if tick_us == self._last_tick_us:
+            self._repeat += 1
+        else:
+            self._flush_repeat()
+            self.body.append(OP_TICK)
+            _write_varint(self.body, tick_us)
+            self._last_tick_us = tick_us
+        self.ticks += 1
+        return tick_us / 1_000_000
+
+    def record_frame(self, frame_seconds):
+        """เวลาจริงของเฟรมที่กำลังจะเดิน Tick ถัดไป (delta_time ของ Tick เท่ากันทุก Tick จึงบอกเฟรมที่ช้าไม่ได้)
+
+        เก็บเฉพาะ SLOW_FRAMES_KEPT เฟรมที่ช้าที่สุด: ไฟล์ไม่โตตามความยาวเกม
+        """
+        frame = (round(frame_seconds * 1_000_000), self.ticks)
+        if len(self._slow_frames) < SLOW_FRAMES_KEPT:
+            heapq.heappush(self._slow_frames, frame)
+        elif frame > self._slow_frames[0]:
+            heapq.heapreplace(self._slow_frames, frame)
+
+    def _flush_repeat(self):
+        if self._repeat:
+            self.body.append(OP_TICK_REPEAT)
+            _write_varint(self.body, self._repeat)
+            self._repeat = 0
+
+    def to_bytes(self):
+        if self.header is None:
+            raise ValueError("nothing recorded yet")
+        self._flush_repeat()
+        frames = bytearray()
+        for frame_us, tick in sorted(self._slow_frames, key=lambda frame: frame[1]):
+            frames.append(OP_FRAME)
+            _write_varint(frames, tick)
+            _write_varint(frames, frame_us)
+        return self.header + bytes(self.body) + bytes(frames) + bytes([OP_END])
+
+    def save(self, path):
+        with open(path, 'wb') as replay_file:
+            replay_file.write(self.to_bytes())
+
+# ====================================================================
+# 2. PLAYBACK
+# ====================================================================
+
+class Replay:
+    """ไฟล์ Replay ที่ถอดรหัสแล้ว: ค่าตั้งเกม + ลำดับคำสั่ง ('I', action) / ('T', delta_time)
+
+    slow_frames: [(tick ที่เฟรมเริ่ม, เวลาจริงของเฟรมเป็นวินาที)] (ว่างสำหรับไฟล์ก่อน version 4)
+    """
+
+    def __init__(self, data):
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError("not a GeoMatch replay")
+        pos = len(MAGIC)
+        version = data[pos]
+        self.spawn_rows, self.min_match = SPAWN_ROWS, MIN_MATCH
+        if version in (3, VERSION):
+            (_, grid_kind, self.width, self.height, self.seed, self.fall_speed,
+             self.time_limit, self.target_score, cascade_step_time,
+             self.spawn_rows, self.min_match, n_weights) = _HEADER.unpack_from(data, pos)
+            self.cascade_step_time = None if cascade_step_time < 0 else cascade_step_time
+            pos += _HEADER.size
+        elif version == 2:
+            (_, grid_kind, self.width, self.height, self.seed, self.fall_speed,
+             self.time_limit, self.target_score, cascade_step_time, n_weights) = _HEADER_V2.unpack_from(data, pos)
+            self.cascade_step_time = None if cascade_step_time < 0 else cascade_step_time
+            pos += _HEADER_V2.size
+        elif version == 1:
+            (_, grid_kind, self.width, self.height, self.seed, self.fall_speed,
+             self.time_limit, self.target_score, n_weights) = _HEADER_V1.unpack_from(data, pos)
+            self.cascade_step_time = None
+            pos += _HEADER_V1.size
+        else:
+            raise ValueError(f"unsupported replay version {version}")
+        self.spawn_weights = list(struct.unpack_from(f'<{n_weights}d', data, pos))
+        pos += 8 * n_weights
+        self.grid_class = GRID_KINDS[grid_kind]
+
+        self.ops = []
+        self.slow_frames = []
+        self.ticks = 0
+        delta_time = None
+        while True:
+            op = data[pos]
+            pos += 1
+            if op == OP_END:
+                break
+            if op < len(ACTION_CODES):
+                self.ops.append(('I', ACTION_CODES[op]))
+            elif op == OP_TICK:
+                tick_us, pos = _read_varint(data, pos)
+                delta_time = tick_us / 1_000_000
+                self.ops.append(('T', delta_time))
+                self.ticks += 1
+            elif op == OP_TICK_REPEAT:
+                count, pos = _read_varint(data, pos)
+                self.ops.extend([('T', delta_time)] * count)
+                self.ticks += count
+            elif op == OP_FRAME:
+                tick, pos = _read_varint(data, pos)
+                frame_us, pos = _read_varint(data, pos)
+                self.slow_frames.append((tick, frame_us / 1_000_000))
+            else:
+                raise ValueError(f"bad replay record 0x{op:02x} at byte {pos - 1}")
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as replay_file:
+            return cls(replay_file.read())
+
+    def new_game(self):
+        game_manager = GameManager(
+            grid_class=self.grid_class,
+            fall_speed=self.fall_speed,
+            target_score=self.target_score,
+            time_limit=self.time_limit,
+            spawn_weights=self.spawn_weights,
+            seed=self.seed,
+            cascade_step_time=self.cascade_step_time,
+            rules=GameRules.for_size(self.width, self.height, self.spawn_rows, self.min_match),
+        )
+        game_manager.reset_game()
+        return game_manager
+
+
+class ReplayPlayer:
+    """เล่น Replay ซ้ำแบบ Headless เต็มความเร็ว CPU และกระโดดไปยัง Tick ใดก็ได้ผ่าน Snapshot"""
+
+    def __init__(self, replay, snapshot_interval=DEFAULT_SNAPSHOT_INTERVAL):
+        self.replay = replay
+        self.snapshot_interval = snapshot_interval
+        # tick -> (ตำแหน่งใน ops, Grid.snapshot(), สถานะ RNG, ค่าของ GameManager)
+        # เก็บได้เฉพาะตอนไม่มี Cascade ค้าง จึงเป็น Tick แรกที่ว่างในแต่ละช่วง snapshot_interval
+        self.snapshots = {}
+        self._snapshot_slots = set()
+        # กระดานที่เหมือนกันเก็บ bytes ชุดเดียว (Snapshot เป็น Key ที่คงที่)
+        self.boards = {}
+        self.game_manager = replay.new_game()
+        self.tick = 0
+        self.op_index = 0
+        self._save_snapshot()
+
+    def _save_snapshot(self):
+        game_manager = self.game_manager
+        self._snapshot_slots.add(self.tick // self.snapshot_interval)
+        board = game_manager.grid.snapshot()
+        board = self.boards.setdefault(board, board)
+        self.snapshots[self.tick] = (
+            self.op_index, board, game_manager.grid.rng.getstate(),
+            (game_manager.game_state, game_manager.score, game_manager.time_left, game_manager.fall_timer),
+        )
+
+    def _load_snapshot(self, tick):
+        game_manager = self.game_manager
+        self.op_index, board, rng_state, values = self.snapshots[tick]
+        game_manager.grid.restore(board)
+        game_manager.grid.rng.setstate(rng_state)
+        game_manager.game_state, game_manager.score, game_manager.time_left, game_manager.fall_timer = values
+        game_manager.cascade = None
+        self.tick = tick
+
+    def _run_until(self, tick):
+        ops = self.replay.ops
+        game_manager = self.game_manager
+        # หยุดทันทีที่ถึง Tick ที่ต้องการ: Input ที่ตามหลังเป็นของ Tick ถัดไป
+        while self.op_index < len(ops) and self.tick < tick:
+            kind, value = ops[self.op_index]
+            self.op_index += 1
+            if kind == 'I':
+                game_manager.handle_input(value)
+                continue
+            game_manager.update(value)
+            self.tick += 1
+            if (self.tick // self.snapshot_interval not in self._snapshot_slots
+                    and game_manager.cascade is None):
+                self._save_snapshot()
+
+    def fast_forward(self):
+        """จำลองจนจบ Replay (รวม Input หลัง Tick สุดท้าย) และคืน GameManager สุดท้าย"""
+        self.seek(self.replay.ticks)
+        game_manager = self.game_manager
+        for kind, value in self.replay.ops[self.op_index:]:
+            game_manager.handle_input(value)
+        self.op_index = len(self.replay.ops)
+        return game_manager
+
+    def seek(self, tick):
+        """คืน GameManager ที่สถานะหลัง Tick ที่กำหนด (เริ่มจาก Snapshot ที่ใกล้ที่สุด)"""
+        tick = max(0, min(tick, self.replay.ticks))
+        if tick < self.tick:
+            self._load_snapshot(max(t for t in self.snapshots if t <= tick))
+        self._run_until(tick)
+        return self.game_manager
+
+
+def _game_state(game_manager):
+    """ค่าทั้งหมดที่ใช้เทียบว่าสองเกมอยู่ในสถานะเดียวกัน"""
+    cascade = game_manager.cascade
+    return (
+        game_manager.grid.snapshot(), game_manager.grid.rng.getstate(),
+        game_manager.game_state, game_manager.score, game_manager.time_left, game_manager.fall_timer,
+        None if cascade is None else (cascade.phase, cascade.score, cascade.combo_count),
+    )
+
+
+def verify_seek(replay, samples=100, seed=0):
+    """เทียบ seek(t) แบบสุ่มลำดับ กับการเล่นซ้ำตรงๆ ที่หยุดหลัง Tick t แล้วคืน [t ที่ไม่ตรงกัน]"""
+    rng = random.Random(seed)
+    ticks = rng.sample(range(replay.ticks + 1), min(samples, replay.ticks + 1))
+    # Snapshot ห่างกันน้อยๆ ให้ seek ถอยกลับไปโหลด Snapshot จริง
+    seeker = ReplayPlayer(replay, snapshot_interval=max(1, replay.ticks // 20))
+    # เล่นซ้ำตรงๆ แยกจาก ReplayPlayer: เก็บสถานะทันทีหลัง update ของ Tick ที่สุ่มได้
+    wanted = set(ticks)
+    game_manager = replay.new_game()
+    expected = {0: _game_state(game_manager)} if 0 in wanted else {}
+    tick = 0
+    for kind, value in replay.ops:
+        if kind == 'I':
+            game_manager.handle_input(value)
+            continue
+        game_manager.update(value)
+        tick += 1
+        if tick in wanted:
+            expected[tick] = _game_state(game_manager)
+    return [tick for tick in ticks if _game_state(seeker.seek(tick)) != expected[tick]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-simulate a GeoMatch replay headlessly.")
+    parser.add_argument('replay')
+    parser.add_argument('--seek', type=int, help="stop at this tick instead of the end")
+    parser.add_argument('--slowest', type=int, default=5, help="list the N longest recorded frames")
+    parser.add_argument('--verify-seek', type=int, metavar='N',
+                        help="check N random seeks against a linear replay and exit")
+    args = parser.parse_args(argv)
+
+    replay = Replay.load(args.replay)
+    if args.verify_seek is not None:
+        mismatches = verify_seek(replay, args.verify_seek)
+        print(f"verify-seek: {args.verify_seek} samples, {len(mismatches)} mismatches"
+              + (f" (ticks {sorted(mismatches)[:10]})" if mismatches else ""))
+        return 1 if mismatches else 0
+    start = time.perf_counter()
+    player = ReplayPlayer(replay)
+    game_manager = player.fast_forward() if args.seek is None else player.seek(args.seek)
+    elapsed = time.perf_counter() - start
+
+    inputs = sum(1 for kind, _ in replay.ops if kind == 'I')
+    print(f"seed={replay.seed} ticks={replay.ticks} inputs={inputs} "
+          f"grid={replay.grid_class.__name__} {replay.width}x{replay.height} "
+          f"spawn_rows={replay.spawn_rows} min_match={replay.min_match}")
+    print(f"tick {player.tick}: state={game_manager.game_state} score={game_manager.score} "
+          f"time_left={game_manager.time_left:.3f} (simulated in {elapsed * 1000:.1f} ms)")
+
+    if args.slowest and not replay.slow_frames:
+        print("  no frame times recorded (replay older than version 4)")
+    slowest = sorted(replay.slow_frames, key=lambda frame: frame[1], reverse=True)
+    for tick, frame_seconds in slowest[:args.slowest]:
+        print(f"  slow frame: tick {tick} took {frame_seconds * 1000:.1f} ms (--seek {tick} to inspect)")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,400 @@
+"""GeoMatch Batch Simulator: เล่นเกมแบบ Headless หลายเกมพร้อมกันเพื่อปรับสมดุลเกม
+
+ตัวอย่าง:
+    python geomatch_sim.py --games 10000 --policy greedy --fall-speed 0.5 0.3 \\
+        --weights 10,10,10,10,10,3 10,10,10,10,10,6 --out results.csv
+    python geomatch_sim.py --games 100000 --out results.parquet   # ต้องมี pyarrow
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pyarrow เป็นตัวเลือกเสริม ใช้เฉพาะผลแบบ Parquet
+    pyarrow = None
+
+from geomatch_engine import (
+    DEFAULT_FALL_SPEED, DEFAULT_SPAWN_WEIGHTS, DEFAULT_TARGET_SCORE, DEFAULT_TIME_LIMIT,
+    Grid, ArrayGrid, BitboardGrid, GameManager,
+)
+from geomatch_ai import SearchPolicy
+
+ACTIONS = [None, 'LEFT', 'RIGHT', 'DOWN', 'ROTATE']
+
+GRID_CLASSES = {'list': Grid, 'array': ArrayGrid, 'bitboard': BitboardGrid}
+
+# จำนวนคอลัมน์ Histogram ของความลึก Combo (ตัวสุดท้ายรวมทุกค่าที่มากกว่า)
+MAX_COMBO_COLUMN = 5
+
+CSV_COLUMNS = [
+    'fall_speed', 'weights', 'target_score', 'policy', 'seed',
+    'score', 'won', 'lose_reason', 'ticks', 'game_seconds', 'locks', 'max_combo',
+] + [f'combo_{depth}' for depth in range(MAX_COMBO_COLUMN)] + [f'combo_{MAX_COMBO_COLUMN}plus']
+# คอลัมน์ที่ไม่ใช่จำนวนเต็มในไฟล์ Parquet
+FLOAT_COLUMNS = ('fall_speed', 'game_seconds')
+TEXT_COLUMNS = ('weights', 'policy', 'lose_reason')
+# จำนวนแถวต่อ Row Group ของ Parquet (หน่วยความจำที่ใช้พักแถวไม่โตตามจำนวนเกม)
+PARQUET_ROW_GROUP = 50_000
+
+# ====================================================================
+# 1. POLICIES (ตัวเลือกการกระทำของผู้เล่นอัตโนมัติ)
+# ====================================================================
+
+class RandomPolicy:
+    """กดปุ่มแบบสุ่ม"""
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+
+    def __call__(self, game_manager):
+        return self.rng.choice(ACTIONS)
+
+
+class ScriptedPolicy:
+    """เล่นตามลำดับปุ่มที่กำหนดวนซ้ำ เช่น 'LEFT,LEFT,ROTATE,-' (- = ไม่กด)"""
+
+    def __init__(self, script, seed=None):
+        self.actions = [None if step in ('', '-', 'NONE') else step for step in script.upper().split(',')]
+        self.index = 0
+
+    def __call__(self, game_manager):
+        action = self.actions[self.index % len(self.actions)]
+        self.index += 1
+        return action
+
+
+class GreedyPolicy:
+    """ลองทุกตำแหน่งวาง (การหมุน x คอลัมน์) แล้วเลือกตำแหน่งที่ได้คะแนนทันทีมากที่สุด"""
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.plan = []
+        self.planned_for = None
+
+    def __call__(self, game_manager):
+        grid = game_manager.grid
+        # ชิ้นใหม่ถูกสร้างเป็น list ใหม่เสมอ จึงใช้ identity ตรวจว่าต้องวางแผนใหม่หรือไม่
+        if grid.active_shape_blocks is not self.planned_for:
+            self.planned_for = grid.active_shape_blocks
+            self.plan = self._plan(grid)
+        if self.plan:
+            return self.plan.pop(0)
+        return 'DOWN'
+
+    def _plan(self, grid):
+        best_value = None
+        best_actions = []
+        seen_cells = set()
+
+        for rotations in range(4):
+            for shift in range(-grid.width + 1, grid.width):
+                result = _simulate_placement(grid, rotations, shift)
+                if result is None:
+                    continue
+                cells, value = result
+                if cells in seen_cells:
+                    continue
+                seen_cells.add(cells)
+                # ค่าเท่ากันให้สุ่มเลือก เพื่อไม่ให้กองอยู่ฝั่งเดียว
+                value = (value, self.rng.random())
+                if best_value is None or value > best_value:
+                    best_value = value
+                    direction = 'RIGHT' if shift > 0 else 'LEFT'
+                    best_actions = ['ROTATE'] * rotations + [direction] * abs(shift)
+
+        return best_actions
+
+
+POLICIES = {
+    'random': RandomPolicy,
+    'greedy': GreedyPolicy,
+    'search': SearchPolicy,
+    'scripted': ScriptedPolicy,
+}
+
+
+def make_policy(name, seed=None, script=None):
+    if name == 'scripted':
+        return ScriptedPolicy(script or 'LEFT,RIGHT,ROTATE,-', seed)
+    return POLICIES[name](seed)
+
+
+def _simulate_placement(grid, rotations, shift):
+    """วางชิ้นปัจจุบันบนสำเนากระดาน คืน (ช่องที่วาง, คะแนนประเมิน) หรือ None ถ้าไปไม่ถึง"""
+    sim = grid.copy()
+    for _ in range(rotations):
+        sim.rotate_active_shape()
+    step = 1 if shift > 0 else -1
+    for _ in range(abs(shift)):
+        if not sim.move_active_shape(step, 0):
+            return None
+    sim.hard_drop()
+
+    cells = tuple(sorted((b.x, b.y) for b in sim.active_shape_blocks))
+    adjacency = sum(
+        1
+        for b in sim.active_shape_blocks
+        for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+        if (dx or dy) and 0 <= b.x + dx < sim.width and 0 <= b.y + dy < sim.height
+        and (neighbor := sim.grid_matrix[b.x + dx][b.y + dy]) is not None
+        and neighbor.shape_type == b.shape_type
+    )
+    top = min(y for _, y in cells)
+
+    result = sim.lock_shape()
+    if result == "GAME_OVER":
+        return cells, float('-inf')
+    return cells, result * 100 + adjacency * 10 + top
+
+# ====================================================================
+# 2. GAME RUNNER
+# ====================================================================
+
+def play_game(config):
+    """เล่น 1 เกมจนจบตาม config (dict) และคืนผลเป็น dict หนึ่งแถว"""
+    seed = config['seed']
+
+    stats = {'locks': 0, 'combos': Counter(), 'lose_reason': ''}
+
+    def on_event(name, data):
+        if name == "LOCK":
+            stats['locks'] += 1
+            stats['combos'][data['combo']] += 1
+        elif name == "LOSE":
+            stats['lose_reason'] = data['reason']
+
+    game_manager = GameManager(
+        grid_class=GRID_CLASSES[config.get('grid', 'list')],
+        event_sink=on_event,
+        fall_speed=config['fall_speed'],
+        target_score=config['target_score'],
+        time_limit=config['time_limit'],
+        spawn_weights=config['weights'],
+        seed=seed,
+    )
+    policy = make_policy(config['policy'], seed, config.get('script'))
+
+    game_manager.reset_game()
+    ticks = 0
+    while game_manager.game_state == "RUNNING":
+        game_manager.step(policy(game_manager))
+        ticks += 1
+
+    combos = stats['combos']
+    row = {
+        'fall_speed': config['fall_speed'],
+        'weights': ','.join(str(w) for w in config['weights']),
+        'target_score': config['target_score'],
+        'policy': config['policy'],
+        'seed': seed,
+        'score': game_manager.score,
+        'won': int(game_manager.game_state == "WIN"),
+        'lose_reason': stats['lose_reason'],
+        'ticks': ticks,
+        'game_seconds': round(config['time_limit'] - max(0.0, game_manager.time_left), 3),
+        'locks': stats['locks'],
+        'max_combo': max(combos) if combos else 0,
+    }
+    for depth in range(MAX_COMBO_COLUMN):
+        row[f'combo_{depth}'] = combos.get(depth, 0)
+    row[f'combo_{MAX_COMBO_COLUMN}plus'] = sum(n for depth, n in combos.items() if depth >= MAX_COMBO_COLUMN)
+    return row
+
+# ====================================================================
+# 3. BATCH RUNNER & AGGREGATION
+# ====================================================================
+
+class SweepSummary:
+    """สรุปผลของจุด Sweep หนึ่งจุด (fall_speed, weights, target_score)"""
+
+    def __init__(self):
+        self.scores = []
+        self.wins = 0
+        self.combo_hist = Counter()
+        self.game_over_seconds = []
+
+    def add(self, row):
+        self.scores.append(row['score'])
+        self.wins += row['won']
+        for column in CSV_COLUMNS:
+            if column.startswith('combo_'):
+                self.combo_hist[column[len('combo_'):]] += row[column]
+        if row['lose_reason'] in ('LOCK_OUT', 'BLOCK_OUT'):
+            self.game_over_seconds.append(row['game_seconds'])
+
+    def to_dict(self):
+        scores = sorted(self.scores)
+        deciles = statistics.quantiles(scores, n=10) if len(scores) > 1 else scores * 9
+        return {
+            'games': len(scores),
+            'win_rate': self.wins / len(scores),
+            'score_mean': statistics.fmean(scores),
+            'score_stdev': statistics.pstdev(scores),
+            'score_p10': deciles[0],
+            'score_p50': deciles[4],
+            'score_p90': deciles[8],
+            'score_max': scores[-1],
+            'combo_depth_hist': dict(self.combo_hist),
+            'game_over_rate': len(self.game_over_seconds) / len(scores),
+            'game_over_seconds_mean': statistics.fmean(self.game_over_seconds) if self.game_over_seconds else None,
+        }
+
+
+class CsvSink:
+    """เขียนผลลง CSV ทีละแถว"""
+
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=CSV_COLUMNS)
+        self.writer.writeheader()
+
+    def write(self, row):
+        self.writer.writerow(row)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetSink:
+    """เขียนผลลง Parquet แบบคอลัมน์ พักแถวไว้ทีละ row_group แถวแล้วเขียนเป็น Row Group (ต้องมี pyarrow)"""
+
+    def __init__(self, path, row_group=PARQUET_ROW_GROUP):
+        if pyarrow is None:
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow)")
+        self.schema = pyarrow.schema([
+            (column, pyarrow.float64() if column in FLOAT_COLUMNS
+             else pyarrow.string() if column in TEXT_COLUMNS else pyarrow.int64())
+            for column in CSV_COLUMNS
+        ])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+        self.row_group = row_group
+        self.columns = {column: [] for column in CSV_COLUMNS}
+        self.rows = 0
+
+    def write(self, row):
+        for column, values in self.columns.items():
+            values.append(row[column])
+        self.rows += 1
+        if self.rows >= self.row_group:
+            self._flush()
+
+    def _flush(self):
+        if self.rows:
+            self.writer.write_table(pyarrow.table(self.columns, schema=self.schema))
+            for values in self.columns.values():
+                values.clear()
+            self.rows = 0
+
+    def close(self):
+        self._flush()
+        self.writer.close()
+
+
+OUTPUT_FORMATS = {'csv': CsvSink, 'parquet': ParquetSink}
+
+
+def output_format(path):
+    """รูปแบบไฟล์ผลตามนามสกุลของ path (.parquet = Parquet, อื่นๆ = CSV)"""
+    return 'parquet' if path.lower().endswith('.parquet') else 'csv'
+
+
+def iter_configs(games, fall_speeds, weights_list, target_scores, policy, base_seed=0,
+                 time_limit=DEFAULT_TIME_LIMIT, grid='list', script=None):
+    # ใช้ Seed ชุดเดียวกันทุกจุด Sweep เพื่อให้เปรียบเทียบกันได้ตรงขึ้น
+    for fall_speed, weights, target_score in itertools.product(fall_speeds, weights_list, target_scores):
+        for i in range(games):
+            yield {
+                'seed': base_seed + i,
+                'policy': policy,
+                'script': script,
+                'grid': grid,
+                'fall_speed': fall_speed,
+                'weights': list(weights),
+                'target_score': target_score,
+                'time_limit': time_limit,
+            }
+
+
+def run_batch(configs, out_path, workers=0, total=None, progress=True, out_format=None):
+    """เล่นทุก config บน Process Pool เขียนผลลงไฟล์ทีละแถว และคืนสรุปต่อจุด Sweep
+
+    out_format: 'csv' หรือ 'parquet' (None = ตามนามสกุลของ out_path)
+    """
+    workers = workers or os.cpu_count() or 1
+    summaries = {}
+    start = time.perf_counter()
+
+    sink = OUTPUT_FORMATS[out_format or output_format(out_path)](out_path)
+    try:
+        if workers == 1:
+            rows = map(play_game, configs)
+            pool = None
+        else:
+            pool = multiprocessing.Pool(workers)
+            chunksize = max(1, min(64, (total or 0) // (workers * 8)))
+            rows = pool.imap_unordered(play_game, configs, chunksize=chunksize)
+
+        try:
+            for done, row in enumerate(rows, 1):
+                sink.write(row)
+                key = f"fall_speed={row['fall_speed']} weights={row['weights']} target={row['target_score']}"
+                summaries.setdefault(key, SweepSummary()).add(row)
+                if progress and done % 1000 == 0:
+                    rate = done / (time.perf_counter() - start)
+                    print(f"{done}/{total or '?'} games ({rate:.0f} games/s)", file=sys.stderr)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+    finally:
+        sink.close()
+
+    return {key: summary.to_dict() for key, summary in summaries.items()}
+
+
+def _parse_weights(text):
+    weights = [float(w) for w in text.split(',')]
+    if len(weights) != len(DEFAULT_SPAWN_WEIGHTS):
+        raise argparse.ArgumentTypeError(f"expected {len(DEFAULT_SPAWN_WEIGHTS)} comma-separated weights")
+    return weights
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run seeded headless GeoMatch games across a process pool.")
+    parser.add_argument('--games', type=int, default=1000, help="games per sweep point")
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='random')
+    parser.add_argument('--script', help="comma-separated actions for the scripted policy")
+    parser.add_argument('--fall-speed', type=float, nargs='+', default=[DEFAULT_FALL_SPEED])
+    parser.add_argument('--weights', type=_parse_weights, nargs='+', default=[DEFAULT_SPAWN_WEIGHTS])
+    parser.add_argument('--target-score', type=int, nargs='+', default=[DEFAULT_TARGET_SCORE])
+    parser.add_argument('--time-limit', type=float, default=DEFAULT_TIME_LIMIT)
+    parser.add_argument('--grid', choices=sorted(GRID_CLASSES), default='list')
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first game")
+    parser.add_argument('--workers', type=int, default=0, help="process count (0 = all cores)")
+    parser.add_argument('--out', default='sim_results.csv', help="results file (.parquet = columnar, needs pyarrow)")
+    parser.add_argument('--format', choices=sorted(OUTPUT_FORMATS), help="results format (default: from --out)")
+    args = parser.parse_args(argv)
+    out_format = args.format or output_format(args.out)
+    if out_format == 'parquet' and pyarrow is None:
+        parser.error("parquet output requires pyarrow (pip install pyarrow)")
+
+    total = args.games * len(args.fall_speed) * len(args.weights) * len(args.target_score)
+    configs = iter_configs(args.games, args.fall_speed, args.weights, args.target_score, args.policy,
+                           args.seed, args.time_limit, args.grid, args.script)
+    summary = run_batch(configs, args.out, args.workers, total, out_format=out_format)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
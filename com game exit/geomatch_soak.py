@@ -0,0 +1,326 @@
+"""GeoMatch Soak Test: วนเล่นเกมอัตโนมัติ MENU -> reset_game -> เล่น -> LOSE/WIN -> MENU ไปเรื่อยๆ
+พร้อมวัดหน่วยความจำทุกรอบ และแจ้งเตือนเมื่อค่าใดโตขึ้นต่อเนื่อง (สงสัยว่ารั่ว)
+
+ทุกรอบเก็บ: RSS, หน่วยความจำ/จำนวนบล็อกที่ Python จองไว้ (tracemalloc), จำนวน Surface และ Font
+ที่ถูกอ้างถึงจากอ็อบเจกต์ Python, ขนาด Cache ของการวาด และเวลาต่อเฟรม (เฉลี่ย/สูงสุด)
+หลังรอบ Warm-up จะหาความชันด้วย Least Squares ของครึ่งหลังของรอบที่วัด (ต้องมีอย่างน้อย MIN_TREND_CYCLES รอบ)
+ถ้าเกินเกณฑ์ใน LEAK_THRESHOLDS ถือว่าโตผิดปกติ ยกเว้นค่าใน ADVISORY ที่แค่เตือน
+(Cache ข้อความเป็น LRU ที่จำกัดขนาด จึงนับแยกและตรวจแค่ว่าไม่เกิน TEXT_CACHE_LIMIT)
+
+รายงาน JSON ถูกเขียนใหม่ทุกรอบ (ดูระหว่างรันได้) และจบด้วย Exit Code 1 เมื่อพบการโต (ใช้ใน CI ได้)
+
+ตัวอย่าง:
+    python geomatch_soak.py --cycles 30 --policy greedy --report soak_report.json
+    python geomatch_soak.py --cycles 0 --window      # รันไม่มีที่สิ้นสุดบนจอจริง (Ctrl+C เพื่อหยุด)
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import pygame
+
+import geomatch_full as ui
+from geomatch_engine import GameManager
+from geomatch_sim import POLICIES, make_policy
+from geomatch_timestep import FixedTimestep
+
+# อัตราเฟรมที่จำลอง (ไม่รอเวลาจริง) และจำนวนเฟรมที่ค้างหน้าเมนู / Pop-up ต่อรอบ
+SOAK_FPS = 60
+MENU_FRAMES = 30
+POPUP_FRAMES = 30
+# เวลาต่อเกม (วินาทีของเกม) สั้นกว่าเกมจริงเพื่อให้ครบรอบเร็ว
+SOAK_TIME_LIMIT = 30.0
+
+# ความชันสูงสุดต่อรอบที่ยอมรับได้ของแต่ละค่า
+LEAK_THRESHOLDS = {
+    'rss_bytes': 256 * 1024,
+    'traced_bytes': 64 * 1024,
+    'traced_blocks': 200,
+    'surfaces': 0.5,
+    'fonts': 0.1,
+    'cached_items': 0.5,
+    'frame_avg_ms': 0.05,
+}
+# จำนวนรอบหลัง Warm-up ขั้นต่ำก่อนตัดสินว่าค่าใดโต (น้อยกว่านี้ Noise ของแต่ละรอบมีผลกับความชันมาก)
+MIN_TREND_CYCLES = 6
+# ค่าที่ขึ้นกับ Allocator หรือความเร็วเครื่อง: ชันเกินเกณฑ์ = เตือนเท่านั้น
+# (RSS ของ Allocator ที่อุ่นเครื่องขึ้นเป็นขั้นแล้วนิ่ง ขณะที่ traced_* ไม่เปลี่ยน)
+ADVISORY = ('rss_bytes', 'frame_avg_ms')
+# RSS ที่โตรวมเกินนี้ในช่วงที่ตรวจ ถือว่าโตจริงแม้ tracemalloc จะนิ่ง (เช่นรั่วในโค้ด C)
+RSS_GROWTH_LIMIT = 32 * 2**20
+
+
+def rss_bytes():
+    """RSS ปัจจุบันของโปรเซส (None ถ้าระบบไม่รองรับ)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    # ru_maxrss เป็นค่าสูงสุด (KB บน Linux, ไบต์บน macOS) ใช้แทนได้เมื่อไม่มี /proc
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def count_pygame_objects(exclude=()):
+    """นับ Surface และ Font ที่ถูกอ้างถึงจากอ็อบเจกต์ Python (สองชนิดนี้ไม่อยู่ใน gc โดยตรง)
+    
+    exclude: Surface ที่ไม่ต้องนับ (เช่นที่อยู่ใน Cache ที่จำกัดขนาดอยู่แล้ว)
+    """
+    skip = {id(surface) for surface in exclude}
+    surfaces = set()
+    fonts = set()
+    for obj in gc.get_objects():
+        for ref in gc.get_referents(obj):
+            if isinstance(ref, pygame.Surface):
+                if id(ref) not in skip:
+                    surfaces.add(id(ref))
+            elif isinstance(ref, pygame.font.Font):
+                fonts.add(id(ref))
+    return len(surfaces), len(fonts)
+
+
+def cached_items():
+    return len(ui._POPUP_CACHE) + len(ui._OVERLAYS) + len(ui._BLOCK_ATLAS) + len(ui._FONTS)
+
+
+def slope(values):
+    """ความชันแบบ Least Squares ของค่าเทียบกับลำดับรอบ"""
+    n = len(values)
+    if n < 2:
+        return 0.0
+    mean_x = (n - 1) / 2
+    mean_y = sum(values) / n
+    numerator = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values))
+    denominator = sum((x - mean_x) ** 2 for x in range(n))
+    return numerator / denominator
+
+
+def find_trends(cycles, warmup, text_cache_limit):
+    """คืน (ความชันต่อรอบ, [ค่าที่โตผิดปกติ], [ค่าที่ชันเกินเกณฑ์แต่แค่เตือน])
+
+    ความชันคิดจากครึ่งหลังของรอบหลัง Warm-up เท่านั้น: ค่าที่ขึ้นเป็นขั้นช่วงแรกแล้วนิ่ง
+    (Allocator, Cache ที่เติมจนเต็ม) จึงไม่ถูกนับว่ารั่ว
+    """
+    measured = cycles[warmup:]
+    trends = {}
+    leaks = []
+    warnings = []
+    if measured and max(cycle['text_cache'] for cycle in measured) > text_cache_limit:
+        leaks.append('text_cache')
+    if len(measured) < MIN_TREND_CYCLES:
+        return trends, leaks, warnings
+    window = measured[len(measured) // 2:]
+    for name, limit in LEAK_THRESHOLDS.items():
+        values = [cycle[name] for cycle in window]
+        if None in values:
+            continue
+        trends[name] = slope(values)
+        if trends[name] <= limit:
+            continue
+        if name == 'rss_bytes' and values[-1] - values[0] > RSS_GROWTH_LIMIT:
+            leaks.append(name)
+        elif name in ADVISORY:
+            warnings.append(name)
+        else:
+            leaks.append(name)
+    return trends, leaks, warnings
+
+# ====================================================================
+# 1. SOAK RUNNER
+# ====================================================================
+
+class SoakRunner:
+    """เล่นเกมอัตโนมัติผ่าน DirtyRectRenderer จริงทีละรอบ และเก็บค่าของแต่ละรอบ"""
+
+    def __init__(self, policy='greedy', time_limit=SOAK_TIME_LIMIT, seed=0, warmup=2):
+        self.policy_name = policy
+        self.time_limit = time_limit
+        self.seed = seed
+        self.warmup = warmup
+        self.cycles = []
+        self._baseline = None
+        self._last_snapshot = None
+        self.screen = pygame.display.set_mode((ui.SCREEN_WIDTH, ui.SCREEN_HEIGHT))
+        font = ui.load_fonts()
+        ui.build_block_atlas()
+        ui.build_overlays((ui.SCREEN_WIDTH, ui.SCREEN_HEIGHT))
+        effects = ui.create_clear_effects(50, 50) if ui.SHOW_EFFECTS else None
+        self.renderer = ui.DirtyRectRenderer(self.screen, font, 50, 50, interpolate=ui.INTERPOLATE_FALL,
+                                             effects=effects)
+        # GameManager ตัวเดียวตลอดการทดสอบ เหมือนเกมจริงที่กลับเมนูแล้วเริ่มใหม่
+        self.game_manager = GameManager(time_limit=time_limit, cascade_step_time=ui.CASCADE_STEP_SECONDS,
+                                        event_sink=self._on_game_event)
+        self.timestep = FixedTimestep(ui.LOGIC_TICK_RATE)
+
+    def _on_game_event(self, name, data):
+        effects = self.renderer.effects
+        if effects is None:
+            return
+        if name == "CLEAR":
+            self.renderer.add_clear_effects(**data)
+        elif name == "RESET":
+            effects.clear()
+
+    def _frame(self, frame_times, policy=None):
+        start = time.perf_counter()
+        pygame.event.pump()
+        game_manager = self.game_manager
+        # ระหว่าง Cascade ไม่มีชิ้นให้ Policy วางแผน
+        if policy is not None and game_manager.game_state == "RUNNING" and game_manager.cascade is None:
+            action = policy(game_manager)
+            if action is not None:
+                game_manager.handle_input(action)
+        for _ in range(self.timestep.advance(1.0 / SOAK_FPS)):
+            game_manager.update(self.timestep.dt)
+        if self.renderer.effects is not None and game_manager.game_state == "RUNNING":
+            self.renderer.effects.update(1.0 / SOAK_FPS)
+        self.renderer.draw(game_manager, 0.5, False, self.timestep.accumulator)
+        self.renderer.present()
+        frame_times.append(time.perf_counter() - start)
+
+    def run_cycle(self):
+        """เล่น 1 รอบเต็ม แล้วคืน dict ของค่าที่วัดได้"""
+        index = len(self.cycles)
+        game_manager = self.game_manager
+        frame_times = []
+        cycle_start = time.perf_counter()
+
+        for _ in range(MENU_FRAMES):
+            self._frame(frame_times)
+        game_manager.seed = self.seed + index
+        game_manager.reset_game()
+        policy = make_policy(self.policy_name, self.seed + index)
+        while game_manager.game_state == "RUNNING":
+            self._frame(frame_times, policy)
+        result = game_manager.game_state
+        score = game_manager.score
+        for _ in range(POPUP_FRAMES):
+            self._frame(frame_times)
+        game_manager.return_to_menu()
+        self._frame(frame_times)
+
+        gc.collect()
+        snapshot = tracemalloc.take_snapshot()
+        surfaces, fonts = count_pygame_objects(ui._TEXT_CACHE.values())
+        cycle = {
+            'cycle': index,
+            'result': result,
+            'score': score,
+            'frames': len(frame_times),
+            'seconds': time.perf_counter() - cycle_start,
+            'frame_avg_ms': sum(frame_times) / len(frame_times) * 1000,
+            'frame_max_ms': max(frame_times) * 1000,
+            'rss_bytes': rss_bytes(),
+            'traced_bytes': tracemalloc.get_traced_memory()[0],
+            'traced_blocks': len(snapshot.traces),
+            'surfaces': surfaces,
+            'fonts': fonts,
+            'cached_items': cached_items(),
+            'text_cache': len(ui._TEXT_CACHE),
+        }
+        if index == self.warmup:
+            self._baseline = snapshot
+        self._last_snapshot = snapshot
+        self.cycles.append(cycle)
+        return cycle
+
+    def trends(self):
+        """ความชันต่อรอบของแต่ละค่าหลัง Warm-up, ค่าที่โตผิดปกติ และค่าที่แค่เตือน (ดู find_trends)"""
+        return find_trends(self.cycles, self.warmup, ui.TEXT_CACHE_LIMIT)
+
+    def top_growth(self, limit=10):
+        """บรรทัดโค้ดที่จองหน่วยความจำเพิ่มขึ้นมากที่สุดตั้งแต่จบ Warm-up"""
+        if self._baseline is None or self._last_snapshot is self._baseline:
+            return []
+        stats = self._last_snapshot.compare_to(self._baseline, 'lineno')
+        return [
+            {'where': str(stat.traceback), 'size_diff': stat.size_diff, 'count_diff': stat.count_diff}
+            for stat in stats[:limit] if stat.size_diff > 0
+        ]
+
+    def report(self):
+        trends, leaks, warnings = self.trends()
+        return {
+            'policy': self.policy_name,
+            'time_limit': self.time_limit,
+            'warmup': self.warmup,
+            'thresholds': LEAK_THRESHOLDS,
+            'min_trend_cycles': MIN_TREND_CYCLES,
+            'cycles': self.cycles,
+            'trends': trends,
+            'leaks': leaks,
+            'warnings': warnings,
+            'top_growth': self.top_growth() if leaks else [],
+            'ok': not leaks,
+        }
+
+
+def write_report(report, path):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as report_file:
+        json.dump(report, report_file, indent=1)
+    os.replace(temp_path, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cycle GeoMatch games unattended and track memory growth.")
+    parser.add_argument('--cycles', type=int, default=20, help="number of games (0 = run until Ctrl+C)")
+    parser.add_argument('--warmup', type=int, default=2, help="cycles ignored by the trend check")
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='greedy')
+    parser.add_argument('--time-limit', type=float, default=SOAK_TIME_LIMIT, help="game seconds per cycle")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--window', action='store_true', help="draw to a real window instead of a dummy display")
+    parser.add_argument('--report', default='soak_report.json')
+    args = parser.parse_args(argv)
+
+    if not args.window:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    tracemalloc.start()
+    pygame.init()
+    runner = SoakRunner(args.policy, args.time_limit, args.seed, args.warmup)
+
+    try:
+        while args.cycles == 0 or len(runner.cycles) < args.cycles:
+            cycle = runner.run_cycle()
+            rss = cycle['rss_bytes']
+            print(f"cycle {cycle['cycle']}: {cycle['result']} score={cycle['score']} "
+                  f"frames={cycle['frames']} avg={cycle['frame_avg_ms']:.2f} ms max={cycle['frame_max_ms']:.1f} ms "
+                  f"rss={'-' if rss is None else f'{rss / 2**20:.1f} MiB'} "
+                  f"traced={cycle['traced_bytes'] / 1024:.0f} KiB surfaces={cycle['surfaces']}")
+            write_report(runner.report(), args.report)
+    except KeyboardInterrupt:
+        print("Stopped.")
+    finally:
+        pygame.quit()
+
+    report = runner.report()
+    write_report(report, args.report)
+    measured = len(runner.cycles) - args.warmup
+    if measured < MIN_TREND_CYCLES:
+        print(f"WARNING: only {max(0, measured)} cycles after warm-up; "
+              f"growth trends need at least {MIN_TREND_CYCLES}")
+    for name in report['warnings']:
+        print(f"WARNING: {name} rises by {report['trends'][name]:.2f} per cycle "
+              f"(limit {LEAK_THRESHOLDS[name]}, advisory only)")
+    for name in report['leaks']:
+        if name == 'text_cache':
+            print(f"GROWTH: text cache exceeds its limit of {ui.TEXT_CACHE_LIMIT} entries")
+            continue
+        print(f"GROWTH: {name} rises by {report['trends'][name]:.1f} per cycle "
+              f"(limit {LEAK_THRESHOLDS[name]})")
+    print(f"Report written to '{args.report}'")
+    return 0 if report['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
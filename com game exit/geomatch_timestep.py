@@ -0,0 +1,75 @@
+"""GeoMatch Timestep: ตัวจัดจังหวะแบบ Fixed Timestep แยกการจำลองเกมออกจากการวาด (ไม่ขึ้นกับ Pygame)
+
+ลอจิกของเกมเดินทีละ Tick ขนาดคงที่ (dt = 1 / tick_rate) ไม่ว่าจอจะวาดกี่เฟรมต่อวินาที
+จึงเล่นเหมือนกันที่ 30, 60 หรือ 144 FPS และ Replay บันทึกเวลาเดียวกันทุก Tick
+
+เมื่อเครื่องช้ากว่าเวลาจริง:
+    1. จำลองไม่เกิน max_steps Tick ต่อเฟรม (ที่เหลือยกไปเฟรมถัดไป)
+    2. ข้ามการวาดก่อน (ไม่เกิน max_frame_skip เฟรมติดกัน) เพื่อให้ลอจิกตามทัน
+    3. ถ้าข้ามการวาดจนครบแล้วยังตามไม่ทัน จึงทิ้งเวลาที่ค้าง (เกมช้าลงชั่วคราวแทนการกระตุกยาว)
+
+ตัวอย่าง:
+    timestep = FixedTimestep(tick_rate=120)
+    for _ in range(timestep.advance(frame_seconds)):
+        game_manager.update(timestep.dt)
+    if timestep.should_render():
+        renderer.draw(game_manager, pending_time=timestep.accumulator)
+"""
+
+# จำนวน Tick ของลอจิกต่อวินาที
+DEFAULT_TICK_RATE = 120
+# จำนวน Tick สูงสุดต่อเฟรมที่วาด (ประมาณ 1/15 วินาทีที่ 120 Hz)
+DEFAULT_MAX_STEPS = 8
+# จำนวนเฟรมที่ข้ามการวาดติดกันได้มากที่สุดก่อนยอมทิ้งเวลา
+DEFAULT_MAX_FRAME_SKIP = 5
+
+
+class FixedTimestep:
+    """สะสมเวลาจริงของแต่ละเฟรม แล้วแบ่งเป็นจำนวน Tick ขนาดคงที่ที่ต้องจำลอง"""
+
+    def __init__(self, tick_rate=DEFAULT_TICK_RATE, max_steps=DEFAULT_MAX_STEPS,
+                 max_frame_skip=DEFAULT_MAX_FRAME_SKIP):
+        if tick_rate <= 0 or max_steps < 1:
+            raise ValueError("tick_rate must be positive and max_steps at least 1")
+        self.dt = 1.0 / tick_rate
+        self.max_steps = max_steps
+        self.max_frame_skip = max_frame_skip
+        self.reset()
+
+    def reset(self):
+        """ล้างเวลาที่สะสมไว้ (เช่นหลังโหลดเกมหรือกลับจากเมนู)"""
+        self.accumulator = 0.0  # เวลาจริงที่ยังไม่ได้จำลอง (น้อยกว่า dt ยกเว้นตอนตามไม่ทัน)
+        self.ticks = 0
+        self.dropped_ticks = 0
+        self.skipped_frames = 0
+        self.behind = False
+
+    def advance(self, frame_seconds):
+        """เพิ่มเวลาของเฟรมล่าสุด และคืนจำนวน Tick ที่ต้องจำลองในเฟรมนี้"""
+        dt = self.dt
+        self.accumulator += max(0.0, frame_seconds)
+        steps = int(self.accumulator // dt)
+        if steps > self.max_steps:
+            steps = self.max_steps
+            if self.skipped_frames >= self.max_frame_skip:
+                # ข้ามการวาดจนครบแล้ว: ทิ้ง Tick ที่ค้างเกินกว่าเฟรมนี้ เหลือเศษไว้ให้ Interpolate ต่อ
+                backlog = self.accumulator - steps * dt
+                self.dropped_ticks += int(backlog // dt)
+                self.accumulator = steps * dt + backlog % dt
+        self.accumulator -= steps * dt
+        self.behind = self.accumulator >= dt
+        self.ticks += steps
+        return steps
+
+    def should_render(self):
+        """คืน False เมื่อควรข้ามการวาดเฟรมนี้เพื่อให้ลอจิกตามเวลาจริงทัน"""
+        if self.behind and self.skipped_frames < self.max_frame_skip:
+            self.skipped_frames += 1
+            return False
+        self.skipped_frames = 0
+        return True
+
+    @property
+    def alpha(self):
+        """สัดส่วนของ Tick ถัดไปที่ผ่านไปแล้ว (0-1) สำหรับ Interpolate ตำแหน่งตอนวาด"""
+        return min(1.0, self.accumulator / self.dt)
@@ -0,0 +1,313 @@
+"""GeoMatch VecEnv: สภาพแวดล้อมแบบ Gym ที่เดินกระดาน N ใบพร้อมกันด้วย NumPy (สำหรับฝึก Policy)
+
+กติกาเดียวกับ Grid + GameManager.step() ทุกข้อ แต่ทำเป็น Batch ทั้งหมดบน Array เดียว:
+    เลื่อน/หมุน/ตก/Hard Drop, Lock, หากลุ่ม 8 ทิศขนาด 4+, Diamond เคลียร์ทั้งแถว,
+    Gravity, Cascade และคะแนน Combo (_calculate_combo_score)
+1 step = handle_input(action) แล้ว update(fall_speed) ของทุกกระดาน (ตก 1 ช่องต่อ step)
+ลำดับชิ้นมาจาก numpy.random.Generator ของ Env (ไม่ใช่ลำดับเดียวกับ Grid ที่ Seed เดียวกัน)
+
+ข้อมูลทั้งหมดอยู่ใน Array ต่อเนื่อง: codes (N, width, height) int8 แบบเดียวกับ ArrayGrid.codes
+Active Shape เก็บเป็นพิกัด 3 ช่องเสมอ (ชิ้นที่สั้นกว่าใช้ช่องของ Pivot ซ้ำ จึงไม่ต้องมี Mask)
+
+Observation: int8 (N, width, height) = Match Key ของบล็อกที่วางแล้ว, Active Shape เป็นค่าลบ (-Match Key)
+Action: 0 = ไม่กด, 1 = LEFT, 2 = RIGHT, 3 = DOWN, 4 = ROTATE, 5 = HARD_DROP
+กระดานที่จบ (ชนะ/แพ้) เริ่มเกมใหม่อัตโนมัติใน step เดียวกัน (ค่าสุดท้ายอยู่ใน info)
+
+ตัวอย่าง:
+    env = VecGeoMatchEnv(4096, seed=0)
+    obs = env.reset()
+    obs, rewards, dones, info = env.step(actions)      # actions: int array (N,)
+    python geomatch_vecenv.py --envs 4096 --steps 500  # วัดจำนวน step ต่อวินาที
+"""
+
+import argparse
+import sys
+import time
+
+from geomatch_engine import (
+    SHAPES, SHAPE_CODES, DEFAULT_SPAWN_WEIGHTS, GRID_WIDTH, GRID_HEIGHT, MIN_MATCH, NEIGHBOUR_OFFSETS,
+    DEFAULT_FALL_SPEED, DEFAULT_TARGET_SCORE, DEFAULT_TIME_LIMIT, GameRules, np,
+)
+
+ACTIONS = (None, 'LEFT', 'RIGHT', 'DOWN', 'ROTATE', 'HARD_DROP')
+NOOP, LEFT, RIGHT, DOWN, ROTATE, HARD_DROP = range(len(ACTIONS))
+
+# จำนวนช่องสูงสุดของ Active Shape (spawn_new_shape สุ่ม 1-3 ช่อง)
+PIECE_CELLS = 3
+DIAMOND_CODE = SHAPE_CODES['Diamond']
+
+# ====================================================================
+# 1. BATCHED RULES (ฟังก์ชันบน Array ของหลายกระดาน)
+# ====================================================================
+
+def combo_score(cleared, combo):
+    """_calculate_combo_score แบบ Array: cleared, combo เป็น int array ขนาดเท่ากัน"""
+    base = np.where(cleared >= 8, 500, np.where(cleared >= 6, 250, 100))
+    # ตัวคูณ 1.0 / 1.5 / 2.0 คิดเป็นครึ่งหนึ่งเพื่อให้ปัดเศษเหมือน int(base * multiplier)
+    halves = np.where(combo >= 2, 4, np.where(combo == 1, 3, 2))
+    return base * halves // 2
+
+
+def find_matches(codes, seeds=None, min_match=MIN_MATCH):
+    """คืน Mask (M, W, H) ของช่องที่ต้องเคลียร์ (กลุ่ม 8 ทิศขนาด min_match+ และแถวของ Diamond ในกลุ่มนั้น)
+
+    seeds: Mask ของช่องที่เพิ่งเปลี่ยน (None = ทั้งกระดาน) เหมือน seed_blocks ของ Grid:
+           กระดานที่ไม่มี seed ติดกับบล็อกชนิดเดียวกันเลยถูกข้ามทั้งใบ (เมื่อ min_match > 1)
+    ใช้ Label Propagation: ทุกช่องรับ Label ที่มากที่สุดของเพื่อนบ้านที่ Match Key เดียวกันจนไม่เปลี่ยน
+    (จำนวนรอบ = ความยาวเส้นทางที่ยาวที่สุดภายในกลุ่ม)
+    """
+    boards, width, height = codes.shape
+    occupied = codes != 0
+    cleared = np.zeros_like(occupied)
+    padded = np.zeros((boards, width + 2, height + 2), dtype=codes.dtype)
+    padded[:, 1:-1, 1:-1] = codes
+    same = [
+        occupied & (padded[:, 1 + dx:width + 1 + dx, 1 + dy:height + 1 + dy] == codes)
+        for dx, dy in NEIGHBOUR_OFFSETS
+    ]
+    # ช่องที่มีเพื่อนบ้านชนิดเดียวกัน (กลุ่มขนาด 1 ไม่ต้อง Propagate ยกเว้นกติกาที่เคลียร์กลุ่มขนาด 1 ได้)
+    linked = occupied if min_match <= 1 else np.logical_or.reduce(same)
+    candidates = linked if seeds is None else linked & seeds
+    hit = np.flatnonzero(candidates.any(axis=(1, 2)))
+    if not len(hit):
+        return cleared
+    if len(hit) < boards:
+        codes, occupied, linked = codes[hit], occupied[hit], linked[hit]
+        same = [mask[hit] for mask in same]
+        boards = len(hit)
+
+    cells = width * height
+    labels = np.where(linked, np.arange(1, cells + 1, dtype=np.int16).reshape(width, height), 0).astype(np.int16)
+    padded_labels = np.zeros((boards, width + 2, height + 2), dtype=np.int16)
+    while True:
+        padded_labels[:, 1:-1, 1:-1] = labels
+        grown = labels.copy()
+        for (dx, dy), mask in zip(NEIGHBOUR_OFFSETS, same):
+            neighbour = padded_labels[:, 1 + dx:width + 1 + dx, 1 + dy:height + 1 + dy]
+            np.maximum(grown, neighbour, out=grown, where=mask)
+        if np.array_equal(grown, labels):
+            break
+        labels = grown
+
+    # ขนาดกลุ่มของแต่ละ Label แยกตามกระดาน
+    keys = labels + (np.arange(boards, dtype=np.int64) * (cells + 1))[:, None, None]
+    sizes = np.bincount(keys.ravel(), minlength=boards * (cells + 1))
+    matched = linked & (sizes[keys] >= min_match)
+
+    # Diamond ในกลุ่มที่เคลียร์ = เคลียร์ทั้งแถวนั้นด้วย
+    diamond_rows = (matched & (codes == DIAMOND_CODE)).any(axis=1)
+    matched |= occupied & diamond_rows[:, None, :]
+    cleared[hit] = matched
+    return cleared
+
+
+def apply_gravity(codes):
+    """บีบแต่ละคอลัมน์ของทุกกระดานลงด้านล่าง คืน (codes ใหม่, Mask ของช่องที่ถูกเลื่อน)"""
+    # argsort แบบ stable: ช่องว่าง (False) ขึ้นบน บล็อกเรียงลำดับเดิมลงล่าง (แบบเดียวกับ ArrayGrid)
+    order = np.argsort(codes != 0, axis=2, kind='stable')
+    codes = np.take_along_axis(codes, order, axis=2)
+    return codes, (order != np.arange(codes.shape[2])) & (codes != 0)
+
+
+def resolve_cascades(codes, seeds=None, min_match=MIN_MATCH):
+    """เคลียร์แบบ Cascade จนทุกกระดานนิ่ง คืน (codes ใหม่, คะแนน (M,), จำนวนรอบ Combo (M,))
+
+    seeds: Mask ของบล็อกที่เพิ่งวาง (None = ตรวจทั้งกระดาน) รอบถัดไปใช้ช่องที่ Gravity เลื่อน
+    กระดานที่ไม่มีกลุ่มแล้วถูกตัดออกจากรอบถัดไป (งานลดลงตามจำนวนกระดานที่ยัง Cascade อยู่)
+    """
+    codes = codes.copy()
+    boards = len(codes)
+    score = np.zeros(boards, dtype=np.int64)
+    combo = np.zeros(boards, dtype=np.int64)
+    active = np.arange(boards)
+    while len(active):
+        subset = codes[active]
+        cleared = find_matches(subset, seeds, min_match)
+        counts = cleared.sum(axis=(1, 2))
+        hit = counts > 0
+        if not hit.any():
+            break
+        active, subset, cleared, counts = active[hit], subset[hit], cleared[hit], counts[hit]
+        score[active] += combo_score(counts, combo[active])
+        subset[cleared] = 0
+        codes[active], seeds = apply_gravity(subset)
+        # combo นับรอบ Gravity หลังเคลียร์ (เหมือน Grid.last_combo_count)
+        combo[active] += 1
+    return codes, score, combo
+
+# ====================================================================
+# 2. VECTOR ENVIRONMENT
+# ====================================================================
+
+class VecGeoMatchEnv:
+    """กระดาน GeoMatch N ใบที่เดินพร้อมกันทีละ step"""
+
+    def __init__(self, num_envs, width=GRID_WIDTH, height=GRID_HEIGHT, spawn_weights=None,
+                 fall_speed=DEFAULT_FALL_SPEED, target_score=DEFAULT_TARGET_SCORE,
+                 time_limit=DEFAULT_TIME_LIMIT, seed=None, rules=None):
+        if np is None:
+            raise ImportError("VecGeoMatchEnv requires numpy (pip install numpy)")
+        # rules: GameRules ของทุกกระดาน (None = กติกามาตรฐานขนาด width x height)
+        self.rules = rules = rules or GameRules.for_size(width, height)
+        self.num_envs = num_envs
+        width = self.width = rules.width
+        height = self.height = rules.height
+        weights = np.array(spawn_weights or DEFAULT_SPAWN_WEIGHTS, dtype=float)
+        self.spawn_probabilities = weights / weights.sum()
+        self.fall_speed = fall_speed
+        self.target_score = target_score
+        self.time_limit = time_limit
+        self.rng = np.random.default_rng(seed)
+
+        self.codes = np.zeros((num_envs, width, height), dtype=np.int8)
+        self.piece_x = np.zeros((num_envs, PIECE_CELLS), dtype=np.int64)
+        self.piece_y = np.zeros((num_envs, PIECE_CELLS), dtype=np.int64)
+        self.piece_code = np.zeros(num_envs, dtype=np.int8)
+        self.score = np.zeros(num_envs, dtype=np.int64)
+        self.time_left = np.full(num_envs, float(time_limit))
+        self.last_combo = np.zeros(num_envs, dtype=np.int64)
+        self._rows = np.arange(num_envs)[:, None]
+
+    def reset(self):
+        """เริ่มเกมใหม่ทุกกระดาน และคืน Observation"""
+        self._reset_boards(np.arange(self.num_envs))
+        return self.observations()
+
+    def observations(self):
+        obs = self.codes.copy()
+        obs[self._rows, self.piece_x, self.piece_y] = -self.piece_code[:, None]
+        return obs
+
+    def _reset_boards(self, boards):
+        self.codes[boards] = 0
+        self.score[boards] = 0
+        self.time_left[boards] = self.time_limit
+        self.last_combo[boards] = 0
+        self._spawn(boards)
+
+    def _spawn(self, boards):
+        """สร้างชิ้นใหม่แนวตั้ง 1-3 ช่องที่กลางแถวบนสุด คืน Mask ของกระดานที่ Spawn ไม่ได้ (BLOCK_OUT)"""
+        count = len(boards)
+        lengths = self.rng.integers(1, PIECE_CELLS + 1, size=count)
+        shapes = self.rng.choice(len(SHAPES), size=count, p=self.spawn_probabilities)
+        offsets = np.arange(PIECE_CELLS)
+        self.piece_x[boards] = self.width // 2
+        self.piece_y[boards] = np.where(offsets < lengths[:, None], offsets, 0)
+        self.piece_code[boards] = shapes + 1
+        return ~self._fits(boards, self.piece_x[boards], self.piece_y[boards])
+
+    def _fits(self, boards, xs, ys):
+        """_shape_fits แบบ Batch: ทุกช่องอยู่ในกระดานและว่าง (xs, ys: (len(boards), 3))"""
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        cells = self.codes[boards[:, None], np.clip(xs, 0, self.width - 1), np.clip(ys, 0, self.height - 1)]
+        return (inside & (cells == 0)).all(axis=1)
+
+    def _move(self, boards, dx, dy):
+        """เลื่อน Active Shape ของ boards เมื่อไม่ชน คืน Mask ของกระดานที่เลื่อนได้"""
+        xs = self.piece_x[boards] + dx
+        ys = self.piece_y[boards] + dy
+        ok = self._fits(boards, xs, ys)
+        moved = boards[ok]
+        self.piece_x[moved] = xs[ok]
+        self.piece_y[moved] = ys[ok]
+        return ok
+
+    def _rotate(self, boards):
+        # หมุน 90 องศารอบช่องแรก: (rel_x, rel_y) -> (-rel_y, rel_x)
+        pivot_x = self.piece_x[boards, :1]
+        pivot_y = self.piece_y[boards, :1]
+        xs = pivot_x - (self.piece_y[boards] - pivot_y)
+        ys = pivot_y + (self.piece_x[boards] - pivot_x)
+        ok = self._fits(boards, xs, ys)
+        rotated = boards[ok]
+        self.piece_x[rotated] = xs[ok]
+        self.piece_y[rotated] = ys[ok]
+
+    def _hard_drop(self, boards):
+        # ระยะถึงบล็อกแรกใต้แต่ละช่อง (หรือพื้น) แล้วเลื่อนลงเท่าระยะที่น้อยที่สุด
+        xs = self.piece_x[boards]
+        ys = self.piece_y[boards]
+        columns = self.codes[boards[:, None], xs] != 0                    # (M, 3, H)
+        below = columns & (np.arange(self.height) > ys[:, :, None])
+        first = np.where(below.any(axis=2), below.argmax(axis=2), self.height)
+        self.piece_y[boards] += (first - ys - 1).min(axis=1, keepdims=True)
+
+    def step(self, actions):
+        """เดินทุกกระดาน 1 step คืน (observations, rewards, dones, info)
+
+        info: 'won' (bool), 'final_score' (คะแนนตอนจบของกระดานที่ done), 'combo' (รอบ Cascade ของ Lock ใน step นี้)
+        """
+        actions = np.asarray(actions)
+        everyone = np.arange(self.num_envs)
+
+        # --- handle_input ---
+        self._move(everyone[actions == LEFT], -1, 0)
+        self._move(everyone[actions == RIGHT], 1, 0)
+        self._move(everyone[actions == DOWN], 0, 1)
+        self._rotate(everyone[actions == ROTATE])
+        self._hard_drop(everyone[actions == HARD_DROP])
+
+        # --- update(fall_speed): ตก 1 ช่อง ถ้าตกไม่ได้ให้ Lock ---
+        self.time_left -= self.fall_speed
+        landed = everyone[~self._move(everyone, 0, 1)]
+        rewards = np.zeros(self.num_envs, dtype=np.int64)
+        combo = np.zeros(self.num_envs, dtype=np.int64)
+        lock_out = np.zeros(self.num_envs, dtype=bool)
+        block_out = np.zeros(self.num_envs, dtype=bool)
+        if len(landed):
+            xs, ys = self.piece_x[landed], self.piece_y[landed]
+            self.codes[landed[:, None], xs, ys] = self.piece_code[landed, None]
+            # บล็อกใดอยู่ในแถว Spawn = แพ้ทันทีโดยไม่นับคะแนน
+            out = (ys < self.rules.spawn_rows).any(axis=1)
+            lock_out[landed[out]] = True
+            placed = landed[~out]
+            if len(placed):
+                seeds = np.zeros((len(placed), self.width, self.height), dtype=bool)
+                seeds[np.arange(len(placed))[:, None], xs[~out], ys[~out]] = True
+                self.codes[placed], points, depth = resolve_cascades(self.codes[placed], seeds, self.rules.min_match)
+                rewards[placed] = points
+                combo[placed] = depth
+                self.last_combo[placed] = depth
+                self.score[placed] += points
+                block_out[placed] = self._spawn(placed)
+
+        # --- check_win_or_lose (LOCK_OUT จบก่อนตรวจชนะ แบบเดียวกับ GameManager.update) ---
+        won = ~lock_out & (self.score >= self.target_score)
+        dones = won | lock_out | block_out | (self.time_left <= 0)
+        final_score = np.where(dones, self.score, 0)
+        if dones.any():
+            self._reset_boards(everyone[dones])
+        info = {'won': won, 'final_score': final_score, 'combo': combo}
+        return self.observations(), rewards, dones, info
+
+# ====================================================================
+# RUN EXECUTION (วัดความเร็ว)
+# ====================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure VecGeoMatchEnv throughput with a random policy.")
+    parser.add_argument('--envs', type=int, default=4096)
+    parser.add_argument('--steps', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    env = VecGeoMatchEnv(args.envs, seed=args.seed)
+    env.reset()
+    rng = np.random.default_rng(args.seed)
+    games = wins = total_score = 0
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        _, _, dones, info = env.step(rng.integers(len(ACTIONS), size=args.envs))
+        games += int(dones.sum())
+        wins += int(info['won'].sum())
+        total_score += int(info['final_score'].sum())
+    elapsed = time.perf_counter() - start
+    steps = args.envs * args.steps
+    print(f"{steps} board steps in {elapsed:.2f}s ({steps / elapsed:,.0f} steps/s)")
+    if games:
+        print(f"{games} games finished, {wins} won, average score {total_score / games:.0f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
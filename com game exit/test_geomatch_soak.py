@@ -0,0 +1,68 @@
+"""ทดสอบการตัดสินแนวโน้มของ Soak Test (find_trends) ด้วยข้อมูลสังเคราะห์
+
+ตัวอย่าง:
+    python -m unittest test_geomatch_soak
+"""
+import random
+import unittest
+
+from geomatch_soak import MIN_TREND_CYCLES, RSS_GROWTH_LIMIT, find_trends
+
+MIB = 2**20
+TEXT_CACHE_LIMIT = 256
+
+
+def make_cycles(rss, traced=None, frame_avg=None):
+    """สร้างรายการรอบจากค่า RSS (ค่าอื่นคงที่ถ้าไม่ได้ระบุ)"""
+    count = len(rss)
+    traced = traced or [2_000_000] * count
+    frame_avg = frame_avg or [4.0] * count
+    return [{
+        'rss_bytes': rss[i],
+        'traced_bytes': traced[i],
+        'traced_blocks': 15_000,
+        'surfaces': 40,
+        'fonts': 6,
+        'cached_items': 120,
+        'frame_avg_ms': frame_avg[i],
+        'text_cache': 100,
+    } for i in range(count)]
+
+
+class FindTrendsTest(unittest.TestCase):
+    def test_plateauing_rss_is_not_flagged(self):
+        # RSS ขึ้นเป็นขั้นตอน Allocator อุ่นเครื่องแล้วนิ่ง ขณะที่ tracemalloc คงที่
+        rss = [int(v * MIB) for v in (70.2, 72.9, 74.8, 75.6, 76.3, 77.8, 77.8, 77.8, 77.8, 77.8, 77.8, 77.8)]
+        trends, leaks, warnings = find_trends(make_cycles(rss), 2, TEXT_CACHE_LIMIT)
+        self.assertEqual(leaks, [])
+        self.assertEqual(warnings, [])
+        self.assertIn('rss_bytes', trends)
+
+    def test_noisy_frame_time_only_warns(self):
+        rng = random.Random(1)
+        frame_avg = [4.0 + i * 0.1 + rng.uniform(-0.3, 0.3) for i in range(14)]
+        _, leaks, warnings = find_trends(make_cycles([70 * MIB] * 14, frame_avg=frame_avg), 2, TEXT_CACHE_LIMIT)
+        self.assertEqual(leaks, [])
+        self.assertEqual(warnings, ['frame_avg_ms'])
+
+    def test_few_cycles_flag_nothing(self):
+        count = 2 + MIN_TREND_CYCLES - 1
+        traced = [2_000_000 + i * 1_000_000 for i in range(count)]
+        trends, leaks, warnings = find_trends(make_cycles([70 * MIB] * count, traced=traced), 2, TEXT_CACHE_LIMIT)
+        self.assertEqual((trends, leaks, warnings), ({}, [], []))
+
+    def test_steady_traced_growth_is_flagged(self):
+        traced = [2_000_000 + i * 200_000 for i in range(12)]
+        _, leaks, _ = find_trends(make_cycles([70 * MIB] * 12, traced=traced), 2, TEXT_CACHE_LIMIT)
+        self.assertEqual(leaks, ['traced_bytes'])
+
+    def test_large_rss_growth_fails_without_traced_growth(self):
+        step = RSS_GROWTH_LIMIT // 3
+        rss = [70 * MIB + i * step for i in range(12)]
+        _, leaks, warnings = find_trends(make_cycles(rss), 2, TEXT_CACHE_LIMIT)
+        self.assertEqual(leaks, ['rss_bytes'])
+        self.assertEqual(warnings, [])
+
+
+if __name__ == '__main__':
+    unittest.main()